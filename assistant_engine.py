@@ -0,0 +1,358 @@
+"""
+Asyncio engine that drives assistant conversations on AsyncOpenAI.
+
+One engine holds the OpenAI client and the assistant and can run turns for
+many conversations at once on a single event loop. Tool calls run on the
+shared bounded executor from tools.tool_handler, so the number of threads
+does not grow with the number of conversations. The engine does no terminal
+I/O; a TurnHandler receives text, tool usage and status messages. Every
+OpenAI request, run wait and turn is timed into the histograms in
+tools.metrics.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar, TYPE_CHECKING
+
+from tools import handle_tool_calls_async, get_tool_definitions
+from tools.metrics import OPENAI_REQUEST_SECONDS, RUN_WAIT_SECONDS, TURN_SECONDS, record_run_usage
+from prompts import SUPER_ASSISTANT_INSTRUCTIONS
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+MODEL_NAME = "gpt-4o-mini"  # Using the latest model
+POLL_INTERVAL = 0.5  # Seconds between run status checks in polling mode
+MAX_TURN_TIMINGS = 100  # Number of recent turn timings to keep
+ACTIVE_RUN_STATUSES = ("in_progress", "queued", "requires_action")
+
+T = TypeVar("T")
+
+
+class TurnHandler:
+    """Receives the output of a turn. The default implementation ignores everything."""
+
+    def on_text_delta(self, text: str) -> None:
+        """A piece of the assistant's reply arrived (streaming mode)."""
+
+    def on_message(self, text: str) -> None:
+        """The assistant's complete reply (polling mode)."""
+
+    def on_tool_calls(self, tool_names: List[str]) -> None:
+        """The run called these tools."""
+
+    def on_status(self, message: str) -> None:
+        """Something the user should know about, such as a failed run."""
+
+    def close(self) -> None:
+        """The turn is over."""
+
+
+class Conversation:
+    """
+    One conversation thread.
+
+    Turns on the same conversation run one at a time; different
+    conversations run concurrently.
+
+    Args:
+        thread_id: Existing OpenAI thread ID, or None to create one on first use
+    """
+
+    def __init__(self, thread_id: Optional[str] = None):
+        self.thread_id = thread_id
+        self.lock = asyncio.Lock()
+
+
+class AsyncAssistantEngine:
+    """
+    Runs assistant turns on AsyncOpenAI with async tool dispatch.
+
+    Args:
+        api_key: OpenAI API key
+        assistant_id: Existing assistant to use, or None to create one in start()
+        streaming: Stream run events (True) or poll run status (False)
+        client: Client to use instead of creating one from api_key
+    """
+
+    def __init__(self, api_key: Optional[str] = None, assistant_id: Optional[str] = None,
+                 streaming: bool = True, client: Optional["AsyncOpenAI"] = None):
+        if client is None:
+            # Imported here because the openai package takes most of a second to load
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key)
+        self.client = client
+        self.assistant_id = assistant_id
+        self.assistant = None
+        self.streaming = streaming
+        self.turn_timings: List[Dict[str, Any]] = []
+
+    async def start(self, update_configuration: bool = True) -> bool:
+        """
+        Retrieve the configured assistant, or create a new one.
+
+        Updating an existing assistant also verifies that it exists, so that
+        path takes a single request.
+
+        Args:
+            update_configuration: Push the current tools and instructions to an
+                existing assistant
+        Returns:
+            bool: True if a new assistant was created (its ID is in assistant_id)
+        """
+        if self.assistant_id:
+            if update_configuration:
+                # Update assistant configuration to ensure latest tools are available
+                await self.update_assistant_configuration()
+            else:
+                self.assistant = await self.request(
+                    "assistants.retrieve", self.client.beta.assistants.retrieve(self.assistant_id))
+            return False
+        self.assistant = await self.request("assistants.create", self.client.beta.assistants.create(
+            name="Super Assistant",
+            instructions=SUPER_ASSISTANT_INSTRUCTIONS,
+            model=MODEL_NAME,
+            tools=get_tool_definitions()
+        ))
+        self.assistant_id = self.assistant.id
+        return True
+
+    async def update_assistant_configuration(self) -> None:
+        """Update the assistant with current tools and instructions."""
+        self.assistant = await self.request("assistants.update", self.client.beta.assistants.update(
+            assistant_id=self.assistant_id,
+            instructions=SUPER_ASSISTANT_INSTRUCTIONS,
+            tools=get_tool_definitions(),
+            model=MODEL_NAME
+        ))
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    @staticmethod
+    async def request(operation: str, call: Awaitable[T]) -> T:
+        """Await one OpenAI API call, timing it by operation and outcome."""
+        with OPENAI_REQUEST_SECONDS.time(operation=operation, outcome="error") as labels:
+            result = await call
+            labels["outcome"] = "ok"
+            return result
+
+    async def cancel_active_runs(self, conversation: Conversation) -> None:
+        """Cancel any active runs on the conversation's thread."""
+        if not conversation.thread_id:
+            return
+        try:
+            runs = await self.request("runs.list",
+                                      self.client.beta.threads.runs.list(thread_id=conversation.thread_id))
+            for run in runs.data:
+                if run.status in ACTIVE_RUN_STATUSES:
+                    try:
+                        await self.request("runs.cancel", self.client.beta.threads.runs.cancel(
+                            thread_id=conversation.thread_id, run_id=run.id))
+                    except Exception:
+                        pass
+        except Exception:
+            pass
+
+    async def send_message(self, conversation: Conversation, text: str,
+                           handler: Optional[TurnHandler] = None) -> Optional[str]:
+        """
+        Add a user message to the conversation and run the assistant on it.
+
+        Args:
+            conversation: Conversation to continue; its thread is created if needed
+            text: The user's message
+            handler: Receives the reply and status messages as the turn runs
+        Returns:
+            Optional[str]: The assistant's reply, or None if the run did not complete
+        """
+        handler = handler or TurnHandler()
+        async with conversation.lock:
+            if conversation.thread_id is None:
+                thread = await self.request("threads.create", self.client.beta.threads.create())
+                conversation.thread_id = thread.id
+            else:
+                await self.cancel_active_runs(conversation)
+            await self.request("messages.create", self.client.beta.threads.messages.create(
+                thread_id=conversation.thread_id,
+                role="user",
+                content=text
+            ))
+            return await self.run_turn(conversation, handler)
+
+    async def run_turn(self, conversation: Conversation, handler: TurnHandler) -> Optional[str]:
+        """Run the assistant on the thread, streaming when enabled and polling otherwise."""
+        mode = "streaming" if self.streaming else "polling"
+        timing = {"mode": mode, "start": time.perf_counter(), "first_token_ms": None,
+                  "tool_rounds": 0, "events": 0}
+        try:
+            if mode == "streaming":
+                try:
+                    return await self.stream_run(conversation, handler, timing)
+                except Exception as e:
+                    if timing["events"]:
+                        raise
+                    # The stream never started, so fall back to polling for this engine
+                    handler.on_status(f"Streaming unavailable ({str(e)}), falling back to polling.")
+                    self.streaming = False
+                    await self.cancel_active_runs(conversation)
+                    timing["mode"] = "polling"
+            return await self.poll_run(conversation, handler, timing)
+        finally:
+            handler.close()
+            self.record_turn_timing(timing)
+            TURN_SECONDS.observe(timing["total_ms"] / 1000, mode=timing["mode"])
+
+    async def submit_tool_outputs(self, run: Any, handler: TurnHandler) -> List[Dict[str, Any]]:
+        """Execute the tool calls a run is waiting on and report which tools were used."""
+        tool_outputs = await handle_tool_calls_async(run)
+        handler.on_tool_calls([call.function.name for call in run.required_action.submit_tool_outputs.tool_calls])
+        return tool_outputs
+
+    async def stream_run(self, conversation: Conversation, handler: TurnHandler,
+                         timing: Dict[str, Any]) -> Optional[str]:
+        """
+        Create a run and consume its event stream until it finishes.
+
+        Tool calls are handled as soon as the run requires action and assistant
+        text is passed to the handler as it arrives.
+
+        Args:
+            conversation: Conversation whose thread is run
+            handler: Receives text deltas and status messages
+            timing: Turn timing record; first_token_ms is filled in here
+        Returns:
+            Optional[str]: The assistant's reply, or None if the run did not complete
+        """
+        text = ""
+        stream_manager = self.client.beta.threads.runs.stream(
+            thread_id=conversation.thread_id,
+            assistant_id=self.assistant.id
+        )
+        while stream_manager is not None:
+            run = None
+            with RUN_WAIT_SECONDS.time(mode="streaming"):
+                async with stream_manager as stream:
+                    stream_manager = None
+                    async for event in stream:
+                        timing["events"] += 1
+                        if event.event == "thread.message.delta":
+                            for block in event.data.delta.content or []:
+                                if block.type == "text" and block.text and block.text.value:
+                                    if timing["first_token_ms"] is None:
+                                        timing["first_token_ms"] = (time.perf_counter() - timing["start"]) * 1000
+                                    text += block.text.value
+                                    handler.on_text_delta(block.text.value)
+
+                        elif event.event == "thread.run.requires_action":
+                            # The run is paused; close the stream and run the tools outside the wait span
+                            run = event.data
+                            break
+
+                        elif event.event == "thread.run.completed":
+                            record_run_usage(event.data)
+                            return text
+
+                        elif event.event in ("thread.run.failed", "thread.run.cancelled", "thread.run.expired"):
+                            handler.on_status(f"Run ended with status: {event.data.status}")
+                            return None
+            if run is None:
+                break
+            try:
+                tool_outputs = await self.submit_tool_outputs(run, handler)
+            except Exception as e:
+                handler.on_status(f"Error handling tool calls: {str(e)}")
+                return None
+            timing["tool_rounds"] += 1
+            stream_manager = self.client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=conversation.thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs
+            )
+        return text or None
+
+    async def wait_for_completion(self, conversation: Conversation, run_id: str,
+                                  handler: TurnHandler, timing: Dict[str, Any]) -> Optional[Any]:
+        """Wait for a run to complete and handle any required actions."""
+        waiting_since = time.perf_counter()
+        while True:
+            run = await self.request("runs.retrieve", self.client.beta.threads.runs.retrieve(
+                thread_id=conversation.thread_id, run_id=run_id))
+            if run.status not in ("in_progress", "queued"):
+                RUN_WAIT_SECONDS.observe(time.perf_counter() - waiting_since, mode="polling")
+
+            if run.status == "requires_action":
+                try:
+                    tool_outputs = await self.submit_tool_outputs(run, handler)
+                    run = await self.request(
+                        "runs.submit_tool_outputs",
+                        self.client.beta.threads.runs.submit_tool_outputs(
+                            thread_id=conversation.thread_id,
+                            run_id=run_id,
+                            tool_outputs=tool_outputs
+                        ))
+                    timing["tool_rounds"] += 1
+                except Exception as e:
+                    handler.on_status(f"Error handling tool calls: {str(e)}")
+                    return None
+                waiting_since = time.perf_counter()
+
+            elif run.status == "completed":
+                record_run_usage(run)
+                return run
+
+            elif run.status in ["failed", "cancelled", "expired"]:
+                handler.on_status(f"Run ended with status: {run.status}")
+                return None
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def poll_run(self, conversation: Conversation, handler: TurnHandler,
+                       timing: Dict[str, Any]) -> Optional[str]:
+        """
+        Create a run, poll it to completion and pass the reply to the handler.
+
+        Args:
+            conversation: Conversation whose thread is run
+            handler: Receives the reply and status messages
+            timing: Turn timing record; first_token_ms is filled in here
+        Returns:
+            Optional[str]: The assistant's reply, or None if the run did not complete
+        """
+        run = await self.request("runs.create", self.client.beta.threads.runs.create(
+            thread_id=conversation.thread_id,
+            assistant_id=self.assistant.id
+        ))
+
+        if not await self.wait_for_completion(conversation, run.id, handler, timing):
+            return None
+        messages = await self.request("messages.list",
+                                      self.client.beta.threads.messages.list(thread_id=conversation.thread_id))
+        for message in messages.data:
+            if message.role == "assistant":
+                text = message.content[0].text.value
+                timing["first_token_ms"] = (time.perf_counter() - timing["start"]) * 1000
+                handler.on_message(text)
+                return text
+        return None
+
+    def record_turn_timing(self, timing: Dict[str, Any]) -> None:
+        """Store time-to-first-token and total latency for a finished turn."""
+        timing["total_ms"] = (time.perf_counter() - timing.pop("start")) * 1000
+        self.turn_timings.append(timing)
+        del self.turn_timings[:-MAX_TURN_TIMINGS]
+
+    def get_latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Average time-to-first-token and turn latency per execution mode."""
+        summary = {}
+        for mode in ("streaming", "polling"):
+            timings = [t for t in self.turn_timings if t["mode"] == mode]
+            if not timings:
+                continue
+            first_tokens = [t["first_token_ms"] for t in timings if t["first_token_ms"] is not None]
+            summary[mode] = {
+                "turns": len(timings),
+                "avg_first_token_ms": sum(first_tokens) / len(first_tokens) if first_tokens else 0.0,
+                "avg_total_ms": sum(t["total_ms"] for t in timings) / len(timings),
+            }
+        return summary
@@ -0,0 +1,86 @@
+"""
+Benchmark bulk event creation and updates against a local fake Calendar server.
+
+Compares one create_event / update_event call per event (what the model had
+to do before) with a single batch_events call for a semester-style schedule.
+
+Usage:
+    python -m benchmarks.bench_batch_events [--events 45] [--latency 0.05]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeCalendar, FakeGoogleServer, build_fake_service
+from tools.google_services import get_service_manager
+from tools.calendar_tools import create_event, update_event, batch_events
+
+
+def schedule(count: int, first: datetime):
+    """Three classes a week, as a semester schedule would be entered."""
+    for number in range(count):
+        start = first + timedelta(weeks=number // 3, days=2 * (number % 3))
+        yield {
+            'event_id': '', 'etag': '', 'summary': f"Lecture {number + 1}",
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(minutes=90)).isoformat(),
+            'description': '', 'location': 'Hall B', 'attendees': '',
+        }
+
+
+def run(count: int, latency: float) -> None:
+    calendar = FakeCalendar(calendar_count=1, events_per_calendar=100, days=30)
+    server = FakeGoogleServer(latency=latency, calendar=calendar).start()
+    os.environ['CALENDAR_CACHE'] = 'false'
+    try:
+        get_service_manager().install_service('calendar', 'v3', build_fake_service('calendar', 'v3', server.url))
+        specs = list(schedule(count, datetime(2031, 1, 13, 10, 0)))
+        existing = list(calendar.events['primary'])[:count]
+        print(f"Fake Calendar at {server.url}: {count} events, "
+              f"latency {latency * 1000:.0f} ms per round trip\n")
+        print(f"{'approach':<30} {'ms':>10} {'round trips':>12}")
+
+        def one_by_one_create():
+            return [create_event('primary', s['summary'], s['start_time'], s['end_time'], '', s['location'], '')
+                    for s in specs]
+
+        def one_by_one_update():
+            return [update_event('primary', event_id, f"Moved {n}", '', '', '', '') for n, event_id in enumerate(existing)]
+
+        def batch_update():
+            return batch_events('primary', [dict(specs[0], event_id=event_id, summary=f"Renamed {n}",
+                                                 start_time='', end_time='', location='')
+                                            for n, event_id in enumerate(existing)])
+
+        cases = [
+            ('create_event per event', one_by_one_create),
+            ('batch_events (create)', lambda: batch_events('primary', specs)),
+            ('update_event per event', one_by_one_update),
+            ('batch_events (update)', batch_update),
+        ]
+        for name, call in cases:
+            server.reset_counters()
+            start = time.perf_counter()
+            result = str(call())
+            elapsed = (time.perf_counter() - start) * 1000
+            if 'Error' in result or (name.startswith('batch') and '"failed":0' not in result):
+                raise RuntimeError(result[:500])
+            print(f"{name:<30} {elapsed:>10.1f} {server.http_requests:>12}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=45, help='Events created and updated per approach')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per HTTP round trip')
+    args = parser.parse_args()
+    run(args.events, args.latency)
+
+
+if __name__ == "__main__":
+    main()
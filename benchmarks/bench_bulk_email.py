@@ -0,0 +1,60 @@
+"""
+Benchmark bulk trash and label changes against a local fake Gmail server.
+
+Compares one delete_email call per message (what the model had to do
+before) with a single trash_emails call, and marking messages read with
+modify_emails.
+
+Usage:
+    python -m benchmarks.bench_bulk_email [--messages 200] [--latency 0.05]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeMailbox, FakeGoogleServer, build_fake_service
+from tools.google_services import get_service_manager
+from tools.gmail_tools import delete_email, trash_emails, modify_emails
+
+
+def run(count: int, latency: float) -> None:
+    mailbox = FakeMailbox(message_count=count * 3)
+    server = FakeGoogleServer(mailbox=mailbox, latency=latency).start()
+    os.environ['MAILBOX_MIRROR'] = 'false'
+    try:
+        get_service_manager().install_service('gmail', 'v1', build_fake_service('gmail', 'v1', server.url))
+        batches = [mailbox.order[i * count:(i + 1) * count] for i in range(3)]
+        print(f"Fake Gmail at {server.url}: {count} messages per case, "
+              f"latency {latency * 1000:.0f} ms per round trip\n")
+        print(f"{'approach':<30} {'ms':>10} {'round trips':>12}")
+        cases = [
+            ('delete_email per message', lambda ids: [delete_email(i) for i in ids]),
+            ('trash_emails', lambda ids: trash_emails(','.join(ids), '', count)),
+            ('modify_emails (mark read)', lambda ids: modify_emails(','.join(ids), '', '', 'UNREAD', count)),
+        ]
+        for (name, call), ids in zip(cases, batches):
+            server.reset_counters()
+            start = time.perf_counter()
+            result = call(ids)
+            elapsed = (time.perf_counter() - start) * 1000
+            if 'Error' in str(result) or 'failed' in str(result):
+                raise RuntimeError(str(result)[:500])
+            print(f"{name:<30} {elapsed:>10.1f} {server.http_requests:>12}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200, help='Messages changed per approach')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per HTTP round trip')
+    args = parser.parse_args()
+    run(args.messages, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measure one-shot commands through the resident daemon against a cold start.
+
+Both sides run against a local fake Assistants API and answer one message
+from a fresh interpreter, timed from process start to exit:
+- cold: import main, create the AssistantManager, wait for the assistant and
+  run the turn, which is what "python main.py" costs for a single question
+- daemon: "python client.py <message>" against a daemon started beforehand
+
+Usage:
+    python -m benchmarks.bench_daemon [--runs 5] [--latency 0.1] [--budget-ms 1000]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai import FakeAssistantsAPI, FakeOpenAIServer
+from client import is_running
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGE = "What's on my calendar today?"
+COLD_CHILD = """
+import sys
+import main
+manager = main.AssistantManager()
+manager.wait_until_ready()
+manager.run_turn(sys.argv[1])
+manager.close()
+"""
+
+
+def child_environment(url: str, directory: str) -> Dict[str, str]:
+    env = dict(os.environ, OPENAI_API_KEY='fake', OPENAI_BASE_URL=url, ASSISTANT_ID='asst_daemon',
+               DAEMON_SOCKET=os.path.join(directory, 'daemon.sock'), PYTHONPATH=ROOT)
+    env.pop('METRICS_FILE', None)
+    return env
+
+
+def timed(command: List[str], directory: str, env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(runs: int, latency: float, budget_ms: float) -> bool:
+    server = FakeOpenAIServer(FakeAssistantsAPI(), latency=latency).start()
+    try:
+        print(f"Fake Assistants API {latency * 1000:.0f} ms per request, {runs} one-shot commands each\n")
+        samples: Dict[str, List[float]] = {}
+        with tempfile.TemporaryDirectory() as directory:
+            env = child_environment(server.url, directory)
+            samples['cold'] = [timed([sys.executable, '-c', COLD_CHILD, MESSAGE], directory, env)
+                               for _ in range(runs)]
+
+            daemon = subprocess.Popen([sys.executable, os.path.join(ROOT, 'daemon.py'), 'serve'], cwd=directory,
+                                      env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            try:
+                deadline = time.monotonic() + 30
+                while not is_running(env['DAEMON_SOCKET']):
+                    if daemon.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError(f"The daemon did not start: {daemon.stderr.read().decode()}")
+                    time.sleep(0.05)
+                client = [sys.executable, os.path.join(ROOT, 'client.py'), MESSAGE]
+                server.reset_counters()
+                samples['daemon'] = [timed(client, directory, env) for _ in range(runs)]
+                calls = dict(server.api_calls)
+            finally:
+                daemon.terminate()
+                daemon.wait(timeout=30)
+
+        print(f"{'':>8} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+        for name, values in samples.items():
+            print(f"{name:>8} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+        per_command = ", ".join(f"{name} {count / runs:g}" for name, count in sorted(calls.items()))
+        print(f"\nOpenAI requests per daemon command: {per_command or 'none'}")
+
+        median = statistics.median(samples['daemon'])
+        if budget_ms and median > budget_ms:
+            print(f"\nFAIL: median daemon command {median:.0f} ms is over the {budget_ms:g} ms budget")
+            return False
+        return True
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='One-shot commands per side')
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds per fake OpenAI request')
+    parser.add_argument('--budget-ms', type=float, default=0,
+                        help='Exit with an error when the median daemon command exceeds this')
+    args = parser.parse_args()
+    if not run(args.runs, args.latency, args.budget_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
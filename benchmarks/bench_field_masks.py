@@ -0,0 +1,83 @@
+"""
+Benchmark partial responses against local fake Gmail and Calendar servers.
+
+Runs read tools with and without their `fields` masks (GOOGLE_FIELD_MASKS)
+and reports the response bytes per call and the median time per call. With
+no simulated latency the time is local work: building the request, sending
+and decoding the JSON on both ends.
+
+Usage:
+    python -m benchmarks.bench_field_masks [--latency 0] [--repeat 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeCalendar, FakeGoogleServer, FakeMailbox, build_fake_service
+from tools.google_services import get_service_manager
+from tools.metrics import GOOGLE_HTTP_BYTES
+from tools.calendar_tools import list_calendars, list_events, list_all_events, get_event
+from tools.gmail_tools import list_emails, read_email
+
+
+def received_bytes() -> float:
+    return sum(amount for key, amount in GOOGLE_HTTP_BYTES.snapshot().items() if dict(key)['direction'] == 'received')
+
+
+def run(latency: float, repeat: int) -> None:
+    mailbox = FakeMailbox(message_count=200)
+    calendar = FakeCalendar(calendar_count=4, events_per_calendar=300, days=14)
+    server = FakeGoogleServer(mailbox=mailbox, calendar=calendar, latency=latency).start()
+    os.environ.update({'CALENDAR_CACHE': 'false', 'MAILBOX_MIRROR': 'false', 'MESSAGE_CACHE': 'false'})
+    try:
+        for api, version in (('gmail', 'v1'), ('calendar', 'v3')):
+            get_service_manager().install_service(api, version, build_fake_service(api, version, server.url))
+        now = datetime.now(timezone.utc)
+        window = {'time_min': now.isoformat(), 'time_max': (now + timedelta(days=14)).isoformat()}
+        event_id = next(iter(calendar.events['primary']))
+        cases = [
+            ('list_calendars', list_calendars),
+            ('list_events (50)', lambda: list_events('primary', 50, query='', **window)),
+            ('list_all_events (50)', lambda: list_all_events('', 50, query='', **window)),
+            ('get_event', lambda: get_event('primary', event_id)),
+            ('list_emails (20)', lambda: list_emails(20)),
+            ('read_email', lambda: read_email(mailbox.order[0])),
+        ]
+        print(f"Fake Gmail and Calendar at {server.url}, latency {latency * 1000:.0f} ms per round trip\n")
+        print(f"{'tool':<22} {'full KB':>8} {'masked KB':>10} {'full ms':>8} {'masked ms':>10}")
+        for name, call in cases:
+            row = []
+            for masks in ('false', 'true'):
+                os.environ['GOOGLE_FIELD_MASKS'] = masks
+                call()
+                before, timings = received_bytes(), []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    result = call()
+                    timings.append((time.perf_counter() - start) * 1000)
+                    if result.startswith('Error'):
+                        raise RuntimeError(result)
+                row.append(((received_bytes() - before) / repeat / 1024, statistics.median(timings)))
+            (full_kb, full_ms), (masked_kb, masked_ms) = row
+            print(f"{name:<22} {full_kb:>8.1f} {masked_kb:>10.1f} {full_ms:>8.2f} {masked_ms:>10.2f}")
+    finally:
+        os.environ.pop('GOOGLE_FIELD_MASKS', None)
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per HTTP round trip')
+    parser.add_argument('--repeat', type=int, default=20, help='Calls per tool and setting')
+    args = parser.parse_args()
+    run(args.latency, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the interval index behind find_free_slots.
+
+Generates dense synthetic calendars (several calendars and attendees over a
+multi-month range) and times building the index, finding free slots within
+working hours, listing conflicts and single overlap checks.
+
+Usage:
+    python -m benchmarks.bench_free_slots [--events 5000] [--days 180] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, time as day_time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.intervals import IntervalIndex, working_windows, free_slots
+
+ZONE = ZoneInfo('America/Los_Angeles')
+SOURCES = ['primary', 'team@example.com', 'alice@example.com', 'bob@example.com']
+
+
+def generate_intervals(count: int, start: datetime, days: int, seed: int = 3):
+    rng = random.Random(seed)
+    span = days * 86400
+    base = start.timestamp()
+    for number in range(count):
+        begin = base + rng.randrange(0, span, 900)
+        length = rng.choice([900, 1800, 1800, 3600, 3600, 5400, 7200])
+        yield begin, begin + length, f"event {number}", rng.choice(SOURCES)
+
+
+def timed(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(timings)
+
+
+def run(count: int, days: int, repeat: int) -> None:
+    start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+    end = start + timedelta(days=days)
+    intervals = list(generate_intervals(count, start, days))
+
+    def build():
+        index = IntervalIndex()
+        for interval in intervals:
+            index.add(*interval)
+        index.overlapping(0, 0)  # force the sort
+        return index
+
+    index, build_ms = timed(build, repeat)
+    windows = working_windows(start, end, ZONE, day_time(9), day_time(17))
+    slots, slots_ms = timed(lambda: free_slots(index, windows, 3600), repeat)
+    first, first_ms = timed(lambda: free_slots(index, windows, 3600, 10), repeat)
+    pairs, conflicts_ms = timed(lambda: index.conflicts(start.timestamp(), end.timestamp()), repeat)
+    probe = start.timestamp() + days * 43200
+    hits, overlap_ms = timed(lambda: index.overlapping(probe, probe + 3600), repeat)
+
+    print(f"{count} events over {days} days across {len(SOURCES)} calendars\n")
+    print(f"{'operation':<32} {'result':>8} {'median ms':>10}")
+    print(f"{'build index':<32} {len(index):>8} {build_ms:>10.2f}")
+    print(f"{'all 1h free slots (9-17, M-F)':<32} {len(slots):>8} {slots_ms:>10.2f}")
+    print(f"{'first 10 free slots':<32} {len(first):>8} {first_ms:>10.2f}")
+    print(f"{'conflicting pairs':<32} {len(pairs):>8} {conflicts_ms:>10.2f}")
+    print(f"{'overlap check for one event':<32} {len(hits):>8} {overlap_ms:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=5000, help='Busy intervals to generate')
+    parser.add_argument('--days', type=int, default=180, help='Length of the range in days')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per operation')
+    args = parser.parse_args()
+    run(args.events, args.days, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark merged multi-calendar listing against a local fake Calendar server.
+
+Compares calling list_events once per calendar (what the model had to do
+before) with a single list_all_events call, fetching calendars one at a time
+and concurrently.
+
+Usage:
+    python -m benchmarks.bench_list_all_events [--calendars 6] [--latency 0.05] [--repeat 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeCalendar, FakeGoogleServer, build_fake_service
+from tools.google_services import get_service_manager
+from tools.calendar_tools import list_calendars, list_events, list_all_events
+
+
+def per_calendar(calendar_ids, max_results):
+    list_calendars()
+    return [list_events(calendar_id, max_results, '', '', '') for calendar_id in calendar_ids]
+
+
+def run(calendar_count: int, latency: float, repeat: int, max_results: int) -> None:
+    calendar = FakeCalendar(calendar_count=calendar_count, events_per_calendar=400, days=14)
+    server = FakeGoogleServer(latency=latency, calendar=calendar).start()
+    os.environ['CALENDAR_CACHE'] = 'false'
+    try:
+        get_service_manager().install_service('calendar', 'v3', build_fake_service('calendar', 'v3', server.url))
+        calendar_ids = list(calendar.calendars)
+        print(f"Fake Calendar at {server.url}: {calendar_count} calendars, "
+              f"latency {latency * 1000:.0f} ms per round trip\n")
+        print(f"{'approach':<34} {'median ms':>10} {'round trips':>12}")
+        cases = [
+            ('list_events per calendar', {}, lambda: per_calendar(calendar_ids, max_results)),
+            ('list_all_events, 1 at a time', {'CALENDAR_FETCH_CONCURRENCY': '1'},
+             lambda: list_all_events('', max_results, '', '', '')),
+            ('list_all_events, concurrent', {'CALENDAR_FETCH_CONCURRENCY': '8'},
+             lambda: list_all_events('', max_results, '', '', '')),
+        ]
+        for name, settings, call in cases:
+            os.environ.update(settings)
+            timings = []
+            for _ in range(repeat):
+                server.reset_counters()
+                start = time.perf_counter()
+                result = call()
+                timings.append((time.perf_counter() - start) * 1000)
+                if str(result).startswith('Error'):
+                    raise RuntimeError(result)
+            print(f"{name:<34} {statistics.median(timings):>10.1f} {server.http_requests:>12}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calendars', type=int, default=6, help='Number of calendars')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per HTTP round trip')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per approach')
+    parser.add_argument('--max-results', type=int, default=50, help='Events requested')
+    args = parser.parse_args()
+    run(args.calendars, args.latency, args.repeat, args.max_results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark list_emails metadata fetching against a local fake Gmail server.
+
+Compares the old one-request-per-message behaviour (sequential) with the
+batch endpoint and the bounded concurrent fetcher as max_results grows.
+
+Usage:
+    python -m benchmarks.bench_list_emails [--latency 0.02] [--repeat 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, build_fake_service
+from tools.google_services import get_service_manager
+from tools.gmail_tools import list_emails
+
+MODES = {
+    'sequential': {'GMAIL_FETCH_MODE': 'concurrent', 'GMAIL_FETCH_CONCURRENCY': '1'},
+    'batch': {'GMAIL_FETCH_MODE': 'batch', 'GMAIL_BATCH_SIZE': '50', 'GMAIL_FETCH_CONCURRENCY': '4'},
+    'concurrent': {'GMAIL_FETCH_MODE': 'concurrent', 'GMAIL_FETCH_CONCURRENCY': '8'},
+}
+
+
+def run(sizes, latency: float, repeat: int) -> None:
+    server = FakeGoogleServer(latency=latency).start()
+    try:
+        get_service_manager().install_service('gmail', 'v1', build_fake_service('gmail', 'v1', server.url))
+        print(f"Fake Gmail at {server.url} (latency {latency * 1000:.0f} ms per round trip)\n")
+        print(f"{'max_results':>11} {'mode':>11} {'median ms':>10} {'round trips':>12}")
+        for size in sizes:
+            for mode, settings in MODES.items():
+                os.environ.update(settings)
+                timings = []
+                for _ in range(repeat):
+                    server.reset_counters()
+                    start = time.perf_counter()
+                    result = list_emails(max_results=size, query="")
+                    timings.append((time.perf_counter() - start) * 1000)
+                    if result.startswith('Error'):
+                        raise RuntimeError(result)
+                print(f"{size:>11} {mode:>11} {statistics.median(timings):>10.1f} {server.http_requests:>12}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per HTTP round trip')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per configuration')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    args = parser.parse_args()
+    run(args.sizes, args.latency, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark send_email sent directly against send_email through the outbox.
+
+A fake Gmail takes --send-latency seconds per messages.send, and a share of
+sends (--lost) are delivered but answered 503, as when the response is lost on
+the way back. Each setting makes --emails send_email calls under the tool's
+retry policy:
+- direct: EMAIL_OUTBOX=false; the tool call waits for messages.send
+- outbox: EMAIL_OUTBOX=true; the tool call queues the message and the
+  background worker sends it, retrying with the Message-ID check
+
+The table shows send_email latency, tool calls that reported an error, how
+many distinct emails reached the mailbox, duplicates, and the seconds until
+the last email was sent.
+
+Usage:
+    python -m benchmarks.bench_outbox [--emails 20] [--send-latency 0.5] [--lost 0.1]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, FakeMailbox, build_fake_service
+from benchmarks.suite import is_failure, tool_retry_scope
+from server import percentile
+from tools import outbox
+from tools.google_services import get_service_manager
+from tools.gmail_tools import send_email
+from tools.storage import use_workspace
+
+SETTINGS = {'direct': 'false', 'outbox': 'true'}
+
+
+def run_setting(server: FakeGoogleServer, emails: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    failed = 0
+    with tempfile.TemporaryDirectory() as workspace, use_workspace(workspace):
+        get_service_manager().install_service('gmail', 'v1', build_fake_service('gmail', 'v1', server.url))
+        before = set(server.mailbox.messages)
+        start = time.perf_counter()
+        for index in range(emails):
+            call_start = time.perf_counter()
+            with tool_retry_scope('send_email'):
+                output = send_email(f"person{index}@example.com", f"Update {index}", f"Body of update {index}.", "plain")
+            latencies.append((time.perf_counter() - call_start) * 1000)
+            failed += is_failure(output)
+        outbox.flush_outbox(timeout=120)
+        drained = time.perf_counter() - start
+    subjects = Counter(server.mailbox.header(i, 'subject') for i in server.mailbox.messages if i not in before)
+    return {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95), 'failed': failed,
+            'delivered': len(subjects), 'duplicates': sum(subjects.values()) - len(subjects), 'drained': drained}
+
+
+def run(emails: int, send_latency: float, lost: float, latency: float) -> None:
+    server = FakeGoogleServer(mailbox=FakeMailbox(message_count=50), latency=latency,
+                              send_latency=send_latency, lost_send_rate=lost).start()
+    names = ('EMAIL_OUTBOX', 'OUTBOX_SENDS_PER_MINUTE', 'OUTBOX_SEND_BURST')
+    # Retry lost sends after a short wait rather than the production backoff
+    initial_backoff = outbox.INITIAL_BACKOFF_SECONDS
+    outbox.INITIAL_BACKOFF_SECONDS = 0.1
+    os.environ.update({'OUTBOX_SENDS_PER_MINUTE': '6000', 'OUTBOX_SEND_BURST': str(emails), 'TOOL_CACHE': 'false'})
+    try:
+        print(f"Fake Gmail taking {send_latency * 1000:.0f} ms per send, {lost:.0%} of sends answered 503 "
+              f"after delivery, {emails} send_email calls\n")
+        print(f"{'setting':<8} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7} {'delivered':>10} {'dupes':>6} {'sent by s':>10}")
+        for name, enabled in SETTINGS.items():
+            os.environ['EMAIL_OUTBOX'] = enabled
+            row = run_setting(server, emails)
+            print(f"{name:<8} {row['p50']:>8.1f} {row['p95']:>8.1f} {row['failed']:>7} {row['delivered']:>10} "
+                  f"{row['duplicates']:>6} {row['drained']:>10.2f}")
+    finally:
+        for variable in names:
+            os.environ.pop(variable, None)
+        outbox.INITIAL_BACKOFF_SECONDS = initial_backoff
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=20, help='send_email calls per setting')
+    parser.add_argument('--send-latency', type=float, default=0.5, help='Extra seconds per messages.send')
+    parser.add_argument('--lost', type=float, default=0.1, help='Share of sends delivered but answered 503')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per HTTP round trip')
+    args = parser.parse_args()
+    run(args.emails, args.send_latency, args.lost, args.latency)
+
+
+if __name__ == "__main__":
+    main()
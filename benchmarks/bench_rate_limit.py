@@ -0,0 +1,127 @@
+"""
+Benchmark quota pacing against a fake Gmail that enforces a per-user quota.
+
+Several tool calls (list_emails) run at once while a background mirror sync
+loads the mailbox, all on one user's quota. Over the quota, the fake answers
+429 with Retry-After. Three settings are compared:
+- off: GOOGLE_RATE_LIMIT=false, so requests go out as fast as they are made
+- paced: the buckets are set to the fake's quota
+- adaptive: the buckets allow five times the fake's burst, and 429s have to
+  slow them down
+
+For each setting the table shows the 429s the fake sent, the tool calls that
+still failed after retries, the tool call latency and how long the sync took.
+
+Usage:
+    python -m benchmarks.bench_rate_limit [--quota 500] [--users 4] [--calls 3] [--sync 300]
+"""
+
+import argparse
+import contextvars
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, FakeMailbox, build_fake_service
+from benchmarks.suite import is_failure, tool_retry_scope
+from server import percentile
+from tools.google_services import get_service_manager
+from tools.gmail_tools import list_emails
+from tools.mailbox import get_mailbox_store, sync_mailbox
+from tools.quota import reset_buckets
+from tools.retries import IDEMPOTENT_RETRY, retry_scope
+from tools.storage import use_workspace
+
+SETTINGS = {
+    'off': lambda quota: {'GOOGLE_RATE_LIMIT': 'false'},
+    'paced': lambda quota: {'GMAIL_QUOTA_PER_SECOND': str(quota), 'GMAIL_QUOTA_BURST': str(quota)},
+    'adaptive': lambda quota: {'GMAIL_QUOTA_PER_SECOND': str(quota), 'GMAIL_QUOTA_BURST': str(quota * 5)},
+}
+
+
+def run_setting(server: FakeGoogleServer, users: int, calls: int, sync_limit: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    failures = []
+    sync_seconds = []
+
+    def interactive():
+        for _ in range(calls):
+            start = time.perf_counter()
+            with tool_retry_scope('list_emails'):
+                output = list_emails(20)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if is_failure(output):
+                failures.append(output)
+
+    def background():
+        start = time.perf_counter()
+        try:
+            with retry_scope('mailbox_sync', IDEMPOTENT_RETRY):
+                sync_mailbox(get_service_manager().get_service('gmail', 'v1', [], 'Gmail'), get_mailbox_store())
+        except Exception as e:
+            failures.append(str(e))
+        sync_seconds.append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as workspace, use_workspace(workspace):
+        os.environ['MAILBOX_SYNC_LIMIT'] = str(sync_limit)
+        get_service_manager().install_service('gmail', 'v1', build_fake_service('gmail', 'v1', server.url))
+        # A fresh quota on both sides
+        time.sleep(1.0)
+        server.reset_counters()
+        start = time.perf_counter()
+        # Each thread runs in a copy of this context, so it uses the workspace set above
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(target,))
+                   for target in [background] + [interactive] * users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    if failures:
+        print(f"  first failure: {str(failures[0])[:200]}")
+    return {'throttled': server.throttled, 'failed': len(failures), 'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95), 'sync': sync_seconds[0], 'total': elapsed}
+
+
+def run(quota: float, users: int, calls: int, sync_limit: int, latency: float) -> None:
+    mailbox = FakeMailbox(message_count=max(sync_limit, 100) + 50)
+    server = FakeGoogleServer(mailbox=mailbox, latency=latency, gmail_quota=quota).start()
+    os.environ.update({'MESSAGE_CACHE': 'false', 'TOOL_CACHE': 'false', 'MAILBOX_MIRROR': 'false'})
+    names = ('GOOGLE_RATE_LIMIT', 'GMAIL_QUOTA_PER_SECOND', 'GMAIL_QUOTA_BURST', 'MAILBOX_SYNC_LIMIT')
+    try:
+        print(f"Fake Gmail with a quota of {quota:g} units/s, {users} users x {calls} list_emails(20) "
+              f"and a {sync_limit}-message background sync\n")
+        print(f"{'setting':<10} {'429s':>6} {'failed':>7} {'p50 ms':>8} {'p95 ms':>8} {'sync s':>7} {'total s':>8}")
+        for name, settings in SETTINGS.items():
+            for variable in names:
+                os.environ.pop(variable, None)
+            os.environ.update(settings(quota))
+            reset_buckets()
+            row = run_setting(server, users, calls, sync_limit)
+            print(f"{name:<10} {row['throttled']:>6} {row['failed']:>7} {row['p50']:>8.0f} {row['p95']:>8.0f} "
+                  f"{row['sync']:>7.2f} {row['total']:>8.2f}")
+    finally:
+        for variable in names:
+            os.environ.pop(variable, None)
+        reset_buckets()
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quota', type=float, default=500, help='Gmail quota units per second of the fake')
+    parser.add_argument('--users', type=int, default=4, help='Tool calls running at once')
+    parser.add_argument('--calls', type=int, default=3, help='list_emails calls per user')
+    parser.add_argument('--sync', type=int, default=300, help='Messages the background sync loads')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per HTTP round trip')
+    args = parser.parse_args()
+    run(args.quota, args.users, args.calls, args.sync, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark search_emails queries against a synthetic local mailbox mirror.
+
+Builds a temporary mirror with a full-text index over a generated corpus and
+reports median and p95 latency for a set of representative queries.
+
+Usage:
+    python -m benchmarks.bench_search_emails [--messages 100000] [--repeat 50]
+"""
+
+import argparse
+import base64
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from email.utils import formatdate
+from typing import Any, Dict, Iterator, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import SENDERS, SUBJECT_WORDS
+from tools.mailbox import MailboxStore
+from tools.mail_search import parse_query
+
+BODY_WORDS = SUBJECT_WORDS + [
+    'budget', 'deadline', 'contract', 'review', 'travel', 'schedule', 'customer', 'renewal',
+    'shipping', 'receipt', 'password', 'welcome', 'agenda', 'minutes', 'feedback', 'release',
+]
+QUERIES = [
+    'invoice',
+    'from:alice@example.com',
+    'subject:"quarterly report"',
+    'from:billing has:attachment',
+    'contract renewal newer_than:30d',
+    'is:unread after:2024/01/01 -lunch',
+    'deadline schedule agenda',
+    'in:inbox is:starred',
+]
+CHUNK_SIZE = 5000
+
+
+def generate_messages(count: int, seed: int = 11) -> Iterator[Dict[str, Any]]:
+    """Yield Gmail message resources with varied headers, labels and bodies."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    for index in range(count):
+        sent = now - index * 600
+        subject = ' '.join(rng.choice(SUBJECT_WORDS) for _ in range(4))
+        body = ' '.join(rng.choice(BODY_WORDS) for _ in range(rng.randint(20, 120)))
+        labels = ['INBOX'] + (['UNREAD'] if index % 3 == 0 else []) + (['STARRED'] if index % 50 == 0 else [])
+        parts = [{'partId': '0', 'mimeType': 'text/plain', 'filename': '', 'headers': [],
+                  'body': {'size': len(body), 'data': base64.urlsafe_b64encode(body.encode()).decode()}}]
+        if index % 10 == 0:
+            parts.append({'partId': '1', 'mimeType': 'application/pdf', 'filename': f'file-{index}.pdf',
+                          'headers': [], 'body': {'size': 2048, 'attachmentId': f'att-{index}'}})
+        yield {
+            'id': f"{index + 1:016x}",
+            'threadId': f"{index // 3 + 1:016x}",
+            'labelIds': labels,
+            'snippet': body[:80],
+            'internalDate': str(sent * 1000),
+            'sizeEstimate': 1024 + len(body),
+            'historyId': str(1000 + index),
+            'payload': {
+                'mimeType': 'multipart/mixed',
+                'headers': [
+                    {'name': 'From', 'value': rng.choice(SENDERS)},
+                    {'name': 'To', 'value': 'me@example.com'},
+                    {'name': 'Subject', 'value': subject},
+                    {'name': 'Date', 'value': formatdate(sent)},
+                ],
+                'parts': parts,
+            },
+        }
+
+
+def build_store(path: str, count: int) -> MailboxStore:
+    store = MailboxStore(path)
+    chunk: List[Dict[str, Any]] = []
+    for message in generate_messages(count):
+        chunk.append(message)
+        if len(chunk) == CHUNK_SIZE:
+            store.store_messages(chunk)
+            chunk = []
+    if chunk:
+        store.store_messages(chunk)
+    return store
+
+
+def run(count: int, repeat: int, max_results: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'mailbox.db')
+        start = time.perf_counter()
+        store = build_store(path, count)
+        build_seconds = time.perf_counter() - start
+        size_mb = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+        print(f"Indexed {count} messages in {build_seconds:.1f} s ({size_mb:.0f} MB on disk)\n")
+        print(f"{'query':<38} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                results = store.search(*parse_query(query), max_results)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{query:<38} {len(results):>5} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+        store.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100_000, help='Size of the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=50, help='Runs per query')
+    parser.add_argument('--max-results', type=int, default=10, help='max_results passed to each search')
+    args = parser.parse_args()
+    run(args.messages, args.repeat, args.max_results)
+
+
+if __name__ == "__main__":
+    main()
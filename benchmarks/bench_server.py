@@ -0,0 +1,140 @@
+"""
+Load-test the multi-user server with simulated users.
+
+Starts the server in-process on a fake OpenAI client and a local fake Gmail
+server. Every user has their own workspace and thread, and sends a message,
+reads the reply and pauses for the think time before the next one; each turn
+makes one list_emails tool call. For each user count the table shows turn
+latency percentiles as seen by the client, turns per second, how many
+requests were rejected and the CPU used by the whole process (server, fake
+services and simulated clients). Latency should stay flat until CPU nears 100%.
+
+Usage:
+    python -m benchmarks.bench_server [--users 1,10,50,100,200] [--turns 5] [--think 1.0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assistant_engine
+from assistant_engine import AsyncAssistantEngine
+from benchmarks.fake_google import FakeMailbox, FakeGoogleServer, build_fake_service
+from benchmarks.fake_openai import FakeAssistantsAPI, FakeAsyncOpenAI, ScriptedTurn
+from server import AssistantServer, TurnScheduler, hash_token, percentile, user_directory
+from tools.google_services import get_service_manager
+from tools.storage import use_workspace
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str,
+                  token: str, payload: Dict) -> Tuple[int, Dict]:
+    """Send one request on a keep-alive connection and read the JSON response."""
+    body = json.dumps(payload).encode()
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def simulate_user(port: int, token: str, turns: int, think: float,
+                        latencies: List[float], statuses: Dict[int, int]) -> None:
+    # Spread the first messages out so users do not all arrive at once
+    await asyncio.sleep(random.uniform(0, think))
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        for turn in range(turns):
+            if turn:
+                await asyncio.sleep(think)
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, 'POST', '/v1/messages', token,
+                                      {"message": f"Summarize my latest emails ({turn})"})
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+
+async def run_level(users: int, turns: int, think: float, openai_latency: float, workers: int, queue_size: int,
+                    gmail_service, data_directory: str) -> None:
+    script = lambda text: ScriptedTurn([[('list_emails', {'max_results': 3})]])
+    client = FakeAsyncOpenAI(FakeAssistantsAPI(script), latency=openai_latency)
+    engine = AsyncAssistantEngine(assistant_id='asst_fake', streaming=False, client=client)
+    await engine.start(update_configuration=False)
+    # A fresh directory per level, since the fake client does not know earlier levels' threads
+    data_directory = os.path.join(data_directory, f"level-{users}")
+    tokens = {f"token-{users}-{n}": f"user{n}" for n in range(users)}
+    for name in tokens.values():
+        with use_workspace(user_directory(data_directory, name)):
+            get_service_manager().install_service('gmail', 'v1', gmail_service)
+    server = AssistantServer(engine, {hash_token(t): name for t, name in tokens.items()}, data_directory,
+                             TurnScheduler(engine, workers=workers, queue_size=queue_size))
+    port = await server.start('127.0.0.1', 0)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        await asyncio.gather(*(simulate_user(port, token, turns, think, latencies, statuses) for token in tokens))
+    finally:
+        elapsed = time.perf_counter() - start
+        cpu = (time.process_time() - cpu_start) / elapsed * 100
+        await server.stop()
+    rejected = sum(count for status, count in statuses.items() if status != 200)
+    print(f"{users:>6} {len(latencies):>7} {percentile(latencies, 50):>10.1f} {percentile(latencies, 99):>10.1f} "
+          f"{len(latencies) / elapsed:>10.1f} {rejected:>9} {cpu:>7.0f}%")
+
+
+def run(user_counts: List[int], turns: int, think: float, openai_latency: float, google_latency: float,
+        workers: int, queue_size: int) -> None:
+    # The fake run finishes as soon as its tools are submitted, so poll quickly
+    assistant_engine.POLL_INTERVAL = openai_latency
+    os.environ['MAILBOX_MIRROR'] = 'false'
+    os.environ['TOOL_CACHE'] = 'false'
+    os.environ['MESSAGE_CACHE'] = 'false'
+    server = FakeGoogleServer(mailbox=FakeMailbox(message_count=200), latency=google_latency).start()
+    try:
+        gmail_service = build_fake_service('gmail', 'v1', server.url)
+        print(f"Fake OpenAI {openai_latency * 1000:.0f} ms and Gmail {google_latency * 1000:.0f} ms per call, "
+              f"{turns} turns per user, {think:g}s think time, {workers} workers, queue of {queue_size}\n")
+        print(f"{'users':>6} {'turns':>7} {'p50 ms':>10} {'p99 ms':>10} {'turns/s':>10} {'rejected':>9} {'cpu':>8}")
+        with tempfile.TemporaryDirectory() as data_directory:
+            for users in user_counts:
+                asyncio.run(run_level(users, turns, think, openai_latency, workers, queue_size,
+                                      gmail_service, data_directory))
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', default='1,10,50,100,200', help='Comma-separated concurrent user counts')
+    parser.add_argument('--turns', type=int, default=5, help='Messages each user sends')
+    parser.add_argument('--think', type=float, default=1.0, help="Seconds between a user's messages")
+    parser.add_argument('--openai-latency', type=float, default=0.2, help='Seconds per OpenAI call')
+    parser.add_argument('--google-latency', type=float, default=0.05, help='Seconds per Gmail round trip')
+    parser.add_argument('--workers', type=int, default=256, help='Server turn workers')
+    parser.add_argument('--queue-size', type=int, default=256, help='Server queue size')
+    args = parser.parse_args()
+    run([int(n) for n in args.users.split(',')], args.turns, args.think, args.openai_latency,
+        args.google_latency, args.workers, args.queue_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Measure cold start of the terminal assistant against a local fake Assistants API.
+
+Every run starts a fresh interpreter that imports main, creates the
+AssistantManager and waits for the assistant to be verified. Three times are
+reported, each counted from just before "import main":
+- import: importing main
+- prompt: AssistantManager() has returned and the input prompt can be shown
+- ready: the assistant has been verified and updated, so a turn can start
+
+The table also shows the OpenAI requests made during startup. It is followed
+by the packages imported by the time the prompt appears, ranked by import
+time (from python -X importtime). This includes whatever the background
+startup thread has loaded by then.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--latency 0.2] [--budget-ms 500]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai import FakeAssistantsAPI, FakeOpenAIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+manager = main.AssistantManager()
+prompt = time.perf_counter()
+if sys.argv[1] == 'prompt':
+    # Stop the import profile here; background startup is still running
+    os._exit(0)
+manager.wait_until_ready()
+ready = time.perf_counter()
+manager.close()
+print(json.dumps({'import': imported - start, 'prompt': prompt - start, 'ready': ready - start}))
+"""
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)')
+
+
+def child_environment(url: str) -> Dict[str, str]:
+    env = dict(os.environ, OPENAI_API_KEY='fake', OPENAI_BASE_URL=url, ASSISTANT_ID='asst_startup',
+               PYTHONPATH=ROOT)
+    env.pop('METRICS_FILE', None)
+    return env
+
+
+def run_child(url: str, directory: str, until: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, '-c', CHILD, until], cwd=directory, env=child_environment(url),
+                          capture_output=True, text=True, check=True)
+
+
+def heaviest_packages(stderr: str, limit: int) -> List[Tuple[str, float]]:
+    """Sum the self time of every imported module by top-level package."""
+    totals: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            totals[match.group(2).split('.')[0]] += int(match.group(1)) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def run(runs: int, latency: float, budget_ms: float) -> bool:
+    server = FakeOpenAIServer(FakeAssistantsAPI(), latency=latency).start()
+    try:
+        print(f"Fake Assistants API {latency * 1000:.0f} ms per request, {runs} cold starts\n")
+        samples: Dict[str, List[float]] = defaultdict(list)
+        with tempfile.TemporaryDirectory() as directory:
+            server.reset_counters()
+            for _ in range(runs):
+                result = json.loads(run_child(server.url, directory, 'ready').stdout.strip().splitlines()[-1])
+                for name, seconds in result.items():
+                    samples[name].append(seconds * 1000)
+            calls = dict(server.api_calls)
+            profile = run_child(server.url, directory, 'prompt', '-X', 'importtime')
+
+        print(f"{'':>8} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+        for name in ('import', 'prompt', 'ready'):
+            values = samples[name]
+            print(f"{name:>8} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+        per_start = ", ".join(f"{name} {count / runs:g}" for name, count in sorted(calls.items()))
+        print(f"\nOpenAI requests per start: {per_start or 'none'}")
+
+        print("\nImported before the prompt (self time by package):")
+        for package, milliseconds in heaviest_packages(profile.stderr, 10):
+            print(f"  {package:<24} {milliseconds:>7.1f} ms")
+
+        prompt = statistics.median(samples['prompt'])
+        if budget_ms and prompt > budget_ms:
+            print(f"\nFAIL: median time to prompt {prompt:.0f} ms is over the {budget_ms:g} ms budget")
+            return False
+        return True
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per fake OpenAI request')
+    parser.add_argument('--budget-ms', type=float, default=0,
+                        help='Exit with an error when the median time to prompt exceeds this')
+    args = parser.parse_args()
+    if not run(args.runs, args.latency, args.budget_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
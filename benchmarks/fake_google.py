@@ -0,0 +1,713 @@
+"""
+Local stand-in for the Gmail v1 and Calendar v3 REST APIs used by the benchmarks.
+
+The server speaks enough of the real wire protocol (JSON resources, paging,
+`fields` partial responses and multipart/mixed batch requests) for the
+unmodified googleapiclient service objects to talk to it. Resources carry the
+bookkeeping fields the real APIs return (kind, creator, reminders, ...) so
+response sizes are realistic. Every HTTP round trip sleeps for a configurable latency
+so the benchmarks reflect network cost rather than local CPU time, and a
+configurable share of round trips can fail with a transient error. Gmail
+calls can also be held to a per-user quota, answering 429 when it runs out.
+"""
+
+import base64
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+
+from tools.google_services import InstrumentedHttp
+from tools.quota import request_cost
+
+SENDERS = ['alice@example.com', 'bob@example.com', 'news@example.org', 'billing@example.net']
+SUBJECT_WORDS = ['Quarterly', 'report', 'invoice', 'meeting', 'notes', 'lunch', 'update', 'project', 'launch']
+LONG_BODY_CHARS = 40000
+# Seconds a 429 for exceeding the Gmail quota asks the client to wait
+QUOTA_RETRY_AFTER = 1
+GMAIL_HANDLER_METHODS = {
+    'gmail_messages_list': 'gmail.users.messages.list',
+    'gmail_messages_get': 'gmail.users.messages.get',
+    'gmail_messages_batch_modify': 'gmail.users.messages.batchModify',
+    'gmail_messages_trash': 'gmail.users.messages.trash',
+    'gmail_messages_send': 'gmail.users.messages.send',
+    'gmail_labels_list': 'gmail.users.labels.list',
+    'gmail_attachments_get': 'gmail.users.messages.attachments.get',
+    'gmail_get_profile': 'gmail.users.getProfile',
+    'gmail_history_list': 'gmail.users.history.list',
+}
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+class FakeMailbox:
+    """
+    Synthetic Gmail mailbox with deterministic content.
+
+    Args:
+        message_count: Messages in the inbox, newest first
+        seed: Seed for senders and subjects
+        long_body_every: Every this many messages one has a body of about
+            LONG_BODY_CHARS, like a newsletter or a long thread (0 for none)
+    """
+
+    def __init__(self, message_count: int = 500, seed: int = 7, long_body_every: int = 0):
+        rng = random.Random(seed)
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        now = int(time.time())
+        for index in range(message_count):
+            message_id = f"{index + 1:016x}"
+            sent = now - index * 3600
+            subject = ' '.join(rng.choice(SUBJECT_WORDS) for _ in range(4))
+            body = f"Hello,\n\n{subject} body text for message {index}.\n"
+            if long_body_every and index % long_body_every == long_body_every - 1:
+                paragraph = ' '.join(rng.choice(SUBJECT_WORDS) for _ in range(60))
+                body += f"\n{paragraph}.\n" * (LONG_BODY_CHARS // (len(paragraph) + 3))
+            self.messages[message_id] = {
+                'id': message_id,
+                'threadId': message_id,
+                'labelIds': ['INBOX'] + (['UNREAD'] if index % 3 == 0 else []),
+                'snippet': body[:80],
+                'internalDate': str(sent * 1000),
+                'sizeEstimate': 1024 + len(body),
+                'historyId': str(1000 + index),
+                'headers': [
+                    {'name': 'Delivered-To', 'value': 'me@example.com'},
+                    {'name': 'Received', 'value': f"by 2002:a05:6a10:{index:x} with SMTP id fake; {formatdate(sent)}"},
+                    {'name': 'Return-Path', 'value': '<bounces@example.com>'},
+                    {'name': 'From', 'value': rng.choice(SENDERS)},
+                    {'name': 'To', 'value': 'me@example.com'},
+                    {'name': 'Subject', 'value': subject},
+                    {'name': 'Date', 'value': formatdate(sent)},
+                    {'name': 'Message-ID', 'value': f"<{message_id}@mail.example.com>"},
+                    {'name': 'MIME-Version', 'value': '1.0'},
+                    {'name': 'Content-Type', 'value': 'multipart/mixed; boundary="000000000000fake"'},
+                ],
+                'body': body,
+                'attachments': [f"report-{index}.pdf"] if index % 10 == 0 else [],
+            }
+            self.order.append(message_id)
+        self.history_id = 1000 + message_count
+        self.history: List[Dict[str, Any]] = []
+
+    def record(self, change: str, message_id: str) -> None:
+        """Append a history record, as Gmail does for every mailbox change."""
+        self.history_id += 1
+        message = self.messages.get(message_id, {'id': message_id, 'threadId': message_id, 'labelIds': []})
+        entry = {'message': {'id': message_id, 'threadId': message['threadId'], 'labelIds': list(message['labelIds'])}}
+        self.history.append({'id': str(self.history_id), change: [entry]})
+
+    def set_labels(self, message_id: str, add: List[str] = (), remove: List[str] = ()) -> None:
+        labels = self.messages[message_id]['labelIds']
+        for label in remove:
+            if label in labels:
+                labels.remove(label)
+        labels.extend(label for label in add if label not in labels)
+        if add:
+            self.record('labelsAdded', message_id)
+        if remove:
+            self.record('labelsRemoved', message_id)
+
+    def add_sent(self, raw: bytes) -> str:
+        """Store a message sent through messages.send, labeled SENT. Returns its ID."""
+        parsed = BytesParser().parsebytes(raw)
+        part = next((p for p in parsed.walk() if p.get_content_maintype() == 'text'), parsed)
+        body = (part.get_payload(decode=True) or b'').decode(part.get_content_charset() or 'utf-8', 'replace')
+        message_id = f"{len(self.messages) + 1:016x}"
+        sent = int(time.time())
+        self.messages[message_id] = {
+            'id': message_id,
+            'threadId': message_id,
+            'labelIds': ['SENT'],
+            'snippet': body[:80],
+            'internalDate': str(sent * 1000),
+            'sizeEstimate': len(raw),
+            'historyId': str(self.history_id + 1),
+            'headers': [
+                {'name': 'From', 'value': 'me@example.com'},
+                {'name': 'To', 'value': parsed.get('To', '')},
+                {'name': 'Subject', 'value': parsed.get('Subject', '')},
+                {'name': 'Date', 'value': formatdate(sent)},
+                # Gmail adds a Message-ID when the client did not set one
+                {'name': 'Message-ID', 'value': parsed.get('Message-ID', f"<{message_id}@mail.example.com>")},
+            ],
+            'body': body,
+            'attachments': [],
+        }
+        self.order.insert(0, message_id)
+        self.record('messagesAdded', message_id)
+        return message_id
+
+    def header(self, message_id: str, name: str) -> str:
+        return next((h['value'] for h in self.messages[message_id]['headers'] if h['name'].lower() == name), '')
+
+    def visible_ids(self) -> List[str]:
+        """Message IDs messages.list returns: everything except spam and trash."""
+        return [i for i in self.order if not {'SPAM', 'TRASH'} & set(self.messages[i]['labelIds'])]
+
+    def resource(self, message_id: str, fmt: str = 'full', metadata_headers: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Render a message the way messages.get would for the given format."""
+        message = self.messages[message_id]
+        resource = {key: message[key] for key in ('id', 'threadId', 'labelIds', 'snippet', 'internalDate', 'sizeEstimate', 'historyId')}
+        if fmt == 'minimal':
+            return resource
+        headers = message['headers']
+        if fmt == 'metadata':
+            if metadata_headers:
+                wanted = {name.lower() for name in metadata_headers}
+                headers = [h for h in headers if h['name'].lower() in wanted]
+            resource['payload'] = {'mimeType': 'text/plain', 'headers': headers}
+            return resource
+        resource['payload'] = {
+            'partId': '',
+            'mimeType': 'multipart/mixed',
+            'filename': '',
+            'headers': headers,
+            'body': {'size': 0},
+            'parts': [{
+                'partId': '0',
+                'mimeType': 'text/plain',
+                'filename': '',
+                'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}],
+                'body': {'size': len(message['body']), 'data': _b64(message['body'])},
+            }] + [{
+                'partId': str(number),
+                'mimeType': 'application/pdf',
+                'filename': filename,
+                'headers': [],
+                'body': {'size': len(self.attachment_data(message_id, filename)), 'attachmentId': filename},
+            } for number, filename in enumerate(message['attachments'], start=1)],
+        }
+        return resource
+
+    def attachment_data(self, message_id: str, attachment_id: str) -> str:
+        """Deterministic attachment content for a message."""
+        return f"%PDF-1.4 {attachment_id} for {message_id}\n" * 64
+
+
+def parse_fields(mask: str, position: int = 0) -> Tuple[Dict[str, Any], int]:
+    """
+    Parse a partial-response mask into a tree of selected fields.
+
+    Returns:
+        The tree ({name: subtree}, where None selects the whole field) and the
+        position after the parsed selection
+    """
+    tree: Dict[str, Any] = {}
+    while position < len(mask) and mask[position] != ')':
+        match = re.compile(r'[^,()]+').match(mask, position)
+        path, position = match.group(0).strip().split('/'), match.end()
+        subtree = None
+        if position < len(mask) and mask[position] == '(':
+            subtree, position = parse_fields(mask, position + 1)
+            position += 1
+        for name in reversed(path[1:]):
+            subtree = {name: subtree}
+        name = path[0]
+        if name in tree and (tree[name] is None or subtree is None):
+            tree[name] = None
+        elif name in tree:
+            tree[name].update(subtree)
+        else:
+            tree[name] = subtree
+        if position < len(mask) and mask[position] == ',':
+            position += 1
+    return tree, position
+
+
+def select_fields(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Keep only the fields a parsed mask selects; lists are filtered item by item."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {name: select_fields(value[name], subtree) for name, subtree in tree.items() if name in value}
+    return value
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _with_offsets(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve local start/end times against the event's time zone, as Calendar stores them."""
+    for key in ('start', 'end'):
+        moment = _parse_time(event[key]['dateTime'])
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=ZoneInfo(event[key].get('timeZone') or 'UTC'))
+        event[key] = dict(event[key], dateTime=moment.isoformat())
+    return event
+
+
+class FakeCalendar:
+    """
+    Synthetic calendars with timed, non-recurring events.
+
+    Every event carries a change version so events.list can hand out sync
+    tokens; every tenth event on a secondary calendar is a copy of a primary
+    event (same iCalUID), as happens when an invitation lands on two calendars.
+    """
+
+    def __init__(self, calendar_count: int = 4, events_per_calendar: int = 300, days: int = 60, seed: int = 5):
+        rng = random.Random(seed)
+        start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self.version = 0
+        self.calendars: Dict[str, Dict[str, Any]] = {}
+        self.events: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for number in range(calendar_count):
+            calendar_id = 'primary' if number == 0 else f"calendar{number}@example.com"
+            self.calendars[calendar_id] = {
+                'kind': 'calendar#calendarListEntry', 'etag': f'"{number}"', 'id': calendar_id,
+                'summary': f"Calendar {number}", 'timeZone': 'UTC', 'colorId': str(number + 1),
+                'backgroundColor': '#9fe1e7', 'foregroundColor': '#000000', 'selected': True, 'accessRole': 'owner',
+                'defaultReminders': [{'method': 'popup', 'minutes': 10}],
+                'conferenceProperties': {'allowedConferenceSolutionTypes': ['hangoutsMeet']},
+            }
+            if number == 0:
+                self.calendars[calendar_id].update(primary=True, notificationSettings={'notifications': [
+                    {'type': kind, 'method': 'email'} for kind in ('eventCreation', 'eventChange', 'eventCancellation')]})
+            self.events[calendar_id] = {}
+            for index in range(events_per_calendar):
+                begin = start + timedelta(minutes=30 * rng.randrange(0, days * 48))
+                if number and index % 10 == 0 and self.events['primary']:
+                    source = rng.choice(list(self.events['primary'].values()))
+                    event = dict(source, id=f"{source['id']}-copy{number}")
+                else:
+                    event = {
+                        'id': f"evt{number}x{index}",
+                        'iCalUID': f"evt{number}x{index}@example.com",
+                        'status': 'confirmed',
+                        'summary': ' '.join(rng.choice(SUBJECT_WORDS) for _ in range(3)),
+                        'start': {'dateTime': begin.isoformat()},
+                        'end': {'dateTime': (begin + timedelta(minutes=rng.choice([30, 60, 90]))).isoformat()},
+                    }
+                self.put(calendar_id, event)
+
+    def put(self, calendar_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Store an event as a new change, with the bookkeeping fields Calendar adds."""
+        self.version += 1
+        now = datetime.now(timezone.utc).isoformat()
+        owner = {'email': 'me@example.com' if calendar_id == 'primary' else calendar_id, 'self': True}
+        event = dict({
+            'kind': 'calendar#event', 'created': now, 'creator': owner, 'organizer': owner, 'sequence': 0,
+            'htmlLink': f"https://www.google.com/calendar/event?eid={base64.b64encode(event['id'].encode()).decode()}",
+            'reminders': {'useDefault': True}, 'eventType': 'default',
+        }, **event)
+        event.update(updated=now, etag=f'"{self.version}"')
+        event['_version'] = self.version
+        self.events[calendar_id][event['id']] = event
+        return event
+
+    def listed(self, calendar_id: str) -> List[Dict[str, Any]]:
+        """Events in start order, without the internal version field."""
+        events = sorted(self.events[calendar_id].values(), key=lambda e: e['start']['dateTime'])
+        return [{k: v for k, v in event.items() if k != '_version'} for event in events]
+
+
+class FakeGoogleServer:
+    """
+    Threaded HTTP server emulating the subset of Gmail and Calendar used by the tools.
+
+    Args:
+        mailbox: Mailbox to serve (default: 500 synthetic messages)
+        latency: Seconds to sleep per HTTP round trip
+        item_latency: Extra seconds per call inside a batch request
+        calendar: Calendars to serve (default: 4 calendars of 300 events)
+        error_rate: Share of round trips answered with error_status instead
+        error_status: HTTP status of injected errors
+        seed: Seed for choosing which round trips fail
+        gmail_quota: Gmail quota units per second (0 for no limit); calls over it,
+            including calls inside a batch, get 429 with Retry-After
+        quota_burst: Seconds of quota that may be used at once
+        send_latency: Extra seconds messages.send takes, for Gmail's slower sends
+        lost_send_rate: Share of messages.send calls whose message is sent but
+            that are answered 503 anyway, as when a response is lost
+    """
+
+    def __init__(self, mailbox: Optional[FakeMailbox] = None, latency: float = 0.02, item_latency: float = 0.001,
+                 calendar: Optional[FakeCalendar] = None, error_rate: float = 0.0, error_status: int = 503,
+                 seed: int = 3, gmail_quota: float = 0.0, quota_burst: float = 1.0,
+                 send_latency: float = 0.0, lost_send_rate: float = 0.0):
+        self.mailbox = mailbox or FakeMailbox()
+        self.calendar = calendar or FakeCalendar()
+        self.latency = latency
+        self.item_latency = item_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.http_requests = 0
+        self.injected_errors = 0
+        self.gmail_quota = gmail_quota
+        self.quota_capacity = gmail_quota * quota_burst
+        self._quota_tokens = self.quota_capacity
+        self._quota_updated = time.monotonic()
+        self.throttled = 0
+        self.send_latency = send_latency
+        self.lost_send_rate = lost_send_rate
+        self._rng = random.Random(seed)
+        self.event_sequence = 0
+        self.api_calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> 'FakeGoogleServer':
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Avoid Nagle/delayed-ACK stalls skewing small responses
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, headers, payload = fake.handle_http(
+                    self.command, self.path, self.headers.get('Content-Type', ''), body, dict(self.headers)
+                )
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.http_requests = 0
+            self.injected_errors = 0
+            self.throttled = 0
+            self.api_calls.clear()
+
+    def handle_http(self, method: str, path: str, content_type: str, body: bytes,
+                    headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Handle one HTTP round trip, expanding batch requests."""
+        with self._lock:
+            self.http_requests += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        time.sleep(self.latency)
+
+        if fail:
+            error = {'error': {'code': self.error_status, 'message': 'Injected error', 'status': 'UNAVAILABLE'}}
+            return self.error_status, {'Content-Type': 'application/json'}, json.dumps(error).encode('utf-8')
+        if path.startswith('/batch'):
+            return self._handle_batch(content_type, body)
+        status, resource = self.dispatch(method, path, body, headers)
+        response_headers = {'Content-Type': 'application/json'}
+        if status == 429:
+            response_headers['Retry-After'] = str(QUOTA_RETRY_AFTER)
+        return status, response_headers, json.dumps(resource).encode('utf-8')
+
+    def _handle_batch(self, content_type: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        message = BytesParser().parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        boundary = 'batch_fake_boundary'
+        out = []
+        for part in message.get_payload():
+            inner = part.get_payload()
+            if isinstance(inner, list):
+                inner = inner[0].as_string()
+            request_line, _, rest = inner.partition('\n')
+            inner_method, inner_path = request_line.split(' ')[:2]
+            separator = '\r\n\r\n' if '\r\n\r\n' in rest else '\n\n'
+            head, _, inner_body = rest.partition(separator)
+            inner_headers = dict(line.split(': ', 1) for line in head.splitlines() if ': ' in line)
+            time.sleep(self.item_latency)
+            status, resource = self.dispatch(inner_method, inner_path, inner_body.encode('utf-8'), inner_headers)
+            content_id = part['Content-ID'].strip('<>')
+            payload = json.dumps(resource)
+            retry_after = f"Retry-After: {QUOTA_RETRY_AFTER}\r\n" if status == 429 else ""
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n{retry_after}"
+                f"Content-Length: {len(payload)}\r\n\r\n"
+                f"{payload}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, ''.join(out).encode('utf-8')
+
+    def dispatch(self, method: str, path: str, body: bytes,
+                 headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, Any]]:
+        """Route a single API call to its handler; request headers are passed as query['_headers']."""
+        parts = urlsplit(path)
+        query = {key: values if len(values) > 1 or key == 'metadataHeaders' else values[0]
+                 for key, values in parse_qs(parts.query).items()}
+        query['_headers'] = {name.lower(): value for name, value in (headers or {}).items()}
+        for pattern, handler_method, handler in self._routes():
+            match = re.fullmatch(pattern, parts.path)
+            if match and handler_method == method:
+                if not self._take_quota(handler.__name__):
+                    return 429, {'error': {'code': 429, 'message': 'User-rate limit exceeded',
+                                           'errors': [{'reason': 'rateLimitExceeded'}]}}
+                with self._lock:
+                    self.api_calls[handler.__name__] += 1
+                status, resource = handler(query, body, *match.groups())
+                if query.get('fields') and status < 300:
+                    resource = select_fields(resource, parse_fields(query['fields'])[0])
+                return status, resource
+        return 404, {'error': {'code': 404, 'message': f'No route for {method} {parts.path}'}}
+
+    def _take_quota(self, handler_name: str) -> bool:
+        """Charge a Gmail call to the quota; False when the user is over it."""
+        if not self.gmail_quota or handler_name not in GMAIL_HANDLER_METHODS:
+            return True
+        cost = request_cost(GMAIL_HANDLER_METHODS[handler_name])[1]
+        with self._lock:
+            now = time.monotonic()
+            self._quota_tokens = min(self.quota_capacity,
+                                     self._quota_tokens + (now - self._quota_updated) * self.gmail_quota)
+            self._quota_updated = now
+            if self._quota_tokens < cost:
+                self.throttled += 1
+                return False
+            self._quota_tokens -= cost
+            return True
+
+    def _routes(self):
+        return [
+            (r'/gmail/v1/users/me/messages', 'GET', self.gmail_messages_list),
+            (r'/gmail/v1/users/me/messages/([^/]+)', 'GET', self.gmail_messages_get),
+            (r'/gmail/v1/users/me/messages/batchModify', 'POST', self.gmail_messages_batch_modify),
+            (r'/gmail/v1/users/me/messages/([^/]+)/trash', 'POST', self.gmail_messages_trash),
+            (r'/gmail/v1/users/me/messages/send', 'POST', self.gmail_messages_send),
+            (r'/gmail/v1/users/me/labels', 'GET', self.gmail_labels_list),
+            (r'/gmail/v1/users/me/messages/([^/]+)/attachments/([^/]+)', 'GET', self.gmail_attachments_get),
+            (r'/gmail/v1/users/me/profile', 'GET', self.gmail_get_profile),
+            (r'/gmail/v1/users/me/history', 'GET', self.gmail_history_list),
+            (r'/calendar/v3/users/me/calendarList', 'GET', self.calendar_list),
+            (r'/calendar/v3/calendars/([^/]+)/events', 'GET', self.calendar_events_list),
+            (r'/calendar/v3/calendars/([^/]+)/events', 'POST', self.calendar_events_insert),
+            (r'/calendar/v3/calendars/([^/]+)/events/([^/]+)', 'GET', self.calendar_events_get),
+            (r'/calendar/v3/calendars/([^/]+)/events/([^/]+)', 'PATCH', self.calendar_events_patch),
+            (r'/calendar/v3/freeBusy', 'POST', self.calendar_freebusy),
+        ]
+
+    def gmail_messages_list(self, query, body):
+        max_results = int(query.get('maxResults', 100))
+        offset = int(query.get('pageToken', 0))
+        visible = self.mailbox.visible_ids()
+        # Of Gmail's search operators only rfc822msgid: is understood; other queries match everything
+        wanted = re.match(r'rfc822msgid:(\S+)', query.get('q', ''))
+        if wanted:
+            visible = [i for i in visible if self.mailbox.header(i, 'message-id').strip('<>') == wanted.group(1)]
+        ids = visible[offset:offset + max_results]
+        result = {
+            'messages': [{'id': i, 'threadId': self.mailbox.messages[i]['threadId']} for i in ids],
+            'resultSizeEstimate': len(visible),
+        }
+        if offset + max_results < len(visible):
+            result['nextPageToken'] = str(offset + max_results)
+        return 200, result
+
+    def gmail_messages_get(self, query, body, message_id):
+        if message_id not in self.mailbox.messages:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        return 200, self.mailbox.resource(message_id, query.get('format', 'full'), query.get('metadataHeaders'))
+
+    def gmail_attachments_get(self, query, body, message_id, attachment_id):
+        message = self.mailbox.messages.get(message_id)
+        if message is None or attachment_id not in message['attachments']:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        data = self.mailbox.attachment_data(message_id, attachment_id)
+        return 200, {'size': len(data), 'data': _b64(data)}
+
+    def gmail_messages_trash(self, query, body, message_id):
+        if message_id not in self.mailbox.messages:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        self.mailbox.set_labels(message_id, add=['TRASH'], remove=['INBOX'])
+        return 200, self.mailbox.resource(message_id, 'minimal')
+
+    def gmail_messages_send(self, query, body):
+        raw = json.loads(body or b'{}').get('raw')
+        if not raw:
+            return 400, {'error': {'code': 400, 'message': "'raw' RFC822 payload message string required"}}
+        time.sleep(self.send_latency)
+        with self._lock:
+            message_id = self.mailbox.add_sent(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+            lost = self.lost_send_rate > 0 and self._rng.random() < self.lost_send_rate
+        if lost:
+            return 503, {'error': {'code': 503, 'message': 'Backend Error', 'status': 'UNAVAILABLE'}}
+        return 200, self.mailbox.resource(message_id, 'minimal')
+
+    def gmail_messages_batch_modify(self, query, body):
+        request = json.loads(body or b'{}')
+        ids = request.get('ids', [])
+        if len(ids) > 1000:
+            return 400, {'error': {'code': 400, 'message': 'Too many ids'}}
+        unknown = [i for i in ids if i not in self.mailbox.messages]
+        if unknown:
+            # Like Gmail, one bad ID rejects the whole call
+            return 400, {'error': {'code': 400, 'message': f'Invalid id value: {unknown[0]}'}}
+        for message_id in ids:
+            self.mailbox.set_labels(message_id, add=request.get('addLabelIds', []),
+                                    remove=request.get('removeLabelIds', []))
+        return 200, {}
+
+    def gmail_labels_list(self, query, body):
+        system = ['INBOX', 'UNREAD', 'STARRED', 'IMPORTANT', 'SPAM', 'TRASH', 'SENT', 'DRAFT']
+        return 200, {'labels': [{'id': label, 'name': label, 'type': 'system'} for label in system] + [
+            {'id': 'Label_1', 'name': 'Newsletters', 'type': 'user'},
+            {'id': 'Label_2', 'name': 'Receipts', 'type': 'user'},
+        ]}
+
+    def gmail_get_profile(self, query, body):
+        return 200, {
+            'emailAddress': 'me@example.com',
+            'messagesTotal': len(self.mailbox.messages),
+            'historyId': str(self.mailbox.history_id),
+        }
+
+    def gmail_history_list(self, query, body):
+        start = int(query['startHistoryId'])
+        if start < 1000:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        records = [record for record in self.mailbox.history if int(record['id']) > start]
+        return 200, {'history': records, 'historyId': str(self.mailbox.history_id)}
+
+    def _calendar_events(self, calendar_id: str) -> Optional[List[Dict[str, Any]]]:
+        calendar_id = unquote(calendar_id)
+        if calendar_id not in self.calendar.events:
+            return None
+        return self.calendar.listed(calendar_id)
+
+    def calendar_list(self, query, body):
+        return 200, {'items': list(self.calendar.calendars.values())}
+
+    def calendar_events_list(self, query, body, calendar_id):
+        events = self._calendar_events(calendar_id)
+        if events is None:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+        calendar_id = unquote(calendar_id)
+        if 'syncToken' in query:
+            since = int(query['syncToken'])
+            events = [e for e in events if self.calendar.events[calendar_id][e['id']]['_version'] > since]
+        if 'timeMin' in query:
+            events = [e for e in events if _parse_time(e['end']['dateTime']) > _parse_time(query['timeMin'])]
+        if 'timeMax' in query:
+            events = [e for e in events if _parse_time(e['start']['dateTime']) < _parse_time(query['timeMax'])]
+        if query.get('q'):
+            events = [e for e in events if query['q'].lower() in e.get('summary', '').lower()]
+        max_results = int(query.get('maxResults', 250))
+        offset = int(query.get('pageToken', 0))
+        result = {
+            'items': events[offset:offset + max_results],
+            'timeZone': self.calendar.calendars[calendar_id]['timeZone'],
+        }
+        if offset + max_results < len(events):
+            result['nextPageToken'] = str(offset + max_results)
+        else:
+            result['nextSyncToken'] = str(self.calendar.version)
+        return 200, result
+
+    def calendar_events_insert(self, query, body, calendar_id):
+        calendar_id = unquote(calendar_id)
+        if calendar_id not in self.calendar.events:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+        event = json.loads(body or b'{}')
+        if 'dateTime' not in event.get('start', {}) or 'dateTime' not in event.get('end', {}):
+            return 400, {'error': {'code': 400, 'message': 'Missing start or end time.'}}
+        with self._lock:
+            self.event_sequence += 1
+            event_id = f"new{self.event_sequence}"
+        event.update(id=event_id, iCalUID=f"{event_id}@example.com", status='confirmed')
+        stored = self.calendar.put(calendar_id, _with_offsets(event))
+        return 200, {k: v for k, v in stored.items() if k != '_version'}
+
+    def calendar_events_get(self, query, body, calendar_id, event_id):
+        event = self.calendar.events.get(unquote(calendar_id), {}).get(unquote(event_id))
+        if event is None:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+        return 200, {k: v for k, v in event.items() if k != '_version'}
+
+    def calendar_events_patch(self, query, body, calendar_id, event_id):
+        calendar_id, event_id = unquote(calendar_id), unquote(event_id)
+        event = self.calendar.events.get(calendar_id, {}).get(event_id)
+        if event is None:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+        if_match = query['_headers'].get('if-match')
+        if if_match and if_match != event['etag']:
+            return 412, {'error': {'code': 412, 'message': 'Precondition Failed'}}
+        patched = dict(event)
+        for key, value in json.loads(body or b'{}').items():
+            # Nested objects are merged, everything else is replaced
+            patched[key] = dict(event.get(key, {}), **value) if isinstance(value, dict) else value
+        stored = self.calendar.put(calendar_id, _with_offsets(patched))
+        return 200, {k: v for k, v in stored.items() if k != '_version'}
+
+    def calendar_freebusy(self, query, body):
+        request = json.loads(body or b'{}')
+        lo, hi = _parse_time(request['timeMin']), _parse_time(request['timeMax'])
+        calendars = {}
+        for item in request.get('items', []):
+            events = self._calendar_events(item['id'])
+            if events is None:
+                calendars[item['id']] = {'errors': [{'domain': 'global', 'reason': 'notFound'}], 'busy': []}
+                continue
+            calendars[item['id']] = {'busy': [
+                {'start': e['start']['dateTime'], 'end': e['end']['dateTime']} for e in events
+                if _parse_time(e['start']['dateTime']) < hi and _parse_time(e['end']['dateTime']) > lo
+            ]}
+        return 200, {'timeMin': request['timeMin'], 'timeMax': request['timeMax'], 'calendars': calendars}
+
+
+def build_fake_service(api: str, version: str, root_url: str):
+    """
+    Build a real googleapiclient service that talks to a fake server.
+
+    The discovery document is the packaged static one with its root URL
+    rewritten, and each thread gets its own unauthenticated (but instrumented)
+    HTTP client.
+    """
+    document = json.loads(get_static_doc(api, version))
+    document['rootUrl'] = root_url
+    local = threading.local()
+
+    def request_builder(http, postproc, uri, **kwargs):
+        if not hasattr(local, 'http'):
+            local.http = InstrumentedHttp()
+        return HttpRequest(local.http, postproc, uri, **kwargs)
+
+    return build_from_document(document, http=httplib2.Http(), requestBuilder=request_builder)
@@ -0,0 +1,429 @@
+"""
+Local stand-in for the parts of the OpenAI Assistants API the engine uses.
+
+FakeAssistantsAPI keeps assistants, threads, messages and runs in memory and
+plays a script for every run: the script maps the user's latest message to
+rounds of tool calls and a final reply, so a turn goes through the same steps
+as a real one (create message, create run, submit tool outputs for each
+round, read the reply).
+
+It has two front ends:
+- FakeOpenAIServer speaks the REST and server-sent-events wire protocol, so the
+  unmodified AsyncOpenAI client can be pointed at it with base_url. Every
+  round trip sleeps for a configurable latency and a configurable share of
+  them fail with a transient error.
+- FakeAsyncOpenAI is an in-process client object for benchmarks that need
+  many concurrent conversations without HTTP overhead. It supports polling
+  mode only.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ToolCall = Tuple[str, Dict[str, Any]]
+
+
+@dataclass
+class ScriptedTurn:
+    """What the fake model does for one user message: rounds of parallel tool calls, then a reply."""
+    tool_rounds: List[List[ToolCall]] = field(default_factory=list)
+    reply: str = "Done."
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class FakeAssistantsAPI:
+    """
+    In-memory Assistants API state. Methods take and return JSON-style dicts.
+
+    Args:
+        script: Maps the user's latest message to a ScriptedTurn (default: reply with no tools)
+    """
+
+    def __init__(self, script: Optional[Callable[[str], ScriptedTurn]] = None):
+        self.script = script or (lambda text: ScriptedTurn())
+        self.assistants: Dict[str, Dict[str, Any]] = {}
+        self.threads: Dict[str, List[Dict[str, Any]]] = {}
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.tool_outputs: List[Tuple[str, str]] = []
+        self._plans: Dict[str, ScriptedTurn] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def _thread(self, thread_id: str) -> List[Dict[str, Any]]:
+        if thread_id not in self.threads:
+            raise FakeAPIError(404, f"No thread found with id '{thread_id}'.")
+        return self.threads[thread_id]
+
+    def _run(self, thread_id: str, run_id: str) -> Dict[str, Any]:
+        run = self.runs.get(run_id)
+        if run is None or run['thread_id'] != thread_id:
+            raise FakeAPIError(404, f"No run found with id '{run_id}'.")
+        return run
+
+    @staticmethod
+    def _list(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {'object': 'list', 'data': data, 'first_id': data[0]['id'] if data else None,
+                'last_id': data[-1]['id'] if data else None, 'has_more': False}
+
+    def _message(self, thread_id: str, role: str, text: str, status: str = 'completed') -> Dict[str, Any]:
+        content = [{'type': 'text', 'text': {'value': text, 'annotations': []}}] if text else []
+        return {'id': self._new_id('msg'), 'object': 'thread.message', 'created_at': int(time.time()),
+                'thread_id': thread_id, 'role': role, 'status': status, 'content': content,
+                'assistant_id': None, 'run_id': None, 'attachments': [], 'metadata': {}}
+
+    def save_assistant(self, body: Dict[str, Any], assistant_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            assistant_id = assistant_id or self._new_id('asst')
+            assistant = self.assistants.setdefault(assistant_id, {
+                'id': assistant_id, 'object': 'assistant', 'created_at': int(time.time()),
+                'name': None, 'model': 'fake', 'instructions': None, 'tools': [], 'metadata': {},
+            })
+            assistant.update({key: body[key] for key in ('name', 'model', 'instructions', 'tools') if key in body})
+            return assistant
+
+    def get_assistant(self, assistant_id: str) -> Dict[str, Any]:
+        with self._lock:
+            if assistant_id not in self.assistants:
+                # Any ID is accepted, as if the assistant had been created earlier
+                return self.save_assistant({}, assistant_id)
+            return self.assistants[assistant_id]
+
+    def create_thread(self) -> Dict[str, Any]:
+        with self._lock:
+            thread_id = self._new_id('thread')
+            self.threads[thread_id] = []
+            return {'id': thread_id, 'object': 'thread', 'created_at': int(time.time()), 'metadata': {}}
+
+    def create_message(self, thread_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            message = self._message(thread_id, body.get('role', 'user'), body.get('content', ''))
+            self._thread(thread_id).append(message)
+            return message
+
+    def list_messages(self, thread_id: str) -> Dict[str, Any]:
+        with self._lock:
+            # Newest first, like the real API's default order
+            return self._list(list(reversed(self._thread(thread_id))))
+
+    def create_run(self, thread_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            messages = self._thread(thread_id)
+            text = next((m['content'][0]['text']['value'] for m in reversed(messages)
+                         if m['role'] == 'user' and m['content']), '')
+            run = {'id': self._new_id('run'), 'object': 'thread.run', 'created_at': int(time.time()),
+                   'thread_id': thread_id, 'assistant_id': body.get('assistant_id'), 'status': 'in_progress',
+                   'required_action': None, 'last_error': None, 'model': 'fake', 'instructions': '',
+                   'tools': [], 'metadata': {}}
+            self.runs[run['id']] = run
+            plan = self.script(text)
+            self._plans[run['id']] = ScriptedTurn([list(round_) for round_ in plan.tool_rounds], plan.reply)
+            self._next_round(run)
+            return run
+
+    def _next_round(self, run: Dict[str, Any]) -> None:
+        plan = self._plans[run['id']]
+        if not plan.tool_rounds:
+            run.update(status='in_progress', required_action=None)
+            return
+        calls = [{'id': self._new_id('call'), 'type': 'function',
+                  'function': {'name': name, 'arguments': json.dumps(arguments)}}
+                 for name, arguments in plan.tool_rounds.pop(0)]
+        run.update(status='requires_action',
+                   required_action={'type': 'submit_tool_outputs', 'submit_tool_outputs': {'tool_calls': calls}})
+
+    def _complete(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        reply = self._plans.pop(run['id']).reply
+        # One token per word is close enough for checking that usage gets counted
+        prompt_tokens = sum(len(m['content'][0]['text']['value'].split())
+                            for m in self.threads[run['thread_id']] if m['content'])
+        completion_tokens = len(reply.split())
+        message = self._message(run['thread_id'], 'assistant', reply)
+        message.update(assistant_id=run['assistant_id'], run_id=run['id'])
+        self.threads[run['thread_id']].append(message)
+        run.update(status='completed', required_action=None,
+                   usage={'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens})
+        return message
+
+    def get_run(self, thread_id: str, run_id: str) -> Dict[str, Any]:
+        with self._lock:
+            run = self._run(thread_id, run_id)
+            if run['status'] == 'in_progress':
+                self._complete(run)
+            return run
+
+    def list_runs(self, thread_id: str) -> Dict[str, Any]:
+        with self._lock:
+            self._thread(thread_id)
+            return self._list([run for run in reversed(list(self.runs.values())) if run['thread_id'] == thread_id])
+
+    def cancel_run(self, thread_id: str, run_id: str) -> Dict[str, Any]:
+        with self._lock:
+            run = self._run(thread_id, run_id)
+            if run['status'] in ('in_progress', 'queued', 'requires_action'):
+                run.update(status='cancelled', required_action=None)
+                self._plans.pop(run_id, None)
+            return run
+
+    def submit_tool_outputs(self, thread_id: str, run_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            run = self._run(thread_id, run_id)
+            if run['status'] != 'requires_action':
+                raise FakeAPIError(400, f"Runs in status \"{run['status']}\" do not accept tool outputs.")
+            calls = {call['id']: call['function']['name']
+                     for call in run['required_action']['submit_tool_outputs']['tool_calls']}
+            outputs = {output.get('tool_call_id'): output.get('output', '') for output in body.get('tool_outputs', [])}
+            if set(outputs) != set(calls):
+                raise FakeAPIError(400, "Tool outputs must be submitted for every tool call.")
+            self.tool_outputs.extend((calls[call_id], output) for call_id, output in outputs.items())
+            self._next_round(run)
+            return run
+
+    def stream_events(self, run: Dict[str, Any], created: bool) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Server-sent events for a run that was just created or given tool outputs.
+
+        The run either stops at requires_action or finishes, in which case the
+        reply is sent as one delta per word.
+        """
+        with self._lock:
+            events = [('thread.run.created', dict(run))] if created else []
+            if run['status'] == 'requires_action':
+                return events + [('thread.run.requires_action', dict(run))]
+            message = self._complete(run)
+            text = message['content'][0]['text']['value'] if message['content'] else ''
+            events.append(('thread.message.created', dict(message, status='in_progress', content=[])))
+            for word in re.findall(r'\S+\s*', text):
+                events.append(('thread.message.delta', {
+                    'id': message['id'], 'object': 'thread.message.delta',
+                    'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': word}}]},
+                }))
+            events.append(('thread.message.completed', message))
+            events.append(('thread.run.completed', dict(run)))
+            return events
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server emulating the Assistants endpoints the engine calls.
+
+    Args:
+        api: State and script to serve (default: a new FakeAssistantsAPI)
+        latency: Seconds to sleep per HTTP round trip
+        stream_delay: Seconds between streamed events, to model token generation
+        error_rate: Share of round trips answered with error_status instead
+        error_status: HTTP status of injected errors
+        seed: Seed for choosing which round trips fail
+    """
+
+    def __init__(self, api: Optional[FakeAssistantsAPI] = None, latency: float = 0.05, stream_delay: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int = 3):
+        self.api = api or FakeAssistantsAPI()
+        self.latency = latency
+        self.stream_delay = stream_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.http_requests = 0
+        self.injected_errors = 0
+        self.api_calls: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to the client, including the /v1 prefix."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'FakeOpenAIServer':
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                fake.handle_http(self, self.command, self.path, body)
+
+            do_GET = do_POST = do_DELETE = _handle
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.http_requests = 0
+            self.injected_errors = 0
+            self.api_calls.clear()
+
+    def _routes(self):
+        api = self.api
+        return [
+            ('POST', r'/v1/assistants', 'assistants.create', lambda body: api.save_assistant(body)),
+            ('GET', r'/v1/assistants/([^/]+)', 'assistants.retrieve', lambda body, a: api.get_assistant(a)),
+            ('POST', r'/v1/assistants/([^/]+)', 'assistants.update', lambda body, a: api.save_assistant(body, a)),
+            ('POST', r'/v1/threads', 'threads.create', lambda body: api.create_thread()),
+            ('POST', r'/v1/threads/([^/]+)/messages', 'messages.create', lambda body, t: api.create_message(t, body)),
+            ('GET', r'/v1/threads/([^/]+)/messages', 'messages.list', lambda body, t: api.list_messages(t)),
+            ('POST', r'/v1/threads/([^/]+)/runs', 'runs.create', lambda body, t: api.create_run(t, body)),
+            ('GET', r'/v1/threads/([^/]+)/runs', 'runs.list', lambda body, t: api.list_runs(t)),
+            ('GET', r'/v1/threads/([^/]+)/runs/([^/]+)', 'runs.retrieve', lambda body, t, r: api.get_run(t, r)),
+            ('POST', r'/v1/threads/([^/]+)/runs/([^/]+)/cancel', 'runs.cancel',
+             lambda body, t, r: api.cancel_run(t, r)),
+            ('POST', r'/v1/threads/([^/]+)/runs/([^/]+)/submit_tool_outputs', 'runs.submit_tool_outputs',
+             lambda body, t, r: api.submit_tool_outputs(t, r, body)),
+        ]
+
+    def handle_http(self, handler: BaseHTTPRequestHandler, method: str, path: str, body: bytes) -> None:
+        """Handle one round trip: latency, error injection, routing and the JSON or event-stream response."""
+        with self._lock:
+            self.http_requests += 1
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        time.sleep(self.latency)
+        if fail:
+            self._send_json(handler, self.error_status, {'error': {'message': 'Injected error', 'type': 'server_error'}})
+            return
+
+        route_path = path.split('?', 1)[0]
+        payload = json.loads(body) if body else {}
+        for route_method, pattern, name, call in self._routes():
+            match = re.fullmatch(pattern, route_path)
+            if route_method == method and match:
+                with self._lock:
+                    self.api_calls[name] += 1
+                try:
+                    result = call(payload, *match.groups())
+                except FakeAPIError as e:
+                    self._send_json(handler, e.status, {'error': {'message': e.message, 'type': 'invalid_request_error'}})
+                    return
+                if payload.get('stream') and name in ('runs.create', 'runs.submit_tool_outputs'):
+                    self._send_events(handler, self.api.stream_events(result, created=name == 'runs.create'))
+                else:
+                    self._send_json(handler, 200, result)
+                return
+        self._send_json(handler, 404, {'error': {'message': f'No route for {method} {route_path}',
+                                                 'type': 'invalid_request_error'}})
+
+    @staticmethod
+    def _send_json(handler: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _send_events(self, handler: BaseHTTPRequestHandler, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+        chunks = [f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events]
+        chunks.append("event: done\ndata: [DONE]\n\n")
+        try:
+            for chunk in chunks:
+                if self.stream_delay:
+                    time.sleep(self.stream_delay)
+                data = chunk.encode('utf-8')
+                handler.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                handler.wfile.flush()
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stops reading once the run has completed
+            handler.close_connection = True
+
+
+def _namespace(value: Any) -> Any:
+    """Turn JSON-style dicts into objects with attribute access, like the client's models."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class FakeAsyncOpenAI:
+    """
+    In-process AsyncOpenAI stand-in over a FakeAssistantsAPI (polling mode only).
+
+    Args:
+        api: State and script to serve (default: a new FakeAssistantsAPI)
+        latency: Seconds each API call takes
+    """
+
+    def __init__(self, api: Optional[FakeAssistantsAPI] = None, latency: float = 0.05):
+        self.api = api or FakeAssistantsAPI()
+        self.latency = latency
+        self.api_calls: Counter = Counter()
+        api = self.api
+        self.beta = SimpleNamespace(
+            assistants=SimpleNamespace(
+                create=self._call('assistants.create', lambda **kw: api.save_assistant(kw)),
+                retrieve=self._call('assistants.retrieve', lambda assistant_id, **kw: api.get_assistant(assistant_id)),
+                update=self._call('assistants.update', lambda assistant_id, **kw: api.save_assistant(kw, assistant_id)),
+            ),
+            threads=SimpleNamespace(
+                create=self._call('threads.create', lambda **kw: api.create_thread()),
+                messages=SimpleNamespace(
+                    create=self._call('messages.create', lambda thread_id, **kw: api.create_message(thread_id, kw)),
+                    list=self._call('messages.list', lambda thread_id, **kw: api.list_messages(thread_id)),
+                ),
+                runs=SimpleNamespace(
+                    create=self._call('runs.create', lambda thread_id, **kw: api.create_run(thread_id, kw)),
+                    retrieve=self._call('runs.retrieve', lambda thread_id, run_id, **kw: api.get_run(thread_id, run_id)),
+                    list=self._call('runs.list', lambda thread_id, **kw: api.list_runs(thread_id)),
+                    cancel=self._call('runs.cancel', lambda thread_id, run_id, **kw: api.cancel_run(thread_id, run_id)),
+                    submit_tool_outputs=self._call(
+                        'runs.submit_tool_outputs',
+                        lambda thread_id, run_id, **kw: api.submit_tool_outputs(thread_id, run_id, kw)),
+                ),
+            ),
+        )
+
+    def _call(self, name: str, method: Callable[..., Dict[str, Any]]):
+        async def call(*args, **kwargs):
+            self.api_calls[name] += 1
+            await asyncio.sleep(self.latency)
+            return _namespace(method(*args, **kwargs))
+        return call
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,389 @@
+"""
+Offline benchmark suite for catching performance regressions.
+
+Runs a set of scenarios against local fake Gmail, Calendar and Assistants
+servers, so no credentials or network access are needed. Every scenario
+reports throughput, latency percentiles, API round trips and response bytes
+per operation, the size of the tool output per operation (as complete JSON and as sent to the
+model after the output budget) and how many operations still failed after
+retries. Caches and the mailbox
+mirror are off unless a scenario turns them on, so every operation reaches
+the fake APIs.
+
+Results can be written as JSON and checked against a baseline: the check
+fails when a scenario makes more API calls than the baseline, receives or
+sends more than BYTES_TOLERANCE more data, or its median latency grows by
+more than the tolerance.
+
+Usage:
+    python -m benchmarks.suite [--quick] [--only list_emails,turn_streaming]
+                               [--latency 0.02] [--error-rate 0.0] [--json results.json]
+                               [--baseline benchmarks/baseline.json] [--update-baseline]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import AsyncOpenAI
+
+from assistant_engine import AsyncAssistantEngine, Conversation, TurnHandler
+from benchmarks.fake_google import FakeCalendar, FakeGoogleServer, FakeMailbox, build_fake_service
+from benchmarks.fake_openai import FakeAssistantsAPI, FakeOpenAIServer, ScriptedTurn
+from server import percentile
+from tools.gmail_tools import get_gmail_service
+from tools.google_services import get_service_manager
+from tools.mailbox import get_mailbox_store, sync_mailbox
+from tools.metrics import GOOGLE_HTTP_BYTES, TOOL_OUTPUT_BYTES
+from tools.quota import reset_buckets
+from tools.retries import retry_scope
+from tools.storage import use_workspace
+from tools.tool_definitions import TOOL_POLICIES
+from tools import (
+    list_emails, read_email, search_emails, modify_emails, trash_emails,
+    list_events, list_all_events, find_free_slots, batch_events,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_TOLERANCE = 0.5
+BYTES_TOLERANCE = 0.1
+# Settings every scenario starts from. The fakes have no quota, so requests still go through
+# the quota buckets but are never held back (bench_rate_limit covers pacing)
+BASE_ENV = {'TOOL_CACHE': 'false', 'MESSAGE_CACHE': 'false', 'MAILBOX_MIRROR': 'false', 'CALENDAR_CACHE': 'false',
+            'GMAIL_QUOTA_PER_SECOND': '1e9', 'CALENDAR_QUOTA_PER_SECOND': '1e9'}
+ERROR_PREFIXES = ('Error', '❌')
+
+
+class StatusCollector(TurnHandler):
+    """Keeps a turn's status messages; any status means the turn did not go cleanly."""
+
+    def __init__(self):
+        self.status: List[str] = []
+
+    def on_status(self, message: str) -> None:
+        self.status.append(message)
+
+
+class SuiteContext:
+    """
+    Fake servers, a workspace with their services installed, and an engine on the fake Assistants API.
+
+    Args:
+        latency: Seconds per round trip for both fake servers
+        error_rate: Share of round trips that fail with a transient error
+    """
+
+    def __init__(self, latency: float, error_rate: float):
+        self.mailbox = FakeMailbox(message_count=1000, long_body_every=50)
+        self.calendar = FakeCalendar(calendar_count=4, events_per_calendar=300, days=30)
+        self.google = FakeGoogleServer(mailbox=self.mailbox, calendar=self.calendar, latency=latency,
+                                       error_rate=error_rate).start()
+        self.assistants = FakeAssistantsAPI(self.script)
+        self.openai = FakeOpenAIServer(self.assistants, latency=latency, error_rate=error_rate).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.loop = asyncio.new_event_loop()
+        self.engine = AsyncAssistantEngine(client=AsyncOpenAI(api_key='fake', base_url=self.openai.url, max_retries=2))
+        self.scripts: Dict[str, ScriptedTurn] = {}
+        self.now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        # Messages not yet trashed, handed out to the scenarios that consume them
+        self.spare_ids = list(self.mailbox.order)
+
+    def script(self, text: str) -> ScriptedTurn:
+        return self.scripts.get(text, ScriptedTurn())
+
+    @contextmanager
+    def active(self) -> Iterator['SuiteContext']:
+        with use_workspace(self.directory.name):
+            for api, version in (('gmail', 'v1'), ('calendar', 'v3')):
+                get_service_manager().install_service(api, version, build_fake_service(api, version, self.google.url))
+            self.loop.run_until_complete(self.engine.start())
+            yield self
+
+    def close(self) -> None:
+        self.loop.run_until_complete(self.engine.close())
+        self.loop.close()
+        self.google.stop()
+        self.openai.stop()
+        self.directory.cleanup()
+
+    def window(self, days: int) -> Dict[str, str]:
+        return {'time_min': self.now.isoformat(), 'time_max': (self.now + timedelta(days=days)).isoformat()}
+
+    def take_ids(self, count: int) -> List[str]:
+        ids, self.spare_ids = self.spare_ids[-count:], self.spare_ids[:-count]
+        return ids
+
+    def turn(self, text: str, script: ScriptedTurn, streaming: bool) -> str:
+        """Run one assistant turn; returns the reply, or an error string if anything went wrong."""
+        self.scripts[text] = script
+        self.engine.streaming = streaming
+        outputs_before = len(self.assistants.tool_outputs)
+        handler = StatusCollector()
+        reply = self.loop.run_until_complete(self.engine.send_message(Conversation(), text, handler))
+        failed_tools = [name for name, output in self.assistants.tool_outputs[outputs_before:]
+                        if output.startswith(ERROR_PREFIXES)]
+        if streaming and not self.engine.streaming:
+            return "Error: streaming fell back to polling"
+        if reply is None or handler.status or failed_tools:
+            return f"Error: reply={reply!r} status={handler.status} failed tools={failed_tools}"
+        return reply
+
+
+@dataclass
+class Scenario:
+    """
+    One benchmark scenario.
+
+    Scenarios named after a tool run under that tool's retry policy, as the
+    tool handler would run them.
+
+    Args:
+        name: Name used in reports and the baseline
+        description: What one operation does
+        operation: Called with the context and the iteration number; returns the tool output
+        iterations: Operations in a full run (quick runs do a third, at least 3)
+        env: Settings applied on top of BASE_ENV while the scenario runs
+        setup: Called once before timing, e.g. to fill a local mirror
+    """
+    name: str
+    description: str
+    operation: Callable[[SuiteContext, int], Any]
+    iterations: int = 30
+    env: Dict[str, str] = field(default_factory=dict)
+    setup: Optional[Callable[[SuiteContext], Any]] = None
+
+
+def sync_mirror(ctx: SuiteContext) -> None:
+    """Fill the local mirror before timing; a tool call would only start its first sync."""
+    sync_mailbox(get_gmail_service(), get_mailbox_store())
+
+
+def multi_tool_turn(ctx: SuiteContext, number: int) -> str:
+    window = ctx.window(7)
+    script = ScriptedTurn([[('list_emails', {'max_results': 10}),
+                            ('list_events', {'calendar_id': 'primary', 'max_results': 20, **window})]],
+                          "You have 10 new emails and a few meetings this week.")
+    return ctx.turn(f"What's new today? ({number})", script, streaming=False)
+
+
+def two_step_turn(ctx: SuiteContext, number: int) -> str:
+    message_id = ctx.mailbox.order[number]
+    script = ScriptedTurn([[('search_emails', {'query': 'invoice', 'max_results': 5}),
+                            ('list_all_events', {'max_results': 25, **ctx.window(3)})],
+                           [('read_email', {'message_id': message_id})]],
+                          "The latest invoice is due Friday and you are free on Thursday afternoon " * 3)
+    return ctx.turn(f"Find my latest invoice and a time to pay it ({number})", script, streaming=True)
+
+
+SCENARIOS = [
+    Scenario('list_emails', "list_emails, 20 messages",
+             lambda ctx, i: list_emails(20)),
+    Scenario('list_emails_large', "list_emails, 200 messages",
+             lambda ctx, i: list_emails(200), iterations=6),
+    Scenario('read_email', "read_email of a different message each time",
+             lambda ctx, i: read_email(ctx.mailbox.order[i])),
+    Scenario('read_long_email', "read_email of a different 40 KB message each time",
+             lambda ctx, i: read_email(ctx.mailbox.order[i * 50 + 49]), iterations=15),
+    Scenario('search_emails', "search_emails on a synced local mirror",
+             lambda ctx, i: search_emails(['invoice', 'from:alice@example.com', 'subject:report is:unread'][i % 3], 20),
+             env={'MAILBOX_MIRROR': 'true', 'MAILBOX_SYNC_LIMIT': '1000'},
+             setup=sync_mirror),
+    Scenario('list_events', "list_events over two weeks of the primary calendar",
+             lambda ctx, i: list_events('primary', 50, query='', **ctx.window(14))),
+    Scenario('list_all_events', "list_all_events over two weeks of four calendars",
+             lambda ctx, i: list_all_events('', 50, query='', **ctx.window(14))),
+    Scenario('find_free_slots', "find_free_slots for an hour across two calendars over a week",
+             lambda ctx, i: find_free_slots(duration_minutes=60, calendar_ids='primary,calendar1@example.com',
+                                            **ctx.window(7))),
+    Scenario('modify_emails', "modify_emails marking 50 messages read",
+             lambda ctx, i: modify_emails(','.join(ctx.mailbox.order[i * 50:(i + 1) * 50]), '', '', 'UNREAD', 50),
+             iterations=10),
+    Scenario('trash_emails', "trash_emails on 20 messages",
+             lambda ctx, i: trash_emails(','.join(ctx.take_ids(20)), '', 20), iterations=10),
+    Scenario('batch_events', "batch_events creating 20 events",
+             lambda ctx, i: batch_events('primary', [
+                 {'event_id': '', 'etag': '', 'summary': f"Session {i}.{n}", 'description': '', 'location': '',
+                  'attendees': '', 'start_time': (ctx.now + timedelta(days=40 + n, hours=i)).isoformat(),
+                  'end_time': (ctx.now + timedelta(days=40 + n, hours=i + 1)).isoformat()}
+                 for n in range(20)]),
+             iterations=10),
+    Scenario('turn_polling', "assistant turn, polling, one round of two parallel tools",
+             multi_tool_turn, iterations=6),
+    Scenario('turn_streaming', "assistant turn, streaming, two rounds of tools and a streamed reply",
+             two_step_turn, iterations=6, env={'MAILBOX_MIRROR': 'true', 'MAILBOX_SYNC_LIMIT': '1000'},
+             setup=sync_mirror),
+]
+
+
+@contextmanager
+def scenario_env(env: Dict[str, str]) -> Iterator[None]:
+    settings = dict(BASE_ENV, **env)
+    previous = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    reset_buckets()
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def is_failure(output: Any) -> bool:
+    if isinstance(output, str):
+        return output.startswith(ERROR_PREFIXES)
+    return isinstance(output, dict) and bool(output.get('failed'))
+
+
+@contextmanager
+def tool_retry_scope(name: str) -> Iterator[None]:
+    if name not in TOOL_POLICIES:
+        yield
+        return
+    with retry_scope(name, TOOL_POLICIES[name].retry):
+        yield
+
+
+def byte_totals() -> Dict[str, float]:
+    """
+    Bytes so far: Google responses (received) and tool output as complete JSON
+    (full) and as sent to the model (sent).
+    """
+    totals = {'received': 0, 'full': 0, 'sent': 0}
+    for key, amount in GOOGLE_HTTP_BYTES.snapshot().items():
+        if dict(key)['direction'] == 'received':
+            totals['received'] += amount
+    for key, amount in TOOL_OUTPUT_BYTES.snapshot().items():
+        totals[dict(key)['stage']] += amount
+    return totals
+
+
+def run_scenario(ctx: SuiteContext, scenario: Scenario, iterations: int) -> Dict[str, Any]:
+    """Run a scenario and return its measurements."""
+    with scenario_env(scenario.env), tool_retry_scope(scenario.name):
+        if scenario.setup:
+            scenario.setup(ctx)
+        ctx.google.reset_counters()
+        ctx.openai.reset_counters()
+        bytes_before = byte_totals()
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for number in range(iterations):
+            began = time.perf_counter()
+            output = scenario.operation(ctx, number)
+            latencies.append((time.perf_counter() - began) * 1000)
+            if is_failure(output):
+                errors += 1
+        elapsed = time.perf_counter() - start
+    transferred = {name: amount - bytes_before[name] for name, amount in byte_totals().items()}
+    return {
+        'operations': iterations,
+        'ops_per_second': round(iterations / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'google_round_trips': round(ctx.google.http_requests / iterations, 3),
+        'google_api_calls': round(sum(ctx.google.api_calls.values()) / iterations, 3),
+        'openai_round_trips': round(ctx.openai.http_requests / iterations, 3),
+        'google_bytes': round(transferred['received'] / iterations),
+        'output_bytes': round(transferred['full'] / iterations),
+        'sent_bytes': round(transferred['sent'] / iterations),
+        'injected_errors': ctx.google.injected_errors + ctx.openai.injected_errors,
+        'errors': errors,
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    """List regressions: more API calls or bytes than the baseline, or median latency beyond the tolerance."""
+    problems = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for key in ('google_round_trips', 'google_api_calls', 'openai_round_trips'):
+            if result[key] > expected.get(key, float('inf')) + 1e-9:
+                problems.append(f"{name}: {key} went from {expected[key]:g} to {result[key]:g} per operation")
+        for key, what in (('google_bytes', 'Google response bytes'), ('sent_bytes', 'output sent to the model')):
+            if result[key] > expected.get(key, float('inf')) * (1 + BYTES_TOLERANCE):
+                problems.append(f"{name}: {what} went from {expected[key]:g} to {result[key]:g} bytes per operation")
+        limit = expected.get('p50_ms', float('inf')) * (1 + tolerance)
+        if result['p50_ms'] > limit:
+            problems.append(f"{name}: p50 {result['p50_ms']:.1f} ms is over {limit:.1f} ms "
+                            f"(baseline {expected['p50_ms']:.1f} ms + {tolerance:.0%})")
+        if result['errors'] and not result['injected_errors']:
+            problems.append(f"{name}: {result['errors']} operations failed")
+    return problems
+
+
+def print_row(name: str, result: Dict[str, Any]) -> None:
+    print(f"{name:<17} {result['operations']:>4} {result['ops_per_second']:>8.1f} {result['p50_ms']:>9.1f} "
+          f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['google_round_trips']:>7.1f} "
+          f"{result['google_api_calls']:>7.1f} {result['openai_round_trips']:>7.1f} {result['google_bytes'] / 1024:>7.1f} "
+          f"{result['output_bytes'] / 1024:>7.1f} "
+          f"{result['sent_bytes'] / 1024:>7.1f} {result['errors']:>6}")
+
+
+def run(names: Optional[List[str]], quick: bool, latency: float, error_rate: float) -> Dict[str, Dict[str, Any]]:
+    scenarios = [s for s in SCENARIOS if not names or s.name in names]
+    unknown = set(names or []) - {s.name for s in SCENARIOS}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    ctx = SuiteContext(latency, error_rate)
+    results = {}
+    print(f"Fake Gmail, Calendar and Assistants: {latency * 1000:.0f} ms per round trip, "
+          f"{error_rate:.0%} injected errors\n")
+    print(f"{'scenario':<17} {'ops':>4} {'ops/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'g rt/op':>7} {'g api':>7} {'oai rt':>7} {'g KB':>7} {'out KB':>7} {'sent KB':>7} {'errors':>6}")
+    try:
+        with ctx.active():
+            for scenario in scenarios:
+                iterations = max(3, scenario.iterations // 3) if quick else scenario.iterations
+                results[scenario.name] = run_scenario(ctx, scenario, iterations)
+                print_row(scenario.name, results[scenario.name])
+    finally:
+        ctx.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='Run a third of the iterations (for CI)')
+    parser.add_argument('--only', default='', help='Comma-separated scenario names')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per fake API round trip')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of round trips that fail')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Fail if results regress against this file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative growth of median latency')
+    parser.add_argument('--update-baseline', action='store_true', help=f'Write results to {DEFAULT_BASELINE}')
+    args = parser.parse_args()
+
+    results = run([n for n in args.only.split(',') if n] or None, args.quick, args.latency, args.error_rate)
+    for path in filter(None, [args.json, DEFAULT_BASELINE if args.update_baseline else None]):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("\nRegressions:\n  " + "\n  ".join(problems))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
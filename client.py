@@ -0,0 +1,135 @@
+"""
+Thin command-line client for the assistant daemon.
+
+Sends one command over the daemon's Unix socket and prints the answer as it
+streams in. Only the standard library is imported, so a one-shot command
+costs an interpreter start plus the turn itself.
+
+Usage:
+    python client.py "what's on my calendar today"
+    echo "any mail from Alice?" | python client.py
+    python client.py --reset | --stats | --stop
+
+Protocol: the client sends one JSON request line, e.g.
+{"command": "message", "message": "..."}, and the daemon answers with
+newline-delimited JSON events (text, tools, status) ending in a done or
+error event, then closes the connection.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_SOCKET = os.path.join("assistant_data", "daemon.sock")
+COMMANDS = ('message', 'reset', 'stats', 'ping', 'stop')
+
+
+class DaemonUnavailable(Exception):
+    """No daemon is listening on the socket."""
+
+
+def socket_path() -> str:
+    """The daemon's socket: DAEMON_SOCKET, or daemon.sock in the data directory."""
+    return os.getenv('DAEMON_SOCKET', DEFAULT_SOCKET)
+
+
+def request(payload: Dict[str, Any], path: Optional[str] = None,
+            timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Send one request to the daemon and yield its events as they arrive.
+
+    Args:
+        payload: The request, e.g. {"command": "message", "message": "..."}
+        path: Socket path (default: socket_path())
+        timeout: Seconds to wait for each read, or None to wait for the whole turn
+    Raises:
+        DaemonUnavailable: Nothing is listening on the socket
+    """
+    path = path or socket_path()
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(timeout)
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonUnavailable(f"The assistant daemon is not running on {path} ({e.strerror})")
+        connection.sendall(json.dumps(payload).encode() + b"\n")
+        with connection.makefile('rb') as events:
+            for line in events:
+                yield json.loads(line)
+    finally:
+        connection.close()
+
+
+def is_running(path: Optional[str] = None) -> bool:
+    """Whether a daemon answers a ping on the socket."""
+    try:
+        return any(event.get('type') == 'done' for event in request({'command': 'ping'}, path, timeout=2.0))
+    except (DaemonUnavailable, OSError, ValueError):
+        return False
+
+
+def run_command(payload: Dict[str, Any], path: Optional[str] = None) -> int:
+    """
+    Send a command and print its events: reply text on stdout, tools and status on stderr.
+
+    Returns:
+        int: Exit status; 0 on success, 1 on an error answer, 2 when the daemon is not running
+    """
+    streamed = False
+    try:
+        for event in request(payload, path):
+            kind = event.get('type')
+            if kind == 'text':
+                sys.stdout.write(event['text'])
+                sys.stdout.flush()
+                streamed = True
+            elif kind == 'tools':
+                print(f"[using {', '.join(event['tools'])}]", file=sys.stderr)
+            elif kind == 'status':
+                print(event['message'], file=sys.stderr)
+            elif kind == 'error':
+                print(f"Error: {event['error']}", file=sys.stderr)
+                return 1
+            elif kind == 'done':
+                if 'reply' in event:
+                    # Streamed text has no trailing newline; a polled reply arrives only here
+                    print("" if streamed else event['reply'])
+                elif 'stats' in event:
+                    print(json.dumps(event['stats'], indent=2))
+                else:
+                    print(event['status'])
+                return 0
+    except DaemonUnavailable as e:
+        print(f"{e}\nStart it with: python daemon.py start", file=sys.stderr)
+        return 2
+    print("Error: the daemon closed the connection without answering", file=sys.stderr)
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('message', nargs='*', help='The message; read from stdin when omitted')
+    parser.add_argument('--socket', default=socket_path(), help='Unix socket the daemon listens on')
+    command = parser.add_mutually_exclusive_group()
+    for name, description in (('reset', 'start a new conversation'),
+                              ('stats', 'show queue, latency and traffic statistics'),
+                              ('stop', 'stop the daemon')):
+        command.add_argument(f'--{name}', dest='command', action='store_const', const=name, help=description)
+    args = parser.parse_args()
+    if not hasattr(socket, 'AF_UNIX'):
+        raise SystemExit("The assistant daemon needs Unix domain sockets, which this platform does not have")
+
+    if args.command:
+        sys.exit(run_command({'command': args.command}, args.socket))
+    text = " ".join(args.message) if args.message else sys.stdin.read()
+    if not text.strip():
+        parser.error("no message given")
+    sys.exit(run_command({'command': 'message', 'message': text}, args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Resident assistant daemon for one-shot commands from the shell.
+
+`python main.py` pays for interpreter startup, imports, loading the Google
+token, building the API services and verifying the assistant before the first
+prompt. The daemon does all of that once and stays up, keeping the engine,
+the Google services and the local caches warm. It listens on a Unix domain
+socket that only its owner can connect to; client.py sends it commands.
+
+The daemon continues the terminal assistant's conversation (thread_id.txt in
+the current directory) and runs one turn at a time; commands sent while a
+turn runs wait in a short queue.
+
+Usage:
+    python daemon.py serve    # run in the foreground
+    python daemon.py start    # run in the background, logging to assistant_data/daemon.log
+    python client.py "what's on my calendar today"
+    python client.py --stop
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from assistant_engine import AsyncAssistantEngine, Conversation
+from client import COMMANDS, is_running, socket_path
+from server import DEFAULT_TURN_TIMEOUT, ServerError, ServerTurnHandler, TurnScheduler, UserSession
+from tools.metrics import get_counter_totals, write_metrics_file
+from tools.outbox import flush_outbox
+from tools.storage import DATA_DIRECTORY, env_flag, env_number
+
+THREAD_ID_FILE = "thread_id.txt"
+LOG_FILE = os.path.join(DATA_DIRECTORY, "daemon.log")
+
+DEFAULT_QUEUE_SIZE = 8  # Commands waiting for the running turn before new ones are rejected
+REQUEST_TIMEOUT = 10.0  # Seconds a client has to send its request line
+MAX_REQUEST_BYTES = 64 * 1024
+START_TIMEOUT = 60.0  # Seconds "start" waits for the daemon to answer
+
+
+class LocalSession(UserSession):
+    """The terminal assistant's conversation, kept in the current directory rather than a workspace."""
+
+    def __init__(self):
+        super().__init__('local', None)
+
+    @property
+    def thread_id_file(self) -> str:
+        return THREAD_ID_FILE
+
+    def save_thread_id(self) -> None:
+        # Like main.py's reset, a new conversation removes the file
+        if self.conversation.thread_id is None:
+            if os.path.exists(self.thread_id_file):
+                os.remove(self.thread_id_file)
+            return
+        with open(self.thread_id_file, 'w') as f:
+            f.write(self.conversation.thread_id)
+
+
+def warm_up() -> None:
+    """
+    Import the tools and build the Google services that the first turn would otherwise wait for.
+
+    Also resumes sending emails an earlier run left in the outbox.
+    """
+    from tools.tool_handler import get_function_map
+    from tools.google_services import TOKEN_FILE
+    from tools.outbox import resume_outbox
+    get_function_map()
+    resume_outbox()
+    # Only with a saved token: the daemon must not open a browser sign-in by itself
+    if os.path.exists(TOKEN_FILE):
+        from tools.gmail_tools import get_gmail_service
+        from tools.calendar_tools import get_calendar_service
+        get_gmail_service()
+        get_calendar_service()
+
+
+class AssistantDaemon:
+    """
+    Unix socket front end over a started engine.
+
+    Each connection carries one JSON request line and gets newline-delimited
+    JSON events back, ending in a done or error event.
+
+    Args:
+        engine: Started engine
+        path: Socket to listen on
+        scheduler: Turn scheduler (default: one worker and a DAEMON_QUEUE_SIZE queue)
+    """
+
+    def __init__(self, engine: AsyncAssistantEngine, path: str, scheduler: Optional[TurnScheduler] = None):
+        self.engine = engine
+        self.path = path
+        queue_size = int(env_number('DAEMON_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        # One worker, since every command continues the same thread
+        self.scheduler = scheduler or TurnScheduler(
+            engine, workers=1, queue_size=queue_size, max_pending_per_user=queue_size + 1,
+            turn_timeout=env_number('DAEMON_TURN_TIMEOUT', DEFAULT_TURN_TIMEOUT),
+        )
+        self.session = LocalSession()
+        self.stopped = asyncio.Event()
+        self.started_at = time.monotonic()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Listen on the socket. Raises ValueError if another daemon already does."""
+        if os.path.exists(self.path):
+            if is_running(self.path):
+                raise ValueError(f"The assistant daemon is already running on {self.path}")
+            os.remove(self.path)  # Left behind by a daemon that did not shut down cleanly
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.scheduler.start()
+        # Create the socket owner-only (0600) from the start rather than chmod it afterwards
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self.handle_connection, self.path,
+                                                           limit=MAX_REQUEST_BYTES)
+        finally:
+            os.umask(previous_umask)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        await self.scheduler.stop()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the one request a connection carries."""
+        try:
+            try:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+                except ValueError:
+                    # readline's LimitOverrunError for a line longer than the stream limit
+                    raise ServerError(413, f"The request is larger than {MAX_REQUEST_BYTES} bytes")
+                try:
+                    payload = json.loads(line or b'{}')
+                except ValueError:
+                    raise ServerError(400, "The request must be one line of JSON")
+                if not isinstance(payload, dict) or payload.get('command') not in COMMANDS:
+                    raise ServerError(400, f"'command' must be one of: {', '.join(COMMANDS)}")
+                await self.route(writer, payload)
+            except ServerError as e:
+                await self.send(writer, {"type": "error", "status": e.status, "error": e.message})
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> None:
+        command = payload['command']
+        if command == 'message':
+            await self.handle_message(writer, payload.get('message'))
+        elif command == 'reset':
+            if self.session.pending:
+                raise ServerError(429, "Wait for the current message to finish before resetting")
+            self.session.conversation = Conversation()
+            self.session.save_thread_id()
+            await self.send(writer, {"type": "done", "status": "Thread reset. Starting a new conversation."})
+        elif command == 'stats':
+            await self.send(writer, {"type": "done", "stats": self.get_stats()})
+        elif command == 'ping':
+            await self.send(writer, {"type": "done", "status": "ok"})
+        elif command == 'stop':
+            await self.send(writer, {"type": "done", "status": "Stopping the assistant daemon."})
+            self.stopped.set()
+
+    async def handle_message(self, writer: asyncio.StreamWriter, text: Any) -> None:
+        if not isinstance(text, str) or not text.strip():
+            raise ServerError(400, "'message' must be a non-empty string")
+        events: asyncio.Queue = asyncio.Queue()
+        future = self.scheduler.submit(self.session, text, ServerTurnHandler(events))
+        future.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                await self.send(writer, event)
+        except ConnectionError:
+            # The client went away; a queued turn is dropped, a running one finishes on the thread
+            future.cancel()
+            raise
+        reply = future.result()
+        if reply is None:
+            raise ServerError(502, "The run did not complete")
+        await self.send(writer, {"type": "done", "reply": reply, "thread_id": self.session.conversation.thread_id})
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"uptime_seconds": round(time.monotonic() - self.started_at, 1),
+                "scheduler": self.scheduler.get_stats(),
+                "engine": self.engine.get_latency_summary(),
+                "counters": get_counter_totals()}
+
+    @staticmethod
+    async def send(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> None:
+        writer.write(json.dumps(event).encode() + b"\n")
+        await writer.drain()
+
+
+async def serve(path: str) -> None:
+    """Start the engine, warm up the tools and serve until stopped."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    engine = AsyncAssistantEngine(api_key, os.getenv("ASSISTANT_ID"), streaming=env_flag('ASSISTANT_STREAMING', True))
+    if await engine.start():
+        print(f"Created new assistant {engine.assistant_id}; set ASSISTANT_ID in .env to reuse it", flush=True)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, warm_up)
+    daemon = AssistantDaemon(engine, path)
+    await daemon.start()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, daemon.stopped.set)
+    print(f"Assistant daemon listening on {path}", flush=True)
+    try:
+        await daemon.stopped.wait()
+    finally:
+        await daemon.stop()
+        await engine.close()
+        await loop.run_in_executor(None, flush_outbox)
+        write_metrics_file()
+
+
+def start_background(path: str) -> None:
+    """Run "serve" as a detached process and wait until it answers."""
+    if is_running(path):
+        print(f"The assistant daemon is already running on {path}")
+        return
+    os.makedirs(DATA_DIRECTORY, exist_ok=True)
+    with open(LOG_FILE, 'ab') as log:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--socket', path, 'serve'],
+                                   stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"The assistant daemon exited during startup; see {LOG_FILE}")
+        if is_running(path):
+            print(f"Assistant daemon started (pid {process.pid}) on {path}")
+            return
+        time.sleep(0.1)
+    raise SystemExit(f"The assistant daemon did not answer within {START_TIMEOUT:g}s; see {LOG_FILE}")
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'), override=True)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--socket', default=socket_path(), help='Unix socket to listen on')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('serve', help='Run the daemon in the foreground')
+    commands.add_parser('start', help='Run the daemon in the background')
+    args = parser.parse_args()
+
+    if args.command == 'start':
+        start_background(args.socket)
+        return
+    try:
+        asyncio.run(serve(args.socket))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,16 @@
+import asyncio
 import os
 import sys
-import time
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, List
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import local modules
-from tools import handle_tool_calls, get_tool_definitions
+from tools import get_message_cache_stats, get_tool_cache_stats
+from tools.metrics import get_counter_totals, get_metrics_summary, write_metrics_file
 from terminalstyle import (
     print_assistant_response,
     print_system_message,
@@ -19,16 +20,58 @@ from terminalstyle import (
     print_divider,
     get_user_input,
     print_tool_usage,
+    AssistantResponseStream,
 )
-from prompts import SUPER_ASSISTANT_INSTRUCTIONS
+from assistant_engine import AsyncAssistantEngine, Conversation, TurnHandler
 
 # Constants
 THREAD_ID_FILE = "thread_id.txt"
-MODEL_NAME = "gpt-4o-mini"  # Using the latest model
+MAX_STATS_ROWS = 15  # Span series shown by the stats command
+
+def preload_modules() -> None:
+    """Import the tool modules and reply rendering ahead of the first turn."""
+    from tools.tool_handler import get_function_map
+    from tools.outbox import resume_outbox
+    import rich.live
+    import rich.markdown
+    get_function_map()
+    # Send what the previous session left in the outbox
+    resume_outbox()
+
+class TerminalTurnHandler(TurnHandler):
+    """Render a turn in the terminal: live streamed text, tool usage and system messages."""
+
+    def __init__(self):
+        self.response = AssistantResponseStream()
+
+    def on_text_delta(self, text: str) -> None:
+        self.response.append(text)
+
+    def on_message(self, text: str) -> None:
+        print_assistant_response(text)
+
+    def on_tool_calls(self, tool_names: List[str]) -> None:
+        for name in tool_names:
+            print_tool_usage(name)
+
+    def on_status(self, message: str) -> None:
+        print_system_message(message)
+
+    def close(self) -> None:
+        self.response.close()
 
 class AssistantManager:
+    """
+    Synchronous command-line front end over AsyncAssistantEngine.
+
+    The engine's event loop runs on a background thread. Startup (loading the
+    OpenAI client and verifying, updating or creating the assistant) runs
+    there while the prompt is already on screen; commands that need the
+    assistant wait for it to finish.
+    """
+
     def __init__(self):
-        """Initialize the AssistantManager with OpenAI client and configuration."""
+        """Start the engine in the background; returns before the assistant is verified."""
         # Load environment variables with override to ensure we get the .env values
         load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'), override=True)
         
@@ -37,26 +80,61 @@ class AssistantManager:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
             
-        self.client = OpenAI(api_key=self.api_key)
-        self.assistant_id = os.getenv("ASSISTANT_ID")
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, name="assistant-engine", daemon=True)
+        self._loop_thread.start()
+        self._engine: Optional[AsyncAssistantEngine] = None
+        self._startup_messages: List[str] = []
+        self._startup = asyncio.run_coroutine_threadsafe(self.start_engine(), self.loop)
         
-        # Create or retrieve assistant
+        self.conversation = Conversation(self.load_thread_id())
+
+    async def start_engine(self) -> None:
+        """Create the engine and verify, update or create the assistant. Runs on the loop thread."""
         try:
-            if self.assistant_id:
-                self.assistant = self.client.beta.assistants.retrieve(self.assistant_id)
-                # Update assistant configuration to ensure latest tools are available
-                self.update_assistant_configuration()
+            # Stream run events by default; set ASSISTANT_STREAMING=false to poll instead
+            streaming = os.getenv("ASSISTANT_STREAMING", "true").lower() not in ("false", "0", "no")
+            self._engine = AsyncAssistantEngine(self.api_key, os.getenv("ASSISTANT_ID"), streaming=streaming)
+            if self._engine.assistant_id:
+                try:
+                    # Updating also verifies the assistant, so this is one request
+                    await self._engine.start()
+                except Exception as e:
+                    await self._engine.start(update_configuration=False)
+                    self._startup_messages.append(f"Warning: Failed to update assistant configuration: {str(e)}")
             else:
-                print_system_message("Creating new assistant...")
-                self.assistant = self.create_assistant()
+                await self._engine.start()
                 # Save assistant ID to .env file
                 with open('.env', 'a') as f:
-                    f.write(f"\nASSISTANT_ID={self.assistant.id}\n")
-                print_system_message(f"Created new assistant with ID: {self.assistant.id}")
+                    f.write(f"\nASSISTANT_ID={self._engine.assistant_id}\n")
+                self._startup_messages.append(f"Created new assistant with ID: {self._engine.assistant_id}")
         except Exception as e:
             raise ValueError(f"Error with assistant: {str(e)}")
-        
-        self.thread_id = self.load_thread_id()
+        # Load what the first turn needs while the user is still typing
+        self.loop.run_in_executor(None, preload_modules)
+
+    def wait_until_ready(self) -> None:
+        """Wait for startup to finish and show its messages; raises ValueError if it failed."""
+        self._startup.result()
+        while self._startup_messages:
+            print_system_message(self._startup_messages.pop(0))
+
+    @property
+    def engine(self) -> AsyncAssistantEngine:
+        self.wait_until_ready()
+        return self._engine
+
+    def call(self, coroutine):
+        """Run one engine coroutine on the engine's loop thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    @property
+    def thread_id(self) -> Optional[str]:
+        return self.conversation.thread_id
+
+    @property
+    def streaming(self) -> bool:
+        return self.engine.streaming
 
     def load_thread_id(self) -> Optional[str]:
         """Load thread ID from file if it exists."""
@@ -70,75 +148,97 @@ class AssistantManager:
         with open(THREAD_ID_FILE, "w") as file:
             file.write(thread_id)
 
-    def create_assistant(self) -> Dict[str, Any]:
-        """Create a new assistant with specified configuration."""
-        return self.client.beta.assistants.create(
-            name="Super Assistant",
-            instructions=SUPER_ASSISTANT_INSTRUCTIONS,
-            model=MODEL_NAME,
-            tools=get_tool_definitions()
-        )
-
     def cancel_active_runs(self) -> None:
         """Cancel any active runs on the current thread."""
-        if not self.thread_id:
+        self.call(self.engine.cancel_active_runs(self.conversation))
+
+    def run_turn(self, user_input: str) -> Optional[str]:
+        """Send the user's message and render the assistant's reply."""
+        return self.call(self.engine.send_message(self.conversation, user_input, TerminalTurnHandler()))
+
+    def get_latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Average time-to-first-token and turn latency per execution mode."""
+        return self.engine.get_latency_summary()
+
+    def print_latency_summary(self) -> None:
+        """Print recent turn latencies for each execution mode."""
+        summary = self.get_latency_summary()
+        if not summary:
+            print_system_message("No turns recorded yet.")
             return
-            
-        try:
-            runs = self.client.beta.threads.runs.list(thread_id=self.thread_id)
-            for run in runs.data:
-                if run.status in ["in_progress", "queued", "requires_action"]:
-                    try:
-                        self.client.beta.threads.runs.cancel(
-                            thread_id=self.thread_id,
-                            run_id=run.id
-                        )
-                    except Exception:
-                        pass
-        except Exception:
-            pass
-
-    def wait_for_completion(self, run_id: str) -> Optional[Any]:
-        """Wait for a run to complete and handle any required actions."""
-        while True:
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=self.thread_id, 
-                run_id=run_id
+        lines = [
+            f"{mode}: {s['turns']} turns, first token {s['avg_first_token_ms']:.0f} ms, "
+            f"total {s['avg_total_ms']:.0f} ms (avg)"
+            for mode, s in summary.items()
+        ]
+        print_system_message("\n".join(lines))
+
+    def print_cache_stats(self) -> None:
+        """Print hit ratios and savings of the tool result and message body caches."""
+        lines = []
+        tool_stats = get_tool_cache_stats()
+        if tool_stats:
+            lines.append(
+                f"Tool cache: {tool_stats['hit_ratio']:.0%} hit ratio "
+                f"({tool_stats['hits']} hits, {tool_stats['misses']} misses), "
+                f"{tool_stats['invalidated']} invalidated, {tool_stats['evictions']} evicted, "
+                f"{tool_stats['entries']} entries ({tool_stats['bytes'] / 1024:.0f} KiB)"
             )
-            
-            if run.status == "requires_action":
-                try:
-                    tool_outputs = handle_tool_calls(run)
-                    for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                        print_tool_usage(tool_call.function.name)
-                    run = self.client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=self.thread_id,
-                        run_id=run_id,
-                        tool_outputs=tool_outputs
-                    )
-                except Exception as e:
-                    print_system_message(f"Error handling tool calls: {str(e)}")
-                    return None
-                    
-            elif run.status == "completed":
-                return run
-                
-            elif run.status in ["failed", "cancelled", "expired"]:
-                print_system_message(f"Run ended with status: {run.status}")
-                return None
-                
-            time.sleep(0.5)
+        stats = get_message_cache_stats()
+        if stats:
+            lines.append(
+                f"Message cache: {stats['hit_ratio']:.0%} hit ratio "
+                f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['misses']} misses), "
+                f"{stats['bytes_saved'] / 1024:.0f} KiB and {stats['latency_saved_seconds'] * 1000:.0f} ms saved, "
+                f"{stats['memory_entries']} messages in memory ({stats['memory_bytes'] / 1024:.0f} KiB)"
+            )
+        print_system_message("\n".join(lines) if lines else "The caches have not been used yet.")
+
+    def print_metrics(self) -> None:
+        """Print where this session's time went, slowest contributors first."""
+        rows = get_metrics_summary()
+        if not rows:
+            print_system_message("No metrics recorded yet.")
+            return
+        lines = []
+        for row in rows[:MAX_STATS_ROWS]:
+            name = row['metric'].replace('_seconds', '')
+            labels = ", ".join(f"{key}={value}" for key, value in row['labels'].items())
+            lines.append(
+                f"{name}{f' [{labels}]' if labels else ''}: {row['count']}x, avg {row['avg_ms']:.0f} ms, "
+                f"p95 {row['p95_ms']:.0f} ms, total {row['total_ms']:.0f} ms"
+            )
+        totals = get_counter_totals()
+        traffic = totals.get('google_http_bytes_total', {})
+        sent = sum(amount for labels, amount in traffic.items() if labels.endswith('sent'))
+        received = sum(amount for labels, amount in traffic.items() if labels.endswith('received'))
+        if traffic:
+            lines.append(f"Google HTTP: {sent / 1024:.0f} KiB sent, {received / 1024:.0f} KiB received")
+        throttled = totals.get('google_throttled_total', {})
+        if throttled:
+            lines.append("Google rate limits hit: " + ", ".join(f"{api} {count:.0f}x" for api, count in throttled.items()))
+        tokens = totals.get('openai_tokens_total', {})
+        if tokens:
+            lines.append(f"Tokens: {tokens.get('prompt', 0):.0f} prompt, {tokens.get('completion', 0):.0f} completion")
+        path = write_metrics_file()
+        if path:
+            lines.append(f"Metrics written to {path}")
+        print_system_message("\n".join(lines))
 
     def reset_thread(self) -> None:
         """Reset the conversation thread."""
         self.cancel_active_runs()
-        self.thread_id = None
+        self.conversation = Conversation()
         if os.path.exists(THREAD_ID_FILE):
             os.remove(THREAD_ID_FILE)
         print_system_message("Thread reset. Starting a new conversation.")
 
     def process_user_input(self, user_input: str) -> bool:
         """Process user input and return whether to continue the conversation."""
+        if user_input.lower() not in ("cache", "stats"):
+            # A failed startup is fatal, as it would have been before the prompt
+            self.wait_until_ready()
+
         if user_input.lower() == "reset":
             self.reset_thread()
             return True
@@ -152,34 +252,23 @@ class AssistantManager:
             self.update_assistant_configuration()
             return True
 
-        try:
-            # Create or ensure thread exists
-            if self.thread_id is None:
-                thread = self.client.beta.threads.create()
-                self.thread_id = thread.id
-                self.save_thread_id(self.thread_id)
-            else:
-                self.cancel_active_runs()
+        if user_input.lower() == "latency":
+            self.print_latency_summary()
+            return True
 
-            # Create message and run
-            self.client.beta.threads.messages.create(
-                thread_id=self.thread_id,
-                role="user",
-                content=user_input
-            )
+        if user_input.lower() == "cache":
+            self.print_cache_stats()
+            return True
 
-            run = self.client.beta.threads.runs.create(
-                thread_id=self.thread_id,
-                assistant_id=self.assistant.id
-            )
+        if user_input.lower() == "stats":
+            self.print_metrics()
+            return True
 
-            # Wait for completion and process response
-            if completed_run := self.wait_for_completion(run.id):
-                messages = self.client.beta.threads.messages.list(thread_id=self.thread_id)
-                for message in messages.data:
-                    if message.role == "assistant":
-                        print_assistant_response(message.content[0].text.value)
-                        break
+        try:
+            had_thread = self.thread_id is not None
+            self.run_turn(user_input)
+            if not had_thread and self.thread_id:
+                self.save_thread_id(self.thread_id)
 
         except Exception as e:
             print_system_message(f"An error occurred: {str(e)}")
@@ -207,17 +296,43 @@ class AssistantManager:
         except Exception as e:
             print_system_message(f"Fatal error: {str(e)}")
             sys.exit(1)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Close the engine's HTTP client and the event loop, and write METRICS_FILE if set."""
+        if not self.loop.is_closed():
+            try:
+                self._startup.result()
+                self.call(self._engine.close())
+            except ValueError:
+                pass  # Startup failed and has already been reported
+            finally:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._loop_thread.join()
+                self.loop.close()
+            self.flush_outbox()
+            try:
+                write_metrics_file()
+            except OSError as e:
+                print_system_message(f"Warning: Could not write metrics: {str(e)}")
+
+    def flush_outbox(self) -> None:
+        """Give queued emails OUTBOX_FLUSH_SECONDS to go out before exiting."""
+        from tools.outbox import flush_outbox
+        try:
+            pending = flush_outbox()
+        except Exception as e:
+            print_system_message(f"Warning: Could not check the outbox: {str(e)}")
+            return
+        if pending:
+            print_system_message(f"{pending} queued email(s) will be sent the next time the assistant starts.")
 
     def update_assistant_configuration(self) -> None:
         """Update the assistant with current tools and instructions."""
         try:
             print_system_message("Updating assistant configuration...")
-            self.assistant = self.client.beta.assistants.update(
-                assistant_id=self.assistant_id,
-                instructions=SUPER_ASSISTANT_INSTRUCTIONS,
-                tools=get_tool_definitions(),
-                model=MODEL_NAME
-            )
+            self.call(self.engine.update_assistant_configuration())
             print_system_message("Assistant configuration updated successfully!")
         except Exception as e:
             print_system_message(f"Warning: Failed to update assistant configuration: {str(e)}")
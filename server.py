@@ -0,0 +1,585 @@
+"""
+Headless multi-user HTTP server for the assistant.
+
+Each user authenticates with their own API token and gets their own
+workspace under SERVER_DATA_DIRECTORY: an OpenAI thread, a Google token and
+the local caches and agent files. Turns are queued and run by a fixed pool of
+worker tasks on one event loop; when the queue is full new messages are
+rejected with 503 instead of piling up, and a user may only have
+SERVER_MAX_PENDING_PER_USER turns queued or running at a time.
+
+Usage:
+    python server.py add-user <name>      # issue an API token for a user
+    python server.py authorize <name>     # sign the user in to Google once
+    python server.py serve [--host 127.0.0.1] [--port 8080]
+
+API (JSON, token in "Authorization: Bearer <token>"):
+    POST /v1/messages  {"message": "...", "stream": false}
+    POST /v1/reset     start a new conversation thread
+    GET  /v1/stats     queue, worker and latency statistics
+    GET  /metrics      latency histograms in the Prometheus text format
+    GET  /health       liveness check, no token needed
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import secrets
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from assistant_engine import AsyncAssistantEngine, Conversation, TurnHandler
+from tools.metrics import export_prometheus, write_metrics_file
+from tools.storage import env_number, use_workspace
+
+SERVER_DATA_DIRECTORY = "server_data"
+USERS_FILE = "users.json"
+THREAD_ID_FILE = "thread_id.txt"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_SERVER_WORKERS = 64  # Turns running at the same time
+DEFAULT_QUEUE_SIZE = 256  # Turns waiting for a worker before new ones get 503
+DEFAULT_MAX_PENDING_PER_USER = 1  # Turns one user may have queued or running
+DEFAULT_TURN_TIMEOUT = 300.0  # Seconds a turn may run before it is abandoned
+RETRY_AFTER_SECONDS = 2  # Hint sent with 503 responses
+KEEPALIVE_TIMEOUT = 30.0  # Seconds an idle connection is kept open
+MAX_BODY_BYTES = 64 * 1024
+MAX_LATENCY_SAMPLES = 1000  # Recent turns kept for percentiles
+
+USER_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+    502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class ServerError(Exception):
+    """An error that is sent to the client as a JSON response with the given status."""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of values, 0.0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def user_directory(data_directory: str, name: str) -> str:
+    """Workspace root for a user. Names are restricted so they are safe as directory names."""
+    if not USER_NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid user name {name!r}: use letters, digits, '.', '_' and '-'")
+    return os.path.join(data_directory, "users", name)
+
+
+def load_users(data_directory: str) -> Dict[str, str]:
+    """Return the token hash to user name map from the users file."""
+    path = os.path.join(data_directory, USERS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def add_user(data_directory: str, name: str) -> str:
+    """Create a user's workspace and return a new API token for them."""
+    root = user_directory(data_directory, name)
+    os.makedirs(root, exist_ok=True)
+    users = {token_hash: user for token_hash, user in load_users(data_directory).items() if user != name}
+    token = secrets.token_urlsafe(32)
+    users[hash_token(token)] = name
+    path = os.path.join(data_directory, USERS_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(users, f, indent=2)
+    os.replace(tmp_path, path)
+    return token
+
+
+class UserSession:
+    """A user's workspace and conversation; the thread ID is kept in the workspace."""
+
+    def __init__(self, name: str, root: str):
+        self.name = name
+        self.root = root
+        self.pending = 0
+        self.conversation = Conversation(self.load_thread_id())
+
+    @property
+    def thread_id_file(self) -> str:
+        return os.path.join(self.root, THREAD_ID_FILE)
+
+    def load_thread_id(self) -> Optional[str]:
+        if os.path.exists(self.thread_id_file):
+            with open(self.thread_id_file) as f:
+                return f.read().strip() or None
+        return None
+
+    def save_thread_id(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.thread_id_file, 'w') as f:
+            f.write(self.conversation.thread_id or "")
+
+
+class ServerTurnHandler(TurnHandler):
+    """Collects a turn's tool usage and status messages, and forwards events when streaming."""
+
+    def __init__(self, events: Optional[asyncio.Queue] = None):
+        self.events = events
+        self.tools: List[str] = []
+        self.status: List[str] = []
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        if self.events is not None:
+            self.events.put_nowait(event)
+
+    def on_text_delta(self, text: str) -> None:
+        self._emit({"type": "text", "text": text})
+
+    def on_tool_calls(self, tool_names: List[str]) -> None:
+        self.tools.extend(tool_names)
+        self._emit({"type": "tools", "tools": tool_names})
+
+    def on_status(self, message: str) -> None:
+        self.status.append(message)
+        self._emit({"type": "status", "message": message})
+
+
+class TurnScheduler:
+    """
+    Bounded queue of turns served by a fixed number of worker tasks.
+
+    Args:
+        engine: Engine that runs the turns
+        workers: Number of turns that run at the same time
+        queue_size: Turns that may wait for a worker; more are rejected with 503
+        max_pending_per_user: Turns a user may have queued or running; more get 429
+        turn_timeout: Seconds before a running turn is abandoned with 504
+    """
+
+    def __init__(self, engine: AsyncAssistantEngine, workers: int = DEFAULT_SERVER_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, max_pending_per_user: int = DEFAULT_MAX_PENDING_PER_USER,
+                 turn_timeout: float = DEFAULT_TURN_TIMEOUT):
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.max_pending_per_user = max(1, max_pending_per_user)
+        self.turn_timeout = turn_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.active = 0
+        self._tasks: List[asyncio.Task] = []
+        self._queue_ms: List[float] = []
+        self._turn_ms: List[float] = []
+        self._stats = {'completed': 0, 'failed': 0, 'timeouts': 0, 'rejected_busy': 0, 'rejected_user': 0}
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, session: UserSession, text: str, handler: TurnHandler) -> asyncio.Future:
+        """
+        Queue a turn for a user.
+
+        Returns:
+            asyncio.Future: Resolves to the assistant's reply (None if the run
+            did not complete), or raises ServerError
+        Raises:
+            ServerError: 429 if the user has too many turns pending, 503 if the queue is full
+        """
+        if session.pending >= self.max_pending_per_user:
+            self._stats['rejected_user'] += 1
+            raise ServerError(429, "A previous message from this user is still being processed",
+                              retry_after=RETRY_AFTER_SECONDS)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((session, text, handler, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self._stats['rejected_busy'] += 1
+            raise ServerError(503, "Server is busy, try again shortly", retry_after=RETRY_AFTER_SECONDS)
+        session.pending += 1
+        return future
+
+    async def _worker(self) -> None:
+        while True:
+            session, text, handler, future, queued_at = await self.queue.get()
+            try:
+                if not future.done():
+                    await self._run(session, text, handler, future, queued_at)
+            finally:
+                session.pending -= 1
+                self.queue.task_done()
+
+    async def _run(self, session: UserSession, text: str, handler: TurnHandler,
+                   future: asyncio.Future, queued_at: float) -> None:
+        started = time.perf_counter()
+        self._record(self._queue_ms, (started - queued_at) * 1000)
+        self.active += 1
+        thread_id = session.conversation.thread_id
+        try:
+            with use_workspace(session.root):
+                reply = await asyncio.wait_for(
+                    self.engine.send_message(session.conversation, text, handler), self.turn_timeout
+                )
+            result: Any = reply
+            self._stats['completed'] += 1
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            result = ServerError(504, f"The turn did not finish within {self.turn_timeout:g}s")
+        except Exception as e:
+            self._stats['failed'] += 1
+            result = ServerError(502, f"Error running the assistant: {str(e)}")
+        finally:
+            self.active -= 1
+            self._record(self._turn_ms, (time.perf_counter() - started) * 1000)
+        if session.conversation.thread_id != thread_id:
+            session.save_thread_id()
+        if not future.done():
+            if isinstance(result, ServerError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _record(samples: List[float], value: float) -> None:
+        samples.append(value)
+        del samples[:-MAX_LATENCY_SAMPLES]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats, workers=self.workers, active=self.active, queued=self.queue.qsize(),
+                     queue_size=self.queue.maxsize)
+        for name, samples in (('queue', self._queue_ms), ('turn', self._turn_ms)):
+            stats[f'{name}_p50_ms'] = percentile(samples, 50)
+            stats[f'{name}_p99_ms'] = percentile(samples, 99)
+        return stats
+
+
+class AssistantServer:
+    """
+    HTTP front end that maps API tokens to users and their workspaces.
+
+    Args:
+        engine: Started engine shared by all users
+        users: Token hash to user name map
+        data_directory: Directory holding the users file and user workspaces
+        scheduler: Turn scheduler (default: one built from the SERVER_* settings)
+    """
+
+    def __init__(self, engine: AsyncAssistantEngine, users: Dict[str, str],
+                 data_directory: str = SERVER_DATA_DIRECTORY, scheduler: Optional[TurnScheduler] = None):
+        self.engine = engine
+        self.users = users
+        self.data_directory = data_directory
+        self.scheduler = scheduler or TurnScheduler(
+            engine,
+            workers=int(env_number('SERVER_WORKERS', DEFAULT_SERVER_WORKERS)),
+            queue_size=int(env_number('SERVER_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)),
+            max_pending_per_user=int(env_number('SERVER_MAX_PENDING_PER_USER', DEFAULT_MAX_PENDING_PER_USER)),
+            turn_timeout=env_number('SERVER_TURN_TIMEOUT', DEFAULT_TURN_TIMEOUT),
+        )
+        self.sessions: Dict[str, UserSession] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> int:
+        """Start accepting connections. Returns the port, useful when port is 0."""
+        self.scheduler.start()
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.scheduler.stop()
+
+    def get_session(self, name: str) -> UserSession:
+        session = self.sessions.get(name)
+        if session is None:
+            session = self.sessions[name] = UserSession(name, user_directory(self.data_directory, name))
+        return session
+
+    def authenticate(self, headers: Dict[str, str]) -> UserSession:
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        name = self.users.get(hash_token(token.strip())) if scheme.lower() == 'bearer' else None
+        if name is None:
+            raise ServerError(401, "Missing or unknown API token")
+        return self.get_session(name)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it or it goes idle."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), KEEPALIVE_TIMEOUT)
+                except ServerError as e:
+                    await self.send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    await self.route(writer, method, path, headers, body, keep_alive)
+                except ServerError as e:
+                    await self.send_json(writer, e.status, {"error": e.message}, keep_alive, e.retry_after)
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    await self.send_json(writer, 500, {"error": f"Internal error: {str(e)}"}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Read one HTTP/1.1 request. Returns None when the connection closed cleanly."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ServerError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise ServerError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ServerError(413, f"Request body is larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), path.split('?', 1)[0], headers, body
+
+    async def route(self, writer: asyncio.StreamWriter, method: str, path: str,
+                    headers: Dict[str, str], body: bytes, keep_alive: bool) -> None:
+        routes = {
+            '/health': ('GET', self.handle_health),
+            '/v1/stats': ('GET', self.handle_stats),
+            '/metrics': ('GET', self.handle_metrics),
+            '/v1/messages': ('POST', self.handle_message),
+            '/v1/reset': ('POST', self.handle_reset),
+        }
+        if path not in routes:
+            raise ServerError(404, f"Unknown path {path}")
+        expected_method, handler = routes[path]
+        if method != expected_method:
+            raise ServerError(405, f"Use {expected_method} for {path}")
+        await handler(writer, headers, body, keep_alive)
+
+    async def handle_health(self, writer, headers, body, keep_alive) -> None:
+        stats = self.scheduler.get_stats()
+        await self.send_json(writer, 200, {"status": "ok", "queued": stats['queued'], "active": stats['active']},
+                             keep_alive)
+
+    async def handle_stats(self, writer, headers, body, keep_alive) -> None:
+        self.authenticate(headers)
+        await self.send_json(writer, 200, {"scheduler": self.scheduler.get_stats(),
+                                           "engine": self.engine.get_latency_summary(),
+                                           "sessions": len(self.sessions)}, keep_alive)
+
+    async def handle_metrics(self, writer, headers, body, keep_alive) -> None:
+        self.authenticate(headers)
+        data = export_prometheus().encode()
+        await self.send_head(writer, 200, {'Content-Type': 'text/plain; version=0.0.4',
+                                           'Content-Length': str(len(data))}, keep_alive)
+        writer.write(data)
+        await writer.drain()
+
+    async def handle_reset(self, writer, headers, body, keep_alive) -> None:
+        session = self.authenticate(headers)
+        if session.pending:
+            raise ServerError(429, "Wait for the current message to finish before resetting",
+                              retry_after=RETRY_AFTER_SECONDS)
+        session.conversation = Conversation()
+        session.save_thread_id()
+        await self.send_json(writer, 200, {"status": "reset"}, keep_alive)
+
+    async def handle_message(self, writer, headers, body, keep_alive) -> None:
+        session = self.authenticate(headers)
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            raise ServerError(400, "Request body must be JSON")
+        text = payload.get('message') if isinstance(payload, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            raise ServerError(400, "'message' must be a non-empty string")
+
+        if payload.get('stream'):
+            events: asyncio.Queue = asyncio.Queue()
+            handler = ServerTurnHandler(events)
+            future = self.scheduler.submit(session, text, handler)
+            future.add_done_callback(lambda _: events.put_nowait(None))
+            await self.stream_events(writer, session, events, future, keep_alive)
+            return
+
+        handler = ServerTurnHandler()
+        future = self.scheduler.submit(session, text, handler)
+        reply = await future
+        if reply is None:
+            raise ServerError(502, "; ".join(handler.status) or "The run did not complete")
+        await self.send_json(writer, 200, {"reply": reply, "tools": handler.tools, "status": handler.status,
+                                           "thread_id": session.conversation.thread_id}, keep_alive)
+
+    async def stream_events(self, writer: asyncio.StreamWriter, session: UserSession, events: asyncio.Queue,
+                            future: asyncio.Future, keep_alive: bool) -> None:
+        """Send turn events as newline-delimited JSON in a chunked response, ending with a done event."""
+        await self.send_head(writer, 200, {'Content-Type': 'application/x-ndjson',
+                                           'Transfer-Encoding': 'chunked'}, keep_alive)
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                await self.send_chunk(writer, event)
+            try:
+                done = {"type": "done", "reply": future.result(), "thread_id": session.conversation.thread_id}
+            except ServerError as e:
+                done = {"type": "error", "status": e.status, "error": e.message}
+            await self.send_chunk(writer, done)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            # The client went away; the turn keeps running and its reply stays on the thread
+            future.cancel()
+            raise
+
+    @staticmethod
+    async def send_chunk(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> None:
+        data = json.dumps(event).encode() + b"\n"
+        writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def send_head(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str],
+                        keep_alive: bool) -> None:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        headers = dict(headers, Connection='keep-alive' if keep_alive else 'close')
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+    async def send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                        keep_alive: bool = True, retry_after: Optional[int] = None) -> None:
+        data = json.dumps(payload).encode()
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(data))}
+        if retry_after is not None:
+            headers['Retry-After'] = str(retry_after)
+        await self.send_head(writer, status, headers, keep_alive)
+        writer.write(data)
+        await writer.drain()
+
+
+def resume_outboxes(data_directory: str, names: Iterable[str]) -> None:
+    """Resume sending the emails each user's outbox still holds from the last run."""
+    from tools.outbox import resume_outbox
+    for name in names:
+        with use_workspace(user_directory(data_directory, name)):
+            resume_outbox()
+
+
+async def serve(host: str, port: int, data_directory: str) -> None:
+    """Run the server until interrupted."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    users = load_users(data_directory)
+    if not users:
+        print("No users yet; add one with: python server.py add-user <name>")
+    engine = AsyncAssistantEngine(api_key, os.getenv("ASSISTANT_ID"), streaming=True)
+    if await engine.start():
+        print(f"Created new assistant {engine.assistant_id}; set ASSISTANT_ID in .env to reuse it")
+    server = AssistantServer(engine, users, data_directory)
+    port = await server.start(host, port)
+    await asyncio.get_running_loop().run_in_executor(None, resume_outboxes, data_directory, set(users.values()))
+    print(f"Serving {len(users)} users on http://{host}:{port} "
+          f"({server.scheduler.workers} workers, queue of {server.scheduler.queue.maxsize})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        await engine.close()
+        write_metrics_file()
+
+
+def authorize(data_directory: str, name: str) -> None:
+    """Run the Google sign-in for a user and store the token in their workspace."""
+    from tools.google_services import ServiceManager, TOKEN_FILE
+    from tools.gmail_tools import SCOPES as GMAIL_SCOPES
+    from tools.calendar_tools import SCOPES as CALENDAR_SCOPES
+
+    root = user_directory(data_directory, name)
+    os.makedirs(root, exist_ok=True)
+    manager = ServiceManager(os.path.join(root, TOKEN_FILE))
+    manager.register_scopes(GMAIL_SCOPES + CALENDAR_SCOPES)
+    for api, version, scopes, display_name in (('gmail', 'v1', GMAIL_SCOPES, 'Gmail'),
+                                               ('calendar', 'v3', CALENDAR_SCOPES, 'Google Calendar')):
+        result = manager.get_service(api, version, scopes, display_name)
+        if isinstance(result, str):
+            raise SystemExit(result)
+    manager.shutdown()
+    print(f"Google access authorized for {name}")
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'), override=True)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-directory', default=os.getenv('SERVER_DATA_DIRECTORY', SERVER_DATA_DIRECTORY),
+                        help='Directory holding the users file and user workspaces')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='Run the HTTP server')
+    serve_parser.add_argument('--host', default=os.getenv('SERVER_HOST', DEFAULT_HOST))
+    serve_parser.add_argument('--port', type=int, default=int(env_number('SERVER_PORT', DEFAULT_PORT)))
+    commands.add_parser('add-user', help='Issue an API token for a user').add_argument('name')
+    commands.add_parser('authorize', help="Sign a user in to Google").add_argument('name')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'add-user':
+            token = add_user(args.data_directory, args.name)
+            print(f"API token for {args.name} (shown once): {token}")
+            return
+        if args.command == 'authorize':
+            authorize(args.data_directory, args.name)
+            return
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.data_directory))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,46 @@
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
-from rich.syntax import Syntax
 from rich.text import Text
 from rich.box import ROUNDED
 
+# rich.markdown, rich.syntax and rich.live pull in markdown-it and pygments, so
+# they are imported when first used rather than before the prompt appears
+
 console = Console()
 
 def print_assistant_response(text):
+    from rich.markdown import Markdown
     console.print()  # Add a blank line before the assistant's response
     md = Markdown(text)
     console.print(Panel(md, border_style="green", box=ROUNDED, expand=False, title="AI Agent", title_align="left"))
     console.print()  # Add a blank line after the assistant's response
 
+class AssistantResponseStream:
+    """Render the assistant's response panel live as text deltas arrive."""
+
+    def __init__(self):
+        self.text = ""
+        self._live = None
+
+    def _panel(self):
+        from rich.markdown import Markdown
+        return Panel(Markdown(self.text), border_style="green", box=ROUNDED, expand=False, title="AI Agent", title_align="left")
+
+    def append(self, delta):
+        if self._live is None:
+            from rich.live import Live
+            console.print()  # Add a blank line before the assistant's response
+            self._live = Live(self._panel(), console=console, refresh_per_second=12)
+            self._live.start()
+        self.text += delta
+        self._live.update(self._panel())
+
+    def close(self):
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+            console.print()  # Add a blank line after the assistant's response
+
 def print_system_message(text):
     console.print()  # Add a blank line before the system message
     system_text = Text(text, style="yellow")
@@ -20,6 +48,7 @@ def print_system_message(text):
     console.print()  # Add a blank line after the system message
 
 def print_code(code, language="python"):
+    from rich.syntax import Syntax
     syntax = Syntax(code, language, theme="monokai", line_numbers=True)
     console.print(Panel(syntax, border_style="red", box=ROUNDED, expand=False, title=f"Code ({language})", title_align="left"))
 
@@ -0,0 +1,48 @@
+"""Shared fixtures for the unit tests."""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeCalendar, FakeGoogleServer, FakeMailbox, build_fake_service
+from tools.google_services import get_service_manager
+from tools.quota import reset_buckets
+from tools.storage import use_workspace
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """Run the test against an empty workspace, so local stores start fresh."""
+    with use_workspace(str(tmp_path)):
+        yield tmp_path
+
+
+@pytest.fixture
+def fake_google(workspace, monkeypatch):
+    """
+    Start fake Gmail and Calendar servers and install them as the workspace's services.
+
+    The fixture is a function taking the mailbox and calendar sizes, which
+    returns the started server. Quotas are lifted so requests never wait.
+    """
+    for name in ('GMAIL_QUOTA_PER_SECOND', 'GMAIL_QUOTA_BURST', 'CALENDAR_QUOTA_PER_SECOND', 'CALENDAR_QUOTA_BURST'):
+        monkeypatch.setenv(name, '1e9')
+    reset_buckets()
+    servers = []
+
+    def start(message_count: int = 5, calendar_count: int = 1, events_per_calendar: int = 0) -> FakeGoogleServer:
+        server = FakeGoogleServer(mailbox=FakeMailbox(message_count=message_count),
+                                  calendar=FakeCalendar(calendar_count, events_per_calendar),
+                                  latency=0.0).start()
+        servers.append(server)
+        manager = get_service_manager()
+        manager.install_service('gmail', 'v1', build_fake_service('gmail', 'v1', server.url))
+        manager.install_service('calendar', 'v3', build_fake_service('calendar', 'v3', server.url))
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+    reset_buckets()
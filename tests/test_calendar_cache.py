@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tools import calendar_cache
+from tools.calendar_tools import get_calendar_service
+
+
+@pytest.fixture
+def calendar(fake_google):
+    """A fake primary calendar of 20 events over the next 60 days."""
+    return fake_google(calendar_count=1, events_per_calendar=20)
+
+
+def cached_state(store):
+    now = datetime.now(timezone.utc)
+    events = store.list_events('primary', now - timedelta(days=1), now + timedelta(days=90), max_results=None)
+    return ([event['id'] for event in events], store.get_meta('sync_token:primary'),
+            store.time_zone('primary'), store.get_meta('last_sync:primary'))
+
+
+def test_failed_full_sync_keeps_the_old_calendar(calendar, monkeypatch):
+    service, store = get_calendar_service(), calendar_cache.get_calendar_store()
+    assert calendar_cache.full_sync(service, store, 'primary') == {'mode': 'full', 'stored': 20}
+    before = cached_state(store)
+    assert len(before[0]) == 20 and before[1]
+
+    start = datetime.now(timezone.utc) + timedelta(hours=2)
+    calendar.calendar.put('primary', {'id': 'added', 'status': 'confirmed', 'summary': 'Added',
+                                      'start': {'dateTime': start.isoformat()},
+                                      'end': {'dateTime': (start + timedelta(hours=1)).isoformat()}})
+    write_changes = calendar_cache.CalendarStore._write_changes
+
+    def fail_after_writing(self, *args):
+        write_changes(self, *args)
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(calendar_cache.CalendarStore, '_write_changes', fail_after_writing)
+    with pytest.raises(RuntimeError):
+        calendar_cache.full_sync(service, store, 'primary')
+    assert cached_state(store) == before
+
+    monkeypatch.undo()
+    calendar_cache.full_sync(service, store, 'primary')
+    assert 'added' in cached_state(store)[0]
@@ -0,0 +1,24 @@
+import pytest
+
+from tools.calendar_tools import create_event
+
+
+@pytest.fixture
+def calendar(fake_google, monkeypatch):
+    """A fake Calendar with one empty primary calendar, read without the local cache."""
+    monkeypatch.setenv('CALENDAR_CACHE', 'false')
+    monkeypatch.setenv('TOOL_CACHE', 'false')
+    return fake_google(calendar_count=1, events_per_calendar=0)
+
+
+def test_overlap_warning_names_events_without_the_cache(calendar):
+    calendar.calendar.put('primary', {
+        'id': 'standup', 'status': 'confirmed', 'summary': 'Team standup',
+        'start': {'dateTime': '2031-01-13T10:00:00+00:00'}, 'end': {'dateTime': '2031-01-13T10:30:00+00:00'},
+    })
+    output = create_event('primary', 'Review', '2031-01-13T10:15:00+00:00', '2031-01-13T11:00:00+00:00')
+    assert output.startswith("Event created successfully!")
+    assert output.endswith("Warning: overlaps with Team standup")
+
+    output = create_event('primary', 'Lunch', '2031-01-13T12:00:00+00:00', '2031-01-13T13:00:00+00:00')
+    assert "Warning" not in output
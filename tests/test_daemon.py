@@ -0,0 +1,35 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from daemon import MAX_REQUEST_BYTES, AssistantDaemon
+
+
+async def stopped():
+    pass
+
+
+async def request(path, line):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(line)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response)
+
+
+def test_oversized_request_gets_an_error_event(tmp_path):
+    async def main():
+        scheduler = SimpleNamespace(start=lambda: None, stop=stopped)
+        daemon = AssistantDaemon(None, str(tmp_path / 'daemon.sock'), scheduler=scheduler)
+        await daemon.start()
+        try:
+            too_long = json.dumps({'command': 'message', 'message': 'x' * MAX_REQUEST_BYTES}).encode() + b'\n'
+            return (await request(daemon.path, too_long),
+                    await request(daemon.path, b'{"command": "ping"}\n'))
+        finally:
+            await daemon.stop()
+
+    rejected, ping = asyncio.run(main())
+    assert rejected['type'] == 'error' and rejected['status'] == 413
+    assert ping == {'type': 'done', 'status': 'ok'}
@@ -0,0 +1,37 @@
+import os
+
+from tools.file_tools import get_agent_directory, read_file, write_file
+from tools.storage import use_workspace
+
+
+def test_reads_and_writes_inside_the_agent_directory(workspace):
+    os.makedirs(os.path.join(get_agent_directory(), 'notes'))
+    assert write_file('notes/todo.txt', 'milk') == "Successfully wrote to notes/todo.txt"
+    assert read_file('notes/../notes/todo.txt') == 'milk'
+
+
+def test_parent_paths_cannot_reach_another_workspace(tmp_path):
+    bob = tmp_path / 'users' / 'bob'
+    bob.mkdir(parents=True)
+    (bob / 'thread_id.txt').write_text('thread_bob')
+    with use_workspace(str(tmp_path / 'users' / 'alice')):
+        output = read_file('../../bob/thread_id.txt')
+        assert output.startswith('Error reading file')
+        assert 'outside the agent directory' in output
+        assert write_file('../escaped.txt', 'x').startswith('Error writing file')
+    assert not (tmp_path / 'users' / 'alice' / 'escaped.txt').exists()
+
+
+def test_absolute_paths_are_rejected(workspace, tmp_path_factory):
+    secret = tmp_path_factory.mktemp('elsewhere') / 'secret.txt'
+    secret.write_text('secret')
+    assert read_file(str(secret)).startswith('Error reading file')
+    assert write_file(str(secret), 'overwritten').startswith('Error writing file')
+    assert secret.read_text() == 'secret'
+
+
+def test_symlinks_out_of_the_agent_directory_are_rejected(workspace, tmp_path_factory):
+    outside = tmp_path_factory.mktemp('outside')
+    (outside / 'secret.txt').write_text('secret')
+    os.symlink(outside, os.path.join(get_agent_directory(), 'link'))
+    assert read_file('link/secret.txt').startswith('Error reading file')
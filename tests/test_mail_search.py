@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from tools.gmail_tools import get_gmail_service, search_emails
+from tools.mailbox import get_mailbox_store, sync_mailbox
+from tools.mail_search import SearchQueryError, earliest_date, parse_query
+
+
+def test_earliest_date_takes_the_tightest_positive_bound():
+    assert earliest_date('invoice from:alice') is None
+    assert earliest_date('after:1600000000 after:1700000000 before:1800000000') == 1700000000 * 1000
+    # A negated bound excludes recent mail rather than old mail
+    assert earliest_date('-after:1700000000') is None
+    assert abs(earliest_date('newer_than:2d') - (time.time() - 2 * 86400) * 1000) < 5000
+
+
+def test_unsupported_operators_are_rejected():
+    with pytest.raises(SearchQueryError):
+        parse_query('filename:pdf')
+    # The mirror stores user labels by ID, so only system labels can be matched by name
+    with pytest.raises(SearchQueryError):
+        parse_query('label:Receipts')
+    conditions, params, _ = parse_query('in:drafts label:Starred')
+    assert params[:2] == ['% DRAFT %', '% STARRED %']
+
+
+@pytest.fixture
+def mirrored_gmail(fake_google, monkeypatch):
+    """A 30-message fake mailbox of which the mirror holds the newest 10 (one an hour)."""
+    for name, value in {'MAILBOX_MIRROR': 'true', 'MAILBOX_SYNC_LIMIT': '10', 'MESSAGE_CACHE': 'false',
+                        'TOOL_CACHE': 'false'}.items():
+        monkeypatch.setenv(name, value)
+    return fake_google(message_count=30)
+
+
+def sync():
+    sync_mailbox(get_gmail_service(), get_mailbox_store())
+
+
+def test_search_within_the_mirrored_range_stays_local(mirrored_gmail):
+    sync()
+    listed = mirrored_gmail.api_calls['gmail_messages_list']
+    search_emails(f'after:{int(time.time()) - 3 * 3600} report', 5)
+    assert mirrored_gmail.api_calls['gmail_messages_list'] == listed
+
+
+def test_search_past_the_mirror_goes_to_gmail(mirrored_gmail):
+    sync()
+    listed = mirrored_gmail.api_calls['gmail_messages_list']
+    for query in ('report', 'newer_than:1d report'):
+        search_emails(query, 5)
+        listed += 1
+        assert mirrored_gmail.api_calls['gmail_messages_list'] == listed
+
+
+def test_queries_the_mirror_cannot_answer_go_to_gmail(mirrored_gmail):
+    sync()
+    for query in ('cc:bob@example.com', 'label:Receipts', f'after:{int(time.time()) - 3 * 3600} larger:5M'):
+        listed = mirrored_gmail.api_calls['gmail_messages_list']
+        output = search_emails(query, 5)
+        assert not output.startswith("Error"), output
+        assert mirrored_gmail.api_calls['gmail_messages_list'] == listed + 1
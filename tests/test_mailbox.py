@@ -0,0 +1,58 @@
+import json
+import threading
+
+import pytest
+
+from tools import mailbox
+from tools.gmail_tools import get_gmail_service, list_emails
+
+
+@pytest.fixture
+def gmail(fake_google, monkeypatch):
+    """A 30-message fake mailbox whose mirror holds the newest 10."""
+    monkeypatch.setenv('MAILBOX_SYNC_LIMIT', '10')
+    return fake_google(message_count=30)
+
+
+def test_full_sync_mirrors_the_newest_messages(gmail):
+    store = mailbox.get_mailbox_store()
+    assert mailbox.full_sync(get_gmail_service(), store) == {'mode': 'full', 'stored': 10}
+    assert len(store.list_recent(10)) == 10
+    assert store.get_meta('complete') == '0'
+    assert not store.covers(None)
+
+
+def test_failed_full_sync_keeps_the_old_mirror(gmail, monkeypatch):
+    service, store = get_gmail_service(), mailbox.get_mailbox_store()
+    mailbox.full_sync(service, store)
+    before = (store.list_recent(10), store.get_meta('history_id'), store.get_meta('last_sync'))
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("connection reset")
+    monkeypatch.setattr(mailbox, 'fetch_messages', fail)
+    with pytest.raises(ConnectionError):
+        mailbox.full_sync(service, store)
+    assert (store.list_recent(10), store.get_meta('history_id'), store.get_meta('last_sync')) == before
+
+
+def test_first_sync_runs_behind_tool_calls(gmail, monkeypatch):
+    for name, value in {'MAILBOX_MIRROR': 'true', 'MESSAGE_CACHE': 'false', 'TOOL_CACHE': 'false'}.items():
+        monkeypatch.setenv(name, value)
+    release = threading.Event()
+    full_sync = mailbox.full_sync
+
+    def held_full_sync(*args):
+        release.wait(5)
+        return full_sync(*args)
+    monkeypatch.setattr(mailbox, 'full_sync', held_full_sync)
+
+    # Answered by Gmail while the sync waits
+    assert len(json.loads(list_emails(5, ''))) == 5
+    store = mailbox.get_mailbox_store()
+    assert store.initial_sync.is_alive()
+    release.set()
+    store.initial_sync.join(5)
+
+    listed = gmail.api_calls['gmail_messages_list']
+    assert len(json.loads(list_emails(5, ''))) == 5
+    assert gmail.api_calls['gmail_messages_list'] == listed
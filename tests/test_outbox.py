@@ -0,0 +1,73 @@
+import base64
+import time
+
+import pytest
+
+from tools import outbox
+from tools.gmail_tools import build_raw_message, send_email
+
+
+@pytest.fixture
+def gmail(fake_google, monkeypatch):
+    """A fake Gmail for the workspace, with the outbox on and fast retries."""
+    for name, value in {'EMAIL_OUTBOX': 'true', 'OUTBOX_SENDS_PER_MINUTE': '6000', 'OUTBOX_SEND_BURST': '100',
+                        'TOOL_CACHE': 'false'}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(outbox, 'INITIAL_BACKOFF_SECONDS', 0.01)
+    return fake_google(message_count=5)
+
+
+def sent_subjects(server):
+    return sorted(m['headers'][2]['value'] for m in server.mailbox.messages.values() if 'SENT' in m['labelIds'])
+
+
+def tracking_id(output):
+    return output.split('Tracking ID: ')[1].split('.')[0]
+
+
+def test_queued_emails_are_sent_once_even_when_responses_are_lost(gmail):
+    gmail.lost_send_rate = 0.5
+    outputs = [send_email(f"p{i}@example.com", f"Update {i}", "Hello", "plain") for i in range(6)]
+    assert all(output.startswith("Email queued") for output in outputs)
+    assert outbox.flush_outbox(timeout=10) == 0
+    assert sent_subjects(gmail) == [f"Update {i}" for i in range(6)]
+    assert '"status":"sent"' in outbox.email_status(tracking_id(outputs[0]))
+
+
+def test_repeated_call_returns_the_first_tracking_id(gmail):
+    first = send_email("a@example.com", "Hi", "Hello", "plain")
+    second = send_email("a@example.com", "Hi", "Hello", "plain")
+    assert second.startswith("This email was already queued")
+    assert tracking_id(first) == tracking_id(second)
+    outbox.flush_outbox(timeout=10)
+    assert sent_subjects(gmail) == ["Hi"]
+
+
+def interrupted_entry(server, delivered):
+    """An entry a crashed run left 'sending', after its message did or did not reach Gmail."""
+    message_id = outbox.new_message_id()
+    raw = build_raw_message("a@example.com", "Interrupted", "Hello", "plain", message_id)
+    store = outbox.get_outbox().store
+    entry = store.enqueue(raw, message_id, 'key', "a@example.com", "Interrupted")
+    assert store.claim(entry['id'])
+    if delivered:
+        server.mailbox.add_sent(base64.urlsafe_b64decode(raw))
+    return entry['id']
+
+
+@pytest.mark.parametrize('delivered', [False, True])
+def test_entry_left_sending_is_resumed_when_its_lease_expires(gmail, monkeypatch, delivered):
+    monkeypatch.setattr(outbox, 'SENDING_LEASE_SECONDS', 0.3)
+    entry_id = interrupted_entry(gmail, delivered)
+    assert outbox.resume_outbox() == 1
+    # Within the lease the entry may belong to another process, so it is not taken back yet
+    time.sleep(0.1)
+    assert outbox.get_outbox().store.get(entry_id)['status'] == outbox.SENDING
+    assert outbox.flush_outbox(timeout=5) == 0
+    assert outbox.get_outbox().store.get(entry_id)['status'] == outbox.SENT
+    assert sent_subjects(gmail) == ["Interrupted"]
+    assert gmail.api_calls['gmail_messages_send'] == (0 if delivered else 1)
+
+
+def test_status_of_an_unknown_tracking_id_is_an_error(gmail):
+    assert outbox.email_status("out_missing").startswith("Error")
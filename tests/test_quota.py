@@ -0,0 +1,52 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.quota import TokenBucket, call_within_quota, get_quota_stats, request_cost, reset_buckets
+
+
+@pytest.fixture
+def buckets(workspace, monkeypatch):
+    """Fresh buckets with a Gmail quota of 1000 units a second."""
+    monkeypatch.setenv('GMAIL_QUOTA_PER_SECOND', '1000')
+    monkeypatch.setenv('GMAIL_QUOTA_BURST', '1000')
+    reset_buckets()
+    yield
+    reset_buckets()
+
+
+def test_request_cost():
+    assert request_cost('gmail.users.messages.send') == ('gmail', 100)
+    assert request_cost('gmail.users.settings.get') == ('gmail', 5)
+    assert request_cost('calendar.events.list') == ('calendar', 1)
+    assert request_cost(None) == ('unknown', 1)
+
+
+def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=100, capacity=10)
+    assert bucket.acquire(10) < 0.01
+    waited = bucket.acquire(5)
+    assert 0.03 < waited < 0.2
+
+
+def test_throttled_bucket_pauses_and_slows_down_once_per_burst():
+    bucket = TokenBucket(rate=100, capacity=100)
+    bucket.throttled(0.1)
+    bucket.throttled(0.1)
+    assert bucket.rate == pytest.approx(50, rel=0.01)
+    assert bucket.get_stats()['throttled'] == 2
+    assert bucket.acquire(1) >= 0.09
+
+
+def test_call_within_quota_charges_batches_and_reports_rate_limits(buckets):
+    assert call_within_quota(['gmail.users.messages.get'] * 3 + ['calendar.events.get'], lambda: 'ok') == 'ok'
+    stats = get_quota_stats()
+    assert stats['gmail']['units'] == 15 and stats['calendar']['units'] == 1
+
+    def rejected():
+        raise HttpError(httplib2.Response({'status': '429', 'retry-after': '0'}), b'')
+    with pytest.raises(HttpError):
+        call_within_quota(['gmail.users.messages.send'], rejected)
+    stats = get_quota_stats()['gmail']
+    assert stats['throttled'] == 1
+    assert stats['rate'] == pytest.approx(500, rel=0.01)
@@ -0,0 +1,66 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from tools.retries import (IDEMPOTENT_RETRY, REJECTED_ONLY_RETRY, call_with_retry, is_rate_limited,
+                           retry_after_seconds, retry_scope)
+from tools.tool_definitions import READ_ONLY, TOOL_POLICIES, WRITE
+
+
+def http_error(status, reason='', retry_after='0'):
+    resp = httplib2.Response({'status': str(status), 'retry-after': retry_after})
+    content = f'{{"error": {{"code": {status}, "message": "failed", "errors": [{{"reason": "{reason}"}}]}}}}'.encode()
+    return HttpError(resp, content)
+
+
+def flaky(*errors):
+    """A call that raises the given errors in turn, then returns 'ok'."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+    return call, calls
+
+
+def test_retry_policy_follows_idempotence():
+    assert READ_ONLY.retry is IDEMPOTENT_RETRY
+    assert WRITE.retry is REJECTED_ONLY_RETRY
+    for name, policy in TOOL_POLICIES.items():
+        assert policy.retry is (IDEMPOTENT_RETRY if policy.idempotent else REJECTED_ONLY_RETRY), name
+
+
+def test_reads_retry_transient_errors():
+    call, calls = flaky(http_error(503), http_error(500))
+    with retry_scope('list_emails', READ_ONLY.retry):
+        assert call_with_retry(call) == 'ok'
+    assert len(calls) == 3
+
+
+def test_writes_only_retry_rejected_requests():
+    call, calls = flaky(http_error(503))
+    with retry_scope('send_email', WRITE.retry), pytest.raises(HttpError):
+        call_with_retry(call)
+    assert len(calls) == 1
+
+    call, calls = flaky(http_error(429), http_error(403, 'userRateLimitExceeded'))
+    with retry_scope('send_email', WRITE.retry):
+        assert call_with_retry(call) == 'ok'
+    assert len(calls) == 3
+
+
+def test_calls_outside_a_scope_are_made_once():
+    call, calls = flaky(http_error(503))
+    with pytest.raises(HttpError):
+        call_with_retry(call)
+    assert len(calls) == 1
+
+
+def test_rate_limit_signals():
+    assert retry_after_seconds(http_error(429, retry_after='7')) == 7.0
+    assert retry_after_seconds(ValueError()) is None
+    assert is_rate_limited(http_error(429))
+    assert is_rate_limited(http_error(403, 'rateLimitExceeded'))
+    assert not is_rate_limited(http_error(403, 'forbidden'))
@@ -0,0 +1,93 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tools import outbox, tool_handler
+from tools.tool_cache import ToolResultCache, get_tool_cache, normalize_arguments
+from tools.tool_handler import execute_tool_calls
+
+
+def test_arguments_are_normalized_to_defaults():
+    def list_events(calendar_id: str = "primary", max_results: int = 10, query: str = ""):
+        pass
+    assert normalize_arguments(list_events, {'calendar_id': '', 'query': ' standup '}) == \
+        {'calendar_id': 'primary', 'max_results': 10, 'query': 'standup'}
+
+
+def test_entries_expire():
+    cache = ToolResultCache()
+    cache.put('a', 'output', 0.05, {'mailbox'}, cache.generation)
+    assert cache.get('a') == 'output'
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.get_stats()['expired'] == 1
+
+
+def test_invalidation_drops_only_tagged_entries():
+    cache = ToolResultCache()
+    cache.put('inbox', 'inbox', 60, {'mailbox'}, cache.generation)
+    cache.put('message', 'message', 60, {'message:1'}, cache.generation)
+    assert cache.invalidate({'mailbox'}) == 1
+    assert cache.get('inbox') is None
+    assert cache.get('message') == 'message'
+
+
+def test_output_read_before_a_write_is_not_stored():
+    cache = ToolResultCache()
+    generation = cache.generation
+    cache.invalidate({'mailbox'})
+    cache.put('inbox', 'stale', 60, {'mailbox'}, generation)
+    assert cache.get('inbox') is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ToolResultCache(max_bytes=10)
+    cache.put('a', 'aaaa', 60, (), cache.generation)
+    cache.put('b', 'bbbb', 60, (), cache.generation)
+    cache.get('a')
+    cache.put('c', 'cccc', 60, (), cache.generation)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('aaaa', None, 'cccc')
+
+
+def run_tool(name, **arguments):
+    call = SimpleNamespace(id='call', function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+    return execute_tool_calls([call])[0]['output']
+
+
+def test_authentication_failures_are_not_cached(workspace, monkeypatch):
+    outputs = ["❌ Authentication failed: token expired", "[]"]
+
+    def list_emails(max_results: int = 10, query: str = ""):
+        return outputs.pop(0)
+    monkeypatch.setattr(tool_handler, 'get_function_map', lambda: {'list_emails': list_emails})
+    monkeypatch.setenv('TOOL_CACHE', 'true')
+    assert run_tool('list_emails', max_results=5, query='').startswith("❌")
+    assert run_tool('list_emails', max_results=5, query='') == "[]"
+
+
+@pytest.fixture
+def gmail(fake_google, monkeypatch):
+    """A fake Gmail behind the tool cache, with the outbox on."""
+    for name, value in {'EMAIL_OUTBOX': 'true', 'TOOL_CACHE': 'true', 'MAILBOX_MIRROR': 'false',
+                        'MESSAGE_CACHE': 'false'}.items():
+        monkeypatch.setenv(name, value)
+    return fake_google(message_count=5)
+
+
+def test_queued_email_invalidates_the_mailbox_on_delivery(gmail):
+    gmail.send_latency = 1.0
+    listed = run_tool('list_emails', max_results=5, query='')
+    lists = gmail.api_calls['gmail_messages_list']
+
+    assert run_tool('send_email', to='bob@example.com', subject='Hi', body='Hello', content_type='plain').startswith(
+        "Email queued")
+    # Nothing has reached the mailbox yet, so the cached listing is still current
+    assert run_tool('list_emails', max_results=5, query='') == listed
+    assert gmail.api_calls['gmail_messages_list'] == lists
+    assert get_tool_cache().get_stats()['invalidated'] == 0
+
+    assert outbox.flush_outbox(timeout=10) == 0
+    run_tool('list_emails', max_results=5, query='')
+    assert gmail.api_calls['gmail_messages_list'] == lists + 1
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from tools import tool_handler
+
+
+def tool_call(call_id, name, **arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+@pytest.fixture
+def fake_tools(monkeypatch):
+    """Replace the tools with recorders; send_email blocks until released."""
+    calls = []
+    release = threading.Event()
+
+    def send_email(to):
+        calls.append(to)
+        if to == 'slow':
+            release.wait(5)
+        return f"sent to {to}"
+
+    def list_emails():
+        return "[]"
+
+    monkeypatch.setattr(tool_handler, 'get_function_map',
+                        lambda: {'send_email': send_email, 'list_emails': list_emails})
+    monkeypatch.setenv('TOOL_TIMEOUT_SECONDS', '0.2')
+    monkeypatch.setenv('TOOL_CACHE', 'false')
+    yield calls
+    release.set()
+
+
+def test_queued_write_that_times_out_is_never_run(fake_tools):
+    outputs = tool_handler.execute_tool_calls([
+        tool_call('a', 'send_email', to='slow'),
+        tool_call('b', 'send_email', to='second'),
+        tool_call('c', 'list_emails'),
+    ])
+    time.sleep(0.3)
+    assert fake_tools == ['slow']
+    assert 'still running' in outputs[0]['output']
+    assert 'was not run' in outputs[1]['output']
+    assert outputs[2]['output'] == '[]'
+
+
+def test_async_serialized_lane_waits_for_a_write_that_outlived_its_timeout(fake_tools, monkeypatch):
+    running = []
+    overlaps = []
+
+    def send_email(to):
+        if running:
+            overlaps.append(to)
+        running.append(to)
+        try:
+            time.sleep(0.5 if to == 'slow' else 0.01)
+        finally:
+            running.remove(to)
+        return f"sent to {to}"
+
+    # The slow write holds the lane past the second call's timeout, but not the third's
+    monkeypatch.setattr(tool_handler, 'get_function_map', lambda: {'send_email': send_email})
+    outputs = asyncio.run(tool_handler.execute_tool_calls_async([
+        tool_call('a', 'send_email', to='slow'),
+        tool_call('b', 'send_email', to='second'),
+        tool_call('c', 'send_email', to='third'),
+    ], executor=ThreadPoolExecutor(max_workers=4)))
+    time.sleep(0.2)
+    assert overlaps == []
+    assert 'still running' in outputs[0]['output']
+    assert 'was not run' in outputs[1]['output']
+    assert outputs[2]['output'] == 'sent to third'
@@ -1,28 +1,59 @@
-from .tool_handler import handle_tool_calls
-from .tool_definitions import get_tool_definitions
-from .file_tools import read_file, write_file, list_files
-from .gmail_tools import list_emails, send_email, read_email, delete_email
-from .calendar_tools import (
-    list_calendars, list_events, create_event, update_event,
-    delete_event, get_event, create_calendar, delete_calendar
-)
-
-__all__ = [
-    'handle_tool_calls',
-    'get_tool_definitions',
-    'read_file',
-    'write_file',
-    'list_files',
-    'list_emails',
-    'send_email',
-    'read_email',
-    'delete_email',
-    'list_calendars',
-    'list_events',
-    'create_event',
-    'update_event',
-    'delete_event',
-    'get_event',
-    'create_calendar',
-    'delete_calendar',
-] 
\ No newline at end of file
+"""
+Tools the assistant can call, and their dispatcher.
+
+Names are imported from their submodules on first access, so importing the
+package (or a light submodule such as tools.storage) does not load the
+Google client libraries until a tool or service is actually used.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'handle_tool_calls': '.tool_handler',
+    'handle_tool_calls_async': '.tool_handler',
+    'get_tool_definitions': '.tool_definitions',
+    'get_service_manager': '.google_services',
+    'get_service_stats': '.google_services',
+    'get_retry_stats': '.retries',
+    'get_quota_stats': '.quota',
+    'get_message_cache_stats': '.message_cache',
+    'get_tool_cache_stats': '.tool_cache',
+    'read_file': '.file_tools',
+    'write_file': '.file_tools',
+    'list_files': '.file_tools',
+    'list_emails': '.gmail_tools',
+    'search_emails': '.gmail_tools',
+    'send_email': '.gmail_tools',
+    'email_status': '.outbox',
+    'read_email': '.gmail_tools',
+    'delete_email': '.gmail_tools',
+    'modify_emails': '.gmail_tools',
+    'trash_emails': '.gmail_tools',
+    'list_calendars': '.calendar_tools',
+    'list_events': '.calendar_tools',
+    'list_all_events': '.calendar_tools',
+    'create_event': '.calendar_tools',
+    'update_event': '.calendar_tools',
+    'batch_events': '.calendar_tools',
+    'delete_event': '.calendar_tools',
+    'get_event': '.calendar_tools',
+    'find_free_slots': '.calendar_tools',
+    'create_calendar': '.calendar_tools',
+    'delete_calendar': '.calendar_tools',
+    'next_page': '.output',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
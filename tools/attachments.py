@@ -0,0 +1,88 @@
+"""
+Content-addressed store for email attachments under the agent directory.
+
+Attachments are decoded from Gmail's base64 in slices and written to a
+temporary file while being hashed, then renamed to their SHA-256, so an
+attachment received many times is kept on disk once and the decoded bytes
+are never held in memory as a whole.
+"""
+
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+from .file_tools import get_agent_directory
+from .storage import env_number
+
+ATTACHMENTS_DIRECTORY = "attachments"
+# Gmail caps messages at 25 MB, so nothing larger should ever arrive
+DEFAULT_MAX_ATTACHMENT_BYTES = 25 * 1024 * 1024
+# Base64 characters decoded per slice; a multiple of 4 so slices decode independently
+DECODE_SLICE = 4 * 256 * 1024
+
+
+def get_max_attachment_bytes() -> int:
+    """Largest attachment that will be downloaded (ATTACHMENT_MAX_BYTES)."""
+    return int(env_number('ATTACHMENT_MAX_BYTES', DEFAULT_MAX_ATTACHMENT_BYTES))
+
+
+class AttachmentStore:
+    """Files named by the SHA-256 of their content, fanned out by hash prefix."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def store_base64(self, data: str) -> Dict[str, Any]:
+        """
+        Decode URL-safe base64 data into the store.
+
+        Returns:
+            Dict with the content's sha256, size in bytes and path relative to
+            the agent directory
+        """
+        digest = hashlib.sha256()
+        size = 0
+        handle, temp_path = tempfile.mkstemp(dir=self.root, prefix='.download-')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                # Gmail omits padding, which only matters for the final slice
+                for offset in range(0, len(data), DECODE_SLICE):
+                    piece = data[offset:offset + DECODE_SLICE]
+                    chunk = base64.urlsafe_b64decode(piece + '=' * (-len(piece) % 4))
+                    digest.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+            path = self.path_for(digest.hexdigest())
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return {
+            'sha256': digest.hexdigest(),
+            'size': size,
+            'path': os.path.relpath(path, get_agent_directory()),
+        }
+
+
+_stores: Dict[str, AttachmentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_attachment_store(root: Optional[str] = None) -> AttachmentStore:
+    """Return the attachment store under the agent directory."""
+    root = root or os.path.join(get_agent_directory(), ATTACHMENTS_DIRECTORY)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = AttachmentStore(root)
+        return _stores[root]
@@ -0,0 +1,403 @@
+"""
+Local SQLite cache of Google Calendar events.
+
+Each calendar is loaded once with events.list and then kept current with the
+nextSyncToken Calendar returns, so a sync with no changes costs one small
+request. Events are stored unexpanded (recurring events as a single row with
+their RRULE, plus any modified or cancelled instances) and recurring events
+are expanded locally for the requested time range.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, date, timedelta, timezone
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dateutil.rrule import rrulestr
+from googleapiclient.errors import HttpError
+from .calendar_tools import CACHED_EVENT_FIELDS
+from .google_services import execute_request
+from .quota import background_priority
+from .storage import SQLiteStore, get_data_directory, env_flag, env_number
+
+CALENDAR_DB_FILE = "calendar.db"
+SYNC_PAGE_SIZE = 2500
+
+
+def cache_enabled() -> bool:
+    """The cache is opt-in through CALENDAR_CACHE=true."""
+    return env_flag('CALENDAR_CACHE')
+
+
+def _zone(name: Optional[str]):
+    try:
+        return ZoneInfo(name) if name else timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def parse_event_time(value: Dict[str, str], default_zone: str = '') -> datetime:
+    """
+    Convert an event start/end to a datetime.
+
+    Timed values become aware datetimes in the event's time zone; all-day
+    values become naive midnights, which callers localize to the calendar zone.
+    """
+    if 'dateTime' in value:
+        moment = datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=_zone(value.get('timeZone') or default_zone))
+        if value.get('timeZone'):
+            moment = moment.astimezone(_zone(value['timeZone']))
+        return moment
+    return datetime.combine(date.fromisoformat(value['date']), datetime.min.time())
+
+
+def to_millis(moment: datetime, default_zone: str = '') -> int:
+    """Milliseconds since the epoch; naive datetimes are in default_zone."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=_zone(default_zone))
+    return int(moment.timestamp() * 1000)
+
+
+def parse_query_time(value: str) -> datetime:
+    """Parse an ISO time from a tool argument; times without an offset are UTC."""
+    moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _format_time(moment: datetime, all_day: bool) -> Dict[str, str]:
+    if all_day:
+        return {'date': moment.date().isoformat()}
+    return {'dateTime': moment.isoformat()}
+
+
+def _instance_suffix(original_start: datetime, all_day: bool) -> str:
+    # Calendar names instances <recurring id>_<original start>
+    if all_day:
+        return original_start.strftime('%Y%m%d')
+    return original_start.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _matches(event: Dict[str, Any], query: str) -> bool:
+    """Approximate Calendar's free-text q: every word appears in the event."""
+    if not query:
+        return True
+    text = ' '.join([
+        event.get('summary', ''), event.get('description', ''), event.get('location', ''),
+        ' '.join(a.get('email', '') + ' ' + a.get('displayName', '') for a in event.get('attendees', [])),
+    ]).lower()
+    return all(word in text for word in query.lower().split())
+
+
+class CalendarStore(SQLiteStore):
+    """SQLite store of calendar events indexed by calendar and start time."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        calendar_id TEXT NOT NULL,
+        id TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT '',
+        start_ms INTEGER,
+        end_ms INTEGER,
+        recurring INTEGER NOT NULL DEFAULT 0,
+        recurring_event_id TEXT NOT NULL DEFAULT '',
+        original_start_ms INTEGER,
+        resource TEXT NOT NULL,
+        PRIMARY KEY (calendar_id, id)
+    );
+    CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ms);
+    CREATE INDEX IF NOT EXISTS events_by_series ON events (calendar_id, recurring_event_id);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.sync_lock = threading.Lock()
+
+    def time_zone(self, calendar_id: str) -> str:
+        return self.get_meta(f'time_zone:{calendar_id}', '')
+
+    def apply_changes(self, calendar_id: str, events: Iterable[Dict[str, Any]]) -> int:
+        """
+        Store changed events; cancelled events and series are removed.
+
+        Cancelled instances of a recurring event are kept so the instance is
+        left out when the series is expanded. Returns the number of events applied.
+        """
+        upserts, deletes = self._change_rows(calendar_id, events, self.time_zone(calendar_id))
+        with self.write_lock, self.connection:
+            self._write_changes(calendar_id, upserts, deletes)
+        return len(upserts) + len(deletes)
+
+    def replace_calendar(self, calendar_id: str, events: Iterable[Dict[str, Any]], time_zone: str,
+                         sync_token: str) -> int:
+        """
+        Swap a calendar's events and sync state for a fresh listing in one transaction.
+
+        Readers see either the old calendar or the new one, and a failure
+        leaves the old events with the sync token that matches them. Returns
+        the number of events stored.
+        """
+        zone = time_zone or self.time_zone(calendar_id)
+        upserts, deletes = self._change_rows(calendar_id, events, zone)
+        with self.write_lock, self.connection:
+            self.connection.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            self._write_changes(calendar_id, upserts, deletes)
+            self._write_meta({f'time_zone:{calendar_id}': zone, f'sync_token:{calendar_id}': sync_token,
+                              f'last_sync:{calendar_id}': time.time()})
+        return len(upserts) + len(deletes)
+
+    @staticmethod
+    def _change_rows(calendar_id: str, events: Iterable[Dict[str, Any]], zone: str) -> Tuple[List[tuple], List[str]]:
+        """Rows to upsert and IDs of events and series to delete."""
+        upserts, deletes = [], []
+        for event in events:
+            recurring_event_id = event.get('recurringEventId', '')
+            original_start_ms = None
+            if 'originalStartTime' in event:
+                original_start_ms = to_millis(parse_event_time(event['originalStartTime'], zone), zone)
+            if event.get('status') == 'cancelled' and not recurring_event_id:
+                deletes.append(event['id'])
+                continue
+            start_ms = end_ms = None
+            if 'start' in event and 'end' in event:
+                start_ms = to_millis(parse_event_time(event['start'], zone), zone)
+                end_ms = to_millis(parse_event_time(event['end'], zone), zone)
+            upserts.append((
+                calendar_id, event['id'], event.get('status', ''), start_ms, end_ms,
+                1 if event.get('recurrence') else 0, recurring_event_id, original_start_ms,
+                json.dumps(event),
+            ))
+        return upserts, deletes
+
+    def _write_changes(self, calendar_id: str, upserts: List[tuple], deletes: List[str]) -> None:
+        # Runs inside the caller's transaction
+        for event_id in deletes:
+            self.connection.execute(
+                "DELETE FROM events WHERE calendar_id = ? AND (id = ? OR recurring_event_id = ?)",
+                (calendar_id, event_id, event_id)
+            )
+        self.connection.executemany(
+            "INSERT INTO events (calendar_id, id, status, start_ms, end_ms, recurring, "
+            "recurring_event_id, original_start_ms, resource) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(calendar_id, id) DO UPDATE SET status = excluded.status, "
+            "start_ms = excluded.start_ms, end_ms = excluded.end_ms, recurring = excluded.recurring, "
+            "recurring_event_id = excluded.recurring_event_id, "
+            "original_start_ms = excluded.original_start_ms, resource = excluded.resource",
+            upserts
+        )
+
+    def remove_event(self, calendar_id: str, event_id: str) -> None:
+        with self.write_lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM events WHERE calendar_id = ? AND (id = ? OR recurring_event_id = ?)",
+                (calendar_id, event_id, event_id)
+            )
+
+    def clear(self, calendar_id: str) -> None:
+        with self.write_lock, self.connection:
+            self.connection.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+
+    def list_events(self, calendar_id: str, time_min: datetime, time_max: datetime,
+                    max_results: Optional[int], query: str = '') -> List[Dict[str, Any]]:
+        """
+        Events overlapping [time_min, time_max) ordered by start time.
+
+        Recurring events are expanded into instances, like events.list with
+        singleEvents=True. max_results=None returns every match.
+        """
+        zone = self.time_zone(calendar_id)
+        min_ms, max_ms = to_millis(time_min), to_millis(time_max)
+        rows = self.connection.execute(
+            "SELECT resource FROM events WHERE calendar_id = ? AND recurring = 0 AND status != 'cancelled' "
+            "AND start_ms < ? AND end_ms > ? ORDER BY start_ms",
+            (calendar_id, max_ms, min_ms)
+        ).fetchall()
+        events = [(to_millis(parse_event_time(e['start'], zone), zone), e)
+                  for e in (json.loads(row['resource']) for row in rows)]
+
+        for row in self.connection.execute(
+            "SELECT id, resource FROM events WHERE calendar_id = ? AND recurring = 1 "
+            "AND status != 'cancelled' AND start_ms < ?",
+            (calendar_id, max_ms)
+        ).fetchall():
+            master = json.loads(row['resource'])
+            for instance in self._expand(calendar_id, master, time_min, time_max, zone):
+                events.append((to_millis(parse_event_time(instance['start'], zone), zone), instance))
+
+        events.sort(key=lambda item: item[0])
+        return [event for _, event in events if _matches(event, query)][:max_results]
+
+    def get_event(self, calendar_id: str, event_id: str) -> Optional[Dict[str, Any]]:
+        """Look up an event or an instance of a cached recurring event."""
+        row = self.connection.execute(
+            "SELECT resource, status FROM events WHERE calendar_id = ? AND id = ?", (calendar_id, event_id)
+        ).fetchone()
+        if row:
+            return json.loads(row['resource']) if row['status'] != 'cancelled' else None
+        master_id, _, suffix = event_id.rpartition('_')
+        if not master_id:
+            return None
+        row = self.connection.execute(
+            "SELECT resource FROM events WHERE calendar_id = ? AND id = ? AND recurring = 1",
+            (calendar_id, master_id)
+        ).fetchone()
+        if not row:
+            return None
+        zone = self.time_zone(calendar_id)
+        master = json.loads(row['resource'])
+        moment = datetime.strptime(suffix.rstrip('Z'), '%Y%m%dT%H%M%S' if 'T' in suffix else '%Y%m%d')
+        moment = moment.replace(tzinfo=timezone.utc) if 'T' in suffix else moment.replace(tzinfo=_zone(zone))
+        for instance in self._expand(calendar_id, master, moment, moment + timedelta(seconds=1), zone):
+            if instance['id'] == event_id:
+                return instance
+        return None
+
+    def get_etag(self, calendar_id: str, event_id: str) -> Optional[str]:
+        """
+        ETag of a stored event, or None if it is not stored as itself.
+
+        Instances expanded from a series have no ETag of their own.
+        """
+        row = self.connection.execute(
+            "SELECT resource FROM events WHERE calendar_id = ? AND id = ? AND status != 'cancelled'",
+            (calendar_id, event_id)
+        ).fetchone()
+        return json.loads(row['resource']).get('etag') if row else None
+
+    def _expand(self, calendar_id: str, master: Dict[str, Any], time_min: datetime,
+                time_max: datetime, zone: str) -> List[Dict[str, Any]]:
+        """Instances of a recurring event overlapping the range, minus exceptions."""
+        all_day = 'date' in master['start']
+        start = parse_event_time(master['start'], zone)
+        duration = parse_event_time(master['end'], zone) - start
+        lines = list(master.get('recurrence', []))
+        if all_day:
+            # Naive all-day series cannot use UTC UNTIL values
+            lines = [re.sub(r'(UNTIL=\d{8})(T\d{6}Z?)', r'\1', line) for line in lines]
+            window = (time_min.astimezone(_zone(zone)).replace(tzinfo=None),
+                      time_max.astimezone(_zone(zone)).replace(tzinfo=None))
+        else:
+            window = (time_min, time_max)
+
+        rules = rrulestr('\n'.join(lines), dtstart=start, forceset=True)
+        overridden = {row['original_start_ms'] for row in self.connection.execute(
+            "SELECT original_start_ms FROM events WHERE calendar_id = ? AND recurring_event_id = ?",
+            (calendar_id, master['id'])
+        ).fetchall()}
+
+        instances = []
+        for occurrence in rules.between(window[0] - duration, window[1], inc=True):
+            if occurrence + duration <= window[0] or occurrence >= window[1]:
+                continue
+            if to_millis(occurrence, zone) in overridden:
+                continue
+            instance = {key: value for key, value in master.items() if key != 'recurrence'}
+            instance['id'] = f"{master['id']}_{_instance_suffix(occurrence, all_day)}"
+            instance['recurringEventId'] = master['id']
+            instance['start'] = dict(master['start'], **_format_time(occurrence, all_day))
+            instance['end'] = dict(master['end'], **_format_time(occurrence + duration, all_day))
+            instance['originalStartTime'] = dict(instance['start'])
+            instances.append(instance)
+        return instances
+
+    def seconds_since_sync(self, calendar_id: str) -> float:
+        last_sync = self.get_meta(f'last_sync:{calendar_id}')
+        return time.time() - float(last_sync) if last_sync else float('inf')
+
+    def mark_stale(self, calendar_id: str) -> None:
+        """Force the next read of the calendar to sync first."""
+        if self.get_meta(f'last_sync:{calendar_id}'):
+            self.set_meta(f'last_sync:{calendar_id}', 0)
+
+
+def _list_changes(service, calendar_id: str, sync_token: Optional[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Page through events.list, returning the events and the last page."""
+    events, page_token = [], None
+    while True:
+        kwargs = {'calendarId': calendar_id, 'maxResults': SYNC_PAGE_SIZE, 'pageToken': page_token,
+                  'fields': CACHED_EVENT_FIELDS.mask('items', 'timeZone', 'nextPageToken', 'nextSyncToken')}
+        if sync_token:
+            kwargs['syncToken'] = sync_token
+        response = execute_request(service.events().list(**kwargs))
+        events.extend(response.get('items', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return events, response
+
+
+def full_sync(service, store: CalendarStore, calendar_id: str) -> Dict[str, Any]:
+    """Reload a calendar from scratch and record its sync token."""
+    events, last_page = _list_changes(service, calendar_id, None)
+    stored = store.replace_calendar(calendar_id, events, last_page.get('timeZone', ''),
+                                    last_page.get('nextSyncToken', ''))
+    return {'mode': 'full', 'stored': stored}
+
+
+def incremental_sync(service, store: CalendarStore, calendar_id: str) -> Dict[str, Any]:
+    """
+    Apply changes since the stored sync token.
+
+    Calendar answers 410 Gone when the token has expired, in which case the
+    calendar is reloaded with a full sync.
+    """
+    sync_token = store.get_meta(f'sync_token:{calendar_id}')
+    if not sync_token:
+        return full_sync(service, store, calendar_id)
+    try:
+        events, last_page = _list_changes(service, calendar_id, sync_token)
+    except HttpError as e:
+        if e.resp.status == 410:
+            return full_sync(service, store, calendar_id)
+        raise
+    applied = store.apply_changes(calendar_id, events)
+    store.set_meta(f'sync_token:{calendar_id}', last_page.get('nextSyncToken', sync_token))
+    store.set_meta(f'last_sync:{calendar_id}', time.time())
+    return {'mode': 'incremental', 'applied': applied}
+
+
+_stores: Dict[str, CalendarStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_calendar_store() -> CalendarStore:
+    """Return the calendar store for the current data directory."""
+    path = os.path.join(get_data_directory(), CALENDAR_DB_FILE)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CalendarStore(path)
+        return _stores[path]
+
+
+def get_fresh_calendar(service, calendar_id: str) -> Optional[CalendarStore]:
+    """
+    Return the cache if it is enabled and the calendar was synced within
+    CALENDAR_CACHE_MAX_AGE_SECONDS.
+
+    A stale calendar is synced first. Returns None when the cache is disabled
+    or the sync fails, in which case callers should query Calendar directly.
+    """
+    if not cache_enabled():
+        return None
+    store = get_calendar_store()
+    max_age = env_number('CALENDAR_CACHE_MAX_AGE_SECONDS', 60)
+    if store.seconds_since_sync(calendar_id) <= max_age:
+        return store
+    with store.sync_lock:
+        # Another tool call may have synced while we waited for the lock
+        if store.seconds_since_sync(calendar_id) <= max_age:
+            return store
+        try:
+            with background_priority():
+                incremental_sync(service, store, calendar_id)
+        except Exception as e:
+            print(f"Warning: Calendar sync failed: {e}")
+            return None
+    return store
@@ -1,14 +1,53 @@
 import os
-import pickle
 import base64
+import heapq
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from functools import lru_cache
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from .google_services import get_service_manager, execute_request, execute_batch, map_concurrently
+from .fields import FieldSet
+from .output import render_output
+from .intervals import IntervalIndex, working_windows, free_slots
+from .storage import env_number
+
+# FreeBusy accepts at most 50 calendars per query; longer ranges are split
+FREEBUSY_MAX_CALENDARS = 50
+FREEBUSY_MAX_DAYS = 60
+DEFAULT_TIME_ZONE = 'America/Los_Angeles'
+# Calendars queried at the same time by list_all_events (CALENDAR_FETCH_CONCURRENCY)
+DEFAULT_CALENDAR_CONCURRENCY = 8
+EVENTS_PAGE_SIZE = 2500
+# Calls per Calendar batch request; Google recommends no more than 50
+CALENDAR_BATCH_SIZE = 50
+
+# Fields the tools read, requested as partial responses and projected into their outputs
+CALENDAR_FIELDS = FieldSet(
+    ('id', 'summary', 'description', 'primary', 'accessRole', 'backgroundColor', 'foregroundColor'),
+    defaults={'summary': 'No title', 'description': '', 'primary': False, 'accessRole': '',
+              'backgroundColor': '', 'foregroundColor': ''},
+)
+CALENDAR_NAME_FIELDS = FieldSet(('id', 'summary'))
+EVENT_FIELDS = FieldSet(
+    ('id', 'summary', 'description', 'start', 'end', 'location', 'attendees(email)', 'htmlLink', 'status'),
+    defaults={'summary': 'No title', 'description': '', 'location': '', 'attendees': [], 'htmlLink': '', 'status': ''},
+)
+EVENT_DETAIL_FIELDS = FieldSet(EVENT_FIELDS.fields + ('created', 'updated', 'etag'),
+                               defaults=dict(EVENT_FIELDS.defaults, created='', updated='', etag=''))
+# list_all_events recognizes an event shared by two calendars by its iCalUID and original start
+MERGED_EVENT_FIELDS = EVENT_FIELDS.plus('iCalUID', 'originalStartTime')
+# Enough of an event to name it and to tell whether it blocks time, as blocks_time does
+BUSY_EVENT_FIELDS = FieldSet(('summary', 'start', 'end', 'status', 'transparency',
+                              'attendees(self,responseStatus)'))
+# calendars is keyed by calendar ID, which a mask cannot name, so it is kept whole
+FREEBUSY_FIELDS = FieldSet(('calendars',))
+# Events stored in the local cache are served to every tool and expanded from recurrence rules
+CACHED_EVENT_FIELDS = EVENT_DETAIL_FIELDS.plus(
+    'iCalUID', 'originalStartTime', 'recurrence', 'recurringEventId', 'transparency',
+    'attendees(email,displayName,self,responseStatus)',
+)
+CREATED_EVENT_FIELDS = FieldSet(('id', 'htmlLink'))
+SAVED_EVENT_FIELDS = FieldSet(('id',))
 
 # If modifying these scopes, delete the token.pickle file.
 SCOPES = [
@@ -16,77 +55,205 @@ SCOPES = [
     'https://www.googleapis.com/auth/calendar.events',
     'https://www.googleapis.com/auth/calendar.readonly'
 ]
+get_service_manager().register_scopes(SCOPES)
 
 def get_calendar_service():
-    """Get or create Google Calendar API service."""
-    creds = None
-    
-    # Check for credentials file with different possible names
-    credentials_file = None
-    possible_names = ['credentials.json', 'Credentials.json', 'client_secret.json']
-    
-    for name in possible_names:
-        if os.path.exists(name):
-            credentials_file = name
-            break
-    
-    if not credentials_file:
-        error_msg = (
-            "❌ Google Calendar authentication failed: Missing credentials file!\n\n"
-            "To fix this:\n"
-            "1. Download your credentials.json file from Google Cloud Console\n"
-            "2. Place it in the same directory as main.py\n"
-            "3. Make sure it's named 'credentials.json' (lowercase)\n"
-            "4. Delete token.pickle if it exists and run again\n\n"
-            f"Current directory: {os.getcwd()}\n"
-            f"Files in directory: {[f for f in os.listdir('.') if f.endswith('.json')]}"
-        )
-        return error_msg
-    
-    # The file token.pickle stores the user's access and refresh tokens
-    if os.path.exists('token.pickle'):
-        try:
-            with open('token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        except Exception as e:
-            print(f"Warning: Could not load token.pickle: {e}")
-            # Remove corrupted token file
-            if os.path.exists('token.pickle'):
-                os.remove('token.pickle')
-    
-    # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                print(f"Warning: Could not refresh token: {e}")
-                # Remove invalid token file
-                if os.path.exists('token.pickle'):
-                    os.remove('token.pickle')
-                creds = None
-        
-        if not creds:
-            try:
-                print(f"🔐 Starting Google Calendar authentication using {credentials_file}...")
-                flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
-                creds = flow.run_local_server(port=0)
-                
-                # Save the credentials for the next run
-                with open('token.pickle', 'wb') as token:
-                    pickle.dump(creds, token)
-                print("✅ Google Calendar authentication successful!")
-                
-            except Exception as e:
-                error_msg = f"❌ Google Calendar authentication failed: {str(e)}\n\nPlease check your credentials.json file and try again."
-                return error_msg
+    """Get the shared Google Calendar API service."""
+    return get_service_manager().get_service('calendar', 'v3', SCOPES, 'Google Calendar')
+
+def get_calendar_cache():
+    """Return the local event cache when CALENDAR_CACHE is enabled, else None."""
+    # Imported here so the cache and its dependencies load only when used
+    from .calendar_cache import cache_enabled, get_calendar_store
+    return get_calendar_store() if cache_enabled() else None
+
+def get_fresh_calendar_cache(service, calendar_id: str):
+    """Return the event cache with calendar_id synced within CALENDAR_CACHE_MAX_AGE_SECONDS, or None."""
+    from .calendar_cache import get_fresh_calendar
+    return get_fresh_calendar(service, calendar_id)
+
+def format_event(event: Dict[str, Any], detailed: bool = False) -> Dict[str, Any]:
+    """
+    Convert a Calendar event resource to the summary returned by the tools.
+
+    Args:
+        event: Event resource from the API or the local cache
+        detailed: Include created/updated timestamps
+    Returns:
+        Dict with the event's id, title, times, location and attendees
+    """
+    event_info = (EVENT_DETAIL_FIELDS if detailed else EVENT_FIELDS).project(event)
+    for key in ('start', 'end'):
+        event_info[key] = event[key].get('dateTime', event[key].get('date'))
+    event_info['attendees'] = [attendee['email'] for attendee in event_info['attendees']]
+    return event_info
+
+def blocks_time(event: Dict[str, Any]) -> bool:
+    """Return True if the event makes its calendar busy, as FreeBusy would."""
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return False
+    return not any(a.get('self') and a.get('responseStatus') == 'declined' for a in event.get('attendees', []))
+
+def build_busy_index(service, calendar_ids: List[str], attendees: List[str], time_min: datetime, time_max: datetime,
+                     named: bool = False) -> Tuple[IntervalIndex, List[str]]:
+    """
+    Collect busy time for calendars and attendees into an interval index.
+
+    Calendars in the local cache contribute their events (so conflicts can be
+    named); everything else is asked for through one FreeBusy query per chunk.
+    With named set, the user's calendars that are not cached are read with
+    events.list instead, which costs a request per calendar but names each
+    conflict; attendees always go through FreeBusy.
+
+    Args:
+        service: Calendar API service instance
+        calendar_ids: The user's calendars to include
+        attendees: Email addresses whose busy time comes from FreeBusy
+        time_min: Start of the range (timezone-aware)
+        time_max: End of the range (timezone-aware)
+        named: List uncached calendars' events rather than their busy blocks
+    Returns:
+        Tuple of the index and a list of calendars whose busy time was unavailable
+    """
+    from .calendar_cache import parse_event_time, to_millis
+    index = IntervalIndex()
+    remote = []
+    for calendar_id in calendar_ids:
+        cache = get_fresh_calendar_cache(service, calendar_id)
+        if cache is not None:
+            events = cache.list_events(calendar_id, time_min, time_max, max_results=None)
+            zone = cache.time_zone(calendar_id)
+        elif named:
+            events, zone = list_busy_events(service, calendar_id, time_min, time_max)
+        else:
+            remote.append(calendar_id)
+            continue
+        for event in events:
+            if blocks_time(event):
+                start = to_millis(parse_event_time(event['start'], zone), zone) / 1000
+                end = to_millis(parse_event_time(event['end'], zone), zone) / 1000
+                index.add(start, end, event.get('summary', 'No title'), calendar_id)
+    remote.extend(email for email in attendees if email not in remote)
+
+    unavailable = []
+    chunk_start = time_min
+    while remote and chunk_start < time_max:
+        chunk_end = min(time_max, chunk_start + timedelta(days=FREEBUSY_MAX_DAYS))
+        for offset in range(0, len(remote), FREEBUSY_MAX_CALENDARS):
+            response = execute_request(service.freebusy().query(body={
+                'timeMin': chunk_start.isoformat(),
+                'timeMax': chunk_end.isoformat(),
+                'items': [{'id': item} for item in remote[offset:offset + FREEBUSY_MAX_CALENDARS]],
+            }, fields=FREEBUSY_FIELDS.mask()))
+            for calendar_id, info in response.get('calendars', {}).items():
+                if info.get('errors'):
+                    if calendar_id not in unavailable:
+                        unavailable.append(calendar_id)
+                    continue
+                for busy in info.get('busy', []):
+                    start = datetime.fromisoformat(busy['start'].replace('Z', '+00:00')).timestamp()
+                    end = datetime.fromisoformat(busy['end'].replace('Z', '+00:00')).timestamp()
+                    index.add(start, end, 'busy', calendar_id)
+        chunk_start = chunk_end
+    return index, unavailable
+
+def list_busy_events(service, calendar_id: str, time_min: datetime, time_max: datetime) -> Tuple[List[Dict[str, Any]], str]:
+    """Fetch every event on a calendar in a range, with the fields build_busy_index reads, and the calendar's zone."""
+    events, zone, page_token = [], '', None
+    while True:
+        response = execute_request(service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            maxResults=EVENTS_PAGE_SIZE,
+            singleEvents=True,
+            pageToken=page_token,
+            fields=BUSY_EVENT_FIELDS.mask('items', 'timeZone', 'nextPageToken')
+        ))
+        events.extend(response.get('items', []))
+        zone = response.get('timeZone', zone)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return events, zone
 
+def check_overlaps(service, calendar_id: str, event: Dict[str, Any]) -> str:
+    """
+    Describe existing busy time that a new event would overlap.
+
+    Args:
+        service: Calendar API service instance
+        calendar_id: Calendar the event is being added to
+        event: Event body about to be inserted
+    Returns:
+        str: Warning sentence to append to the result, or "" if there is no overlap
+    """
     try:
-        # Create Google Calendar API service
-        service = build('calendar', 'v3', credentials=creds)
-        return service
-    except Exception as e:
-        return f"Error creating Google Calendar service: {str(e)}"
+        from .calendar_cache import parse_event_time
+        start = parse_event_time(event['start'])
+        end = parse_event_time(event['end'])
+        attendees = [attendee['email'] for attendee in event.get('attendees', [])]
+        index, _ = build_busy_index(service, [calendar_id], attendees, start, end, named=True)
+        overlaps = index.overlapping(start.timestamp(), end.timestamp())
+    except Exception:
+        # The check is advisory and must never stop the event being created
+        return ""
+    if not overlaps:
+        return ""
+    names = sorted({f"{o.label} ({o.source})" if o.source != calendar_id else o.label for o in overlaps})
+    return f". Warning: overlaps with {', '.join(names)}"
+
+def build_event(summary: str, start_time: str, end_time: str, description: str = "",
+                location: str = "", attendees: str = "") -> Dict[str, Any]:
+    """Build the body of a new event in the default time zone."""
+    event = {
+        'summary': summary,
+        'description': description or "",
+        'location': location or "",
+        'start': {
+            'dateTime': start_time,
+            'timeZone': DEFAULT_TIME_ZONE,
+        },
+        'end': {
+            'dateTime': end_time,
+            'timeZone': DEFAULT_TIME_ZONE,
+        },
+    }
+    if attendees:
+        event['attendees'] = [{'email': email.strip()} for email in attendees.split(',') if email.strip()]
+    return event
+
+def build_event_patch(summary: str = "", start_time: str = "", end_time: str = "", description: str = "",
+                      location: str = "", attendees: str = "") -> Dict[str, Any]:
+    """Build an events.patch body holding only the fields that are given."""
+    patch: Dict[str, Any] = {}
+    if summary:
+        patch['summary'] = summary
+    if start_time:
+        # Nested objects are merged by patch, so the event keeps its time zone
+        patch['start'] = {'dateTime': start_time}
+    if end_time:
+        patch['end'] = {'dateTime': end_time}
+    if description:
+        patch['description'] = description
+    if location:
+        patch['location'] = location
+    if attendees:
+        patch['attendees'] = [{'email': email.strip()} for email in attendees.split(',') if email.strip()]
+    return patch
+
+def patch_event_request(service, calendar_id: str, event_id: str, patch: Dict[str, Any], etag: Optional[str] = None,
+                        fields: Optional[str] = None):
+    """
+    Build an events.patch request, conditional on the event's ETag when known.
+
+    With an ETag the server answers 412 instead of applying the patch if the
+    event changed after that version was read, so no read is needed first.
+    fields is the partial-response mask for the updated event.
+    """
+    request = service.events().patch(calendarId=calendar_id, eventId=event_id, body=patch, fields=fields)
+    if etag:
+        request.headers['If-Match'] = etag
+    return request
 
 def list_calendars() -> str:
     """
@@ -100,22 +267,10 @@ def list_calendars() -> str:
         if isinstance(service, str):
             return service  # Return error message
         
-        calendars = service.calendarList().list().execute()
-        calendar_list = []
-        
-        for calendar in calendars.get('items', []):
-            calendar_info = {
-                'id': calendar['id'],
-                'summary': calendar.get('summary', 'No title'),
-                'description': calendar.get('description', ''),
-                'primary': calendar.get('primary', False),
-                'accessRole': calendar.get('accessRole', ''),
-                'backgroundColor': calendar.get('backgroundColor', ''),
-                'foregroundColor': calendar.get('foregroundColor', '')
-            }
-            calendar_list.append(calendar_info)
-            
-        return str(calendar_list)
+        calendars = execute_request(service.calendarList().list(fields=CALENDAR_FIELDS.mask('items')))
+        calendar_list = [CALENDAR_FIELDS.project(calendar) for calendar in calendars.get('items', [])]
+        
+        return render_output('list_calendars', calendar_list)
     except Exception as e:
         return f"Error listing calendars: {str(e)}"
 
@@ -150,37 +305,155 @@ def list_events(calendar_id: str = "primary", max_results: int = 10, time_min: s
         if not time_max:
             time_max = (now + timedelta(days=7)).isoformat() + 'Z'
         
-        events_result = service.events().list(
+        cache = get_fresh_calendar_cache(service, calendar_id)
+        if cache is not None:
+            from .calendar_cache import parse_query_time
+            events = cache.list_events(
+                calendar_id, parse_query_time(time_min), parse_query_time(time_max), max_results, query
+            )
+            return render_output('list_events', [format_event(event) for event in events])
+
+        events_result = execute_request(service.events().list(
             calendarId=calendar_id,
             timeMin=time_min,
             timeMax=time_max,
             maxResults=max_results,
             q=query,
             singleEvents=True,
-            orderBy='startTime'
-        ).execute()
+            orderBy='startTime',
+            fields=EVENT_FIELDS.mask('items')
+        ))
         
-        events = events_result.get('items', [])
-        event_list = []
-        
-        for event in events:
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            end = event['end'].get('dateTime', event['end'].get('date'))
-            
-            event_info = {
-                'id': event['id'],
-                'summary': event.get('summary', 'No title'),
-                'description': event.get('description', ''),
-                'start': start,
-                'end': end,
-                'location': event.get('location', ''),
-                'attendees': [attendee['email'] for attendee in event.get('attendees', [])],
-                'htmlLink': event.get('htmlLink', ''),
-                'status': event.get('status', '')
-            }
-            event_list.append(event_info)
+        event_list = [format_event(event) for event in events_result.get('items', [])]
             
-        return str(event_list)
+        return render_output('list_events', event_list)
+    except Exception as e:
+        return f"Error listing events: {str(e)}"
+
+def list_calendar_ids(service) -> List[Tuple[str, str]]:
+    """Return (id, summary) for every calendar in the user's calendar list."""
+    calendars, page_token = [], None
+    while True:
+        response = execute_request(service.calendarList().list(
+            pageToken=page_token, fields=CALENDAR_NAME_FIELDS.mask('items', 'nextPageToken')))
+        calendars.extend((c['id'], c.get('summary', c['id'])) for c in response.get('items', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return calendars
+
+def fetch_calendar_events(service, calendar_id: str, time_min: str, time_max: str, max_results: int, query: str = "") -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Fetch up to max_results expanded events from one calendar, ordered by start.
+
+    Served from the local cache when it is enabled and fresh; otherwise
+    events.list is paged through until max_results events are collected.
+
+    Returns:
+        Tuple of the events and the calendar's time zone (for all-day events)
+    """
+    cache = get_fresh_calendar_cache(service, calendar_id)
+    if cache is not None:
+        from .calendar_cache import parse_query_time
+        events = cache.list_events(calendar_id, parse_query_time(time_min), parse_query_time(time_max), max_results, query)
+        return events, cache.time_zone(calendar_id)
+
+    events, zone, page_token = [], '', None
+    while len(events) < max_results:
+        response = execute_request(service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            maxResults=min(max_results - len(events), EVENTS_PAGE_SIZE),
+            q=query,
+            singleEvents=True,
+            orderBy='startTime',
+            pageToken=page_token,
+            fields=MERGED_EVENT_FIELDS.mask('items', 'timeZone', 'nextPageToken')
+        ))
+        events.extend(response.get('items', []))
+        zone = response.get('timeZone', zone)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    return events[:max_results], zone
+
+def list_all_events(calendar_ids: str = "", max_results: int = 25, time_min: str = "", time_max: str = "", query: str = "") -> str:
+    """
+    List events from several calendars as one list ordered by start time.
+    
+    Calendars are queried concurrently and their results merged; an event
+    that appears on more than one calendar is listed once.
+    
+    Args:
+        calendar_ids: Comma-separated calendar IDs (default: every calendar in the user's list)
+        max_results: Maximum number of events to return in total
+        time_min: Start time in ISO format (default: now)
+        time_max: End time in ISO format (default: 7 days from now)
+        query: Search query for events
+    Returns:
+        str: JSON string of merged events or error message
+    """
+    try:
+        service = get_calendar_service()
+        if isinstance(service, str):
+            return service  # Return error message
+        
+        from .calendar_cache import parse_event_time, to_millis
+        
+        # Set default values if not provided
+        if not max_results:
+            max_results = 25
+        now = datetime.utcnow()
+        if not time_min:
+            time_min = now.isoformat() + 'Z'
+        if not time_max:
+            time_max = (now + timedelta(days=7)).isoformat() + 'Z'
+        
+        if calendar_ids and calendar_ids.strip().lower() != 'all':
+            calendars = [(c.strip(), c.strip()) for c in calendar_ids.split(',') if c.strip()]
+        else:
+            calendars = list_calendar_ids(service)
+        
+        def fetch(calendar):
+            try:
+                return fetch_calendar_events(service, calendar[0], time_min, time_max, max_results, query)
+            except Exception as e:
+                return e
+        
+        concurrency = int(env_number('CALENDAR_FETCH_CONCURRENCY', DEFAULT_CALENDAR_CONCURRENCY))
+        results = map_concurrently(fetch, calendars, concurrency)
+        
+        # Each calendar's events are already in start order, so a k-way merge suffices
+        streams, errors = [], {}
+        for (calendar_id, name), result in zip(calendars, results):
+            if isinstance(result, Exception):
+                errors[calendar_id] = str(result)
+                continue
+            events, zone = result
+            streams.append([
+                (to_millis(parse_event_time(event['start'], zone), zone), calendar_id, name, event)
+                for event in events
+            ])
+        
+        merged, seen = [], set()
+        # Ties keep calendar order, so a shared event is attributed to the first calendar listed
+        for _, calendar_id, name, event in heapq.merge(*streams, key=lambda item: item[0]):
+            # The same meeting on two calendars shares its iCalUID and start
+            key = (event.get('iCalUID', event['id']), str(event.get('originalStartTime', event['start'])))
+            if key in seen:
+                continue
+            seen.add(key)
+            event_info = format_event(event)
+            event_info['calendarId'] = calendar_id
+            event_info['calendar'] = name
+            merged.append(event_info)
+            if len(merged) >= max_results:
+                break
+        
+        result = {'events': merged}
+        if errors:
+            result['errors'] = errors
+        return render_output('list_all_events', result, items='events')
     except Exception as e:
         return f"Error listing events: {str(e)}"
 
@@ -207,36 +480,23 @@ def create_event(calendar_id: str = "primary", summary: str = "", start_time: st
         # Set default values if not provided
         if not calendar_id:
             calendar_id = "primary"
-        if not description:
-            description = ""
-        if not location:
-            location = ""
         
-        event = {
-            'summary': summary,
-            'description': description,
-            'location': location,
-            'start': {
-                'dateTime': start_time,
-                'timeZone': 'America/Los_Angeles',  # PST timezone
-            },
-            'end': {
-                'dateTime': end_time,
-                'timeZone': 'America/Los_Angeles',  # PST timezone
-            },
-        }
+        event = build_event(summary, start_time, end_time, description, location, attendees)
         
-        # Add attendees if provided
-        if attendees:
-            attendee_list = [{'email': email.strip()} for email in attendees.split(',')]
-            event['attendees'] = attendee_list
+        warning = check_overlaps(service, calendar_id, event)
         
-        event = service.events().insert(
+        # The local cache stores the events it is given, so it needs every field it reads
+        cache = get_calendar_cache()
+        event = execute_request(service.events().insert(
             calendarId=calendar_id,
-            body=event
-        ).execute()
+            body=event,
+            fields=(CACHED_EVENT_FIELDS if cache is not None else CREATED_EVENT_FIELDS).mask()
+        ))
         
-        return f"Event created successfully! Event ID: {event['id']}, Link: {event.get('htmlLink', 'N/A')}"
+        if cache is not None:
+            cache.apply_changes(calendar_id, [event])
+        
+        return f"Event created successfully! Event ID: {event['id']}, Link: {event.get('htmlLink', 'N/A')}{warning}"
     except Exception as e:
         return f"Error creating event: {str(e)}"
 
@@ -244,6 +504,10 @@ def update_event(calendar_id: str, event_id: str, summary: str = "", start_time:
     """
     Update an existing calendar event.
     
+    Only the given fields are sent, with events.patch. If the event is in the
+    local cache its ETag makes the patch conditional, so a change made by
+    someone else since the last sync is reported instead of overwritten.
+    
     Args:
         calendar_id: Calendar ID
         event_id: Event ID to update
@@ -260,31 +524,109 @@ def update_event(calendar_id: str, event_id: str, summary: str = "", start_time:
         if isinstance(service, str):
             return service  # Return error message
         
-        # Get the existing event
-        event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
-        
-        # Update only the fields that are provided
-        if summary:
-            event['summary'] = summary
-        if start_time:
-            event['start']['dateTime'] = start_time
-        if end_time:
-            event['end']['dateTime'] = end_time
-        if description:
-            event['description'] = description
-        if location:
-            event['location'] = location
-        
-        updated_event = service.events().update(
-            calendarId=calendar_id,
-            eventId=event_id,
-            body=event
-        ).execute()
+        patch = build_event_patch(summary, start_time, end_time, description, location)
+        if not patch:
+            return "Error updating event: no fields to update"
+        
+        cache = get_calendar_cache()
+        etag = cache.get_etag(calendar_id, event_id) if cache is not None else None
+        try:
+            fields = (CACHED_EVENT_FIELDS if cache is not None else SAVED_EVENT_FIELDS).mask()
+            updated_event = execute_request(patch_event_request(service, calendar_id, event_id, patch, etag, fields))
+        except HttpError as e:
+            if e.resp.status != 412:
+                raise
+            # The ETag came from the cache, which is evidently behind
+            cache.mark_stale(calendar_id)
+            return f"Error updating event: event {event_id} was changed since it was last read; check it with get_event and try again"
+        
+        if cache is not None:
+            cache.apply_changes(calendar_id, [updated_event])
         
         return f"Event updated successfully! Event ID: {updated_event['id']}"
     except Exception as e:
         return f"Error updating event: {str(e)}"
 
+def batch_events(calendar_id: str, events: List[Dict[str, str]]) -> str:
+    """
+    Create and update many events with Calendar batch requests.
+
+    Specs without an event_id are created; specs with one are patched with
+    only their non-empty fields, conditional on the spec's etag or, failing
+    that, the cached ETag. Unlike create_event, created events are not checked
+    for overlaps.
+
+    Args:
+        calendar_id: Calendar ID (default: "primary")
+        events: Event specs with event_id, etag, summary, start_time, end_time,
+            description, location and attendees (empty strings are unset)
+    Returns:
+        str: Counts and per-event results ({'index', 'id', 'status'} or
+        {'index', 'error'}) in input order, or error message
+    """
+    try:
+        service = get_calendar_service()
+        if isinstance(service, str):
+            return service  # Return error message
+        if not calendar_id:
+            calendar_id = "primary"
+        cache = get_calendar_cache()
+        mask = (CACHED_EVENT_FIELDS if cache is not None else SAVED_EVENT_FIELDS).mask()
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(events)
+        requests = []
+        for index, spec in enumerate(events):
+            fields = {key: (spec.get(key) or "").strip() for key in
+                      ('summary', 'start_time', 'end_time', 'description', 'location', 'attendees')}
+            event_id = (spec.get('event_id') or "").strip()
+            if not event_id:
+                if not (fields['summary'] and fields['start_time'] and fields['end_time']):
+                    results[index] = {'index': index, 'error': "summary, start_time and end_time are required to create an event"}
+                    continue
+                requests.append((index, 'created', lambda body=build_event(**fields):
+                                 service.events().insert(calendarId=calendar_id, body=body, fields=mask)))
+                continue
+            patch = build_event_patch(**fields)
+            if not patch:
+                results[index] = {'index': index, 'error': "no fields to update"}
+                continue
+            etag = (spec.get('etag') or "").strip() or (cache.get_etag(calendar_id, event_id) if cache is not None else None)
+            requests.append((index, 'updated', lambda event_id=event_id, patch=patch, etag=etag:
+                             patch_event_request(service, calendar_id, event_id, patch, etag, mask)))
+
+        saved = []
+        # One batch at a time keeps bursts under Calendar's per-user write rate limit
+        for offset in range(0, len(requests), CALENDAR_BATCH_SIZE):
+            chunk = requests[offset:offset + CALENDAR_BATCH_SIZE]
+            try:
+                responses = execute_batch(service, chunk, lambda item: item[2]())
+            except Exception as e:
+                responses = [{'error': str(e), 'reason': str(e)} for _ in chunk]
+            for (index, status, _), response in zip(chunk, responses):
+                if 'error' not in response:
+                    saved.append(response)
+                    results[index] = {'index': index, 'id': response['id'], 'status': status}
+                elif response.get('status') == 412:
+                    results[index] = {'index': index, 'error': "event changed since it was last read; check it with get_event"}
+                else:
+                    results[index] = {'index': index, 'error': response['reason']}
+
+        if cache is not None:
+            if saved:
+                cache.apply_changes(calendar_id, saved)
+            if len(saved) < len(requests):
+                cache.mark_stale(calendar_id)
+
+        summary = {
+            'created': sum(1 for r in results if r.get('status') == 'created'),
+            'updated': sum(1 for r in results if r.get('status') == 'updated'),
+            'failed': sum(1 for r in results if 'error' in r),
+            'results': results,
+        }
+        return render_output('batch_events', summary, items='results')
+    except Exception as e:
+        return f"Error saving events: {str(e)}"
+
 def delete_event(calendar_id: str, event_id: str) -> str:
     """
     Delete a calendar event.
@@ -300,10 +642,16 @@ def delete_event(calendar_id: str, event_id: str) -> str:
         if isinstance(service, str):
             return service  # Return error message
         
-        service.events().delete(
+        execute_request(service.events().delete(
             calendarId=calendar_id,
             eventId=event_id
-        ).execute()
+        ))
+        
+        cache = get_calendar_cache()
+        if cache is not None:
+            # Deleting one instance of a series changes the series, so resync it
+            cache.remove_event(calendar_id, event_id)
+            cache.mark_stale(calendar_id)
         
         return f"Event {event_id} deleted successfully"
     except Exception as e:
@@ -324,29 +672,85 @@ def get_event(calendar_id: str, event_id: str) -> str:
         if isinstance(service, str):
             return service  # Return error message
         
-        event = service.events().get(
-            calendarId=calendar_id,
-            eventId=event_id
-        ).execute()
-        
-        event_info = {
-            'id': event['id'],
-            'summary': event.get('summary', 'No title'),
-            'description': event.get('description', ''),
-            'start': event['start'].get('dateTime', event['start'].get('date')),
-            'end': event['end'].get('dateTime', event['end'].get('date')),
-            'location': event.get('location', ''),
-            'attendees': [attendee['email'] for attendee in event.get('attendees', [])],
-            'htmlLink': event.get('htmlLink', ''),
-            'status': event.get('status', ''),
-            'created': event.get('created', ''),
-            'updated': event.get('updated', '')
-        }
+        cache = get_fresh_calendar_cache(service, calendar_id)
+        event = cache.get_event(calendar_id, event_id) if cache is not None else None
+        if event is None:
+            event = execute_request(service.events().get(
+                calendarId=calendar_id,
+                eventId=event_id,
+                fields=EVENT_DETAIL_FIELDS.mask()
+            ))
+        
+        event_info = format_event(event, detailed=True)
         
-        return str(event_info)
+        return render_output('get_event', event_info)
     except Exception as e:
         return f"Error getting event: {str(e)}"
 
+def find_free_slots(time_min: str, time_max: str, duration_minutes: int = 30, calendar_ids: str = "primary", attendees: str = "", working_hours: str = "09:00-17:00", time_zone: str = DEFAULT_TIME_ZONE, include_weekends: bool = False, max_results: int = 10) -> str:
+    """
+    Find free time slots and report conflicts across calendars and attendees.
+    
+    Args:
+        time_min: Start of the search range in ISO format
+        time_max: End of the search range in ISO format
+        duration_minutes: Minimum length of a free slot
+        calendar_ids: Comma-separated calendar IDs to check (default: "primary")
+        attendees: Comma-separated attendee emails checked through FreeBusy
+        working_hours: Daily window as HH:MM-HH:MM in time_zone (default: 09:00-17:00)
+        time_zone: IANA time zone for working hours and results (default: PST)
+        include_weekends: Also search Saturdays and Sundays
+        max_results: Maximum number of free slots to return
+    Returns:
+        str: JSON string with free slots and conflicts or error message
+    """
+    try:
+        service = get_calendar_service()
+        if isinstance(service, str):
+            return service  # Return error message
+        
+        from zoneinfo import ZoneInfo
+        from .calendar_cache import parse_query_time
+        
+        # Set default values if not provided
+        if not duration_minutes:
+            duration_minutes = 30
+        if not max_results:
+            max_results = 10
+        zone = ZoneInfo(time_zone or DEFAULT_TIME_ZONE)
+        day_start, day_end = [datetime.strptime(part.strip(), '%H:%M').time()
+                              for part in (working_hours or "09:00-17:00").split('-')]
+        range_start, range_end = parse_query_time(time_min), parse_query_time(time_max)
+        if range_end <= range_start:
+            return "Error finding free slots: time_max must be after time_min"
+        calendars = [c.strip() for c in (calendar_ids or "primary").split(',') if c.strip()]
+        people = [a.strip() for a in attendees.split(',') if a.strip()]
+        
+        index, unavailable = build_busy_index(service, calendars, people, range_start, range_end)
+        windows = working_windows(range_start, range_end, zone, day_start, day_end, include_weekends)
+        slots = free_slots(index, windows, duration_minutes * 60, max_results)
+        
+        def local(timestamp: float) -> str:
+            return datetime.fromtimestamp(timestamp, zone).isoformat()
+        
+        # Only the user's own calendars can conflict; attendees' busy time just blocks slots
+        conflicts = [{
+            'first': {'summary': first.label, 'calendar': first.source, 'start': local(first.start), 'end': local(first.end)},
+            'second': {'summary': second.label, 'calendar': second.source, 'start': local(second.start), 'end': local(second.end)},
+        } for first, second in index.conflicts(range_start.timestamp(), range_end.timestamp())
+            if first.source in calendars and second.source in calendars]
+        
+        result = {
+            'free_slots': [{'start': local(start), 'end': local(end)} for start, end in slots],
+            'conflicts': conflicts,
+            'busy_periods': len(index),
+        }
+        if unavailable:
+            result['unavailable'] = unavailable
+        return render_output('find_free_slots', result, items='conflicts')
+    except Exception as e:
+        return f"Error finding free slots: {str(e)}"
+
 def create_calendar(summary: str = "", description: str = "", time_zone: str = "America/Los_Angeles") -> str:
     """
     Create a new secondary calendar.
@@ -375,7 +779,7 @@ def create_calendar(summary: str = "", description: str = "", time_zone: str = "
             'timeZone': time_zone
         }
         
-        created_calendar = service.calendars().insert(body=calendar).execute()
+        created_calendar = execute_request(service.calendars().insert(body=calendar, fields=CALENDAR_NAME_FIELDS.mask()))
         
         return f"Calendar created successfully! Calendar ID: {created_calendar['id']}, Summary: {created_calendar['summary']}"
     except Exception as e:
@@ -395,7 +799,11 @@ def delete_calendar(calendar_id: str) -> str:
         if isinstance(service, str):
             return service  # Return error message
         
-        service.calendars().delete(calendarId=calendar_id).execute()
+        execute_request(service.calendars().delete(calendarId=calendar_id))
+        
+        cache = get_calendar_cache()
+        if cache is not None:
+            cache.clear(calendar_id)
         
         return f"Calendar {calendar_id} deleted successfully"
     except Exception as e:
@@ -0,0 +1,73 @@
+"""
+Partial responses for Google API requests.
+
+Gmail and Calendar return every field of a resource unless the request names
+the fields it wants in the standard `fields` parameter. A FieldSet declares
+the fields a caller reads; the same declaration builds the request's mask and
+projects the response, so the two cannot drift apart.
+"""
+
+import re
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from typing import Any, Dict, Optional, Tuple
+from .storage import env_flag
+
+_TOP_LEVEL = re.compile(r'[^/(,]+')
+
+
+def field_masks_enabled() -> bool:
+    """Requests name the fields they need unless GOOGLE_FIELD_MASKS=false."""
+    return env_flag('GOOGLE_FIELD_MASKS', True)
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    """
+    The fields of one kind of resource that a caller reads.
+
+    Attributes:
+        fields: Fields in partial-response syntax; sub-selections such as
+            "attendees(email)" and paths such as "payload/headers" are allowed
+        defaults: Value project() gives a field the resource does not have
+    """
+    fields: Tuple[str, ...]
+    defaults: Dict[str, Any] = field(default_factory=dict, hash=False, compare=False)
+
+    @cached_property
+    def names(self) -> Tuple[str, ...]:
+        """Top-level names of the fields, in declaration order."""
+        return tuple(dict.fromkeys(_TOP_LEVEL.match(name).group(0) for name in self.fields))
+
+    def plus(self, *fields: str) -> 'FieldSet':
+        """
+        This set with more fields, e.g. ones only one caller needs.
+
+        A field with the same top-level name as an existing one replaces it,
+        so "attendees(email,self)" widens "attendees(email)".
+        """
+        added = {_TOP_LEVEL.match(name).group(0): name for name in fields}
+        kept = tuple(name for name in self.fields if _TOP_LEVEL.match(name).group(0) not in added)
+        return replace(self, fields=kept + tuple(added.values()))
+
+    def mask(self, collection: str = '', *extra: str) -> Optional[str]:
+        """
+        The `fields` parameter selecting these fields.
+
+        Args:
+            collection: Response field holding a list of these resources
+                (e.g. "items"), or "" when the response is the resource itself
+            *extra: Other top-level response fields to keep, e.g. "nextPageToken"
+        Returns:
+            Optional[str]: The mask, or None (every field) when masks are disabled
+        """
+        if not field_masks_enabled():
+            return None
+        selection = ','.join(self.fields)
+        if collection:
+            selection = f"{collection}({selection})"
+        return ','.join((selection,) + extra)
+
+    def project(self, resource: Dict[str, Any]) -> Dict[str, Any]:
+        """The resource's top-level fields in this set, with defaults for missing ones."""
+        return {name: resource.get(name, self.defaults.get(name)) for name in self.names}
@@ -1,20 +1,34 @@
 import os
 import json
 from functools import lru_cache
+from .storage import workspace_path
 
 AGENT_DIRECTORY = "agent_directory"
 
 # Cache the directory check
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=None)
+def _ensure_directory(path):
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
 def get_agent_directory():
-    """Get or create the agent directory."""
-    if not os.path.exists(AGENT_DIRECTORY):
-        os.makedirs(AGENT_DIRECTORY)
-    return AGENT_DIRECTORY
+    """Get or create the agent directory of the current workspace."""
+    return _ensure_directory(workspace_path(AGENT_DIRECTORY))
 
 def get_full_path(file_path):
-    """Get the full path for a file."""
-    return os.path.join(get_agent_directory(), file_path)
+    """
+    Get the full path for a file in the agent directory.
+
+    Raises:
+        ValueError: The path leads outside the agent directory, e.g. through
+            '..', an absolute path or a symlink
+    """
+    root = os.path.realpath(get_agent_directory())
+    path = os.path.realpath(os.path.join(root, file_path))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{file_path!r} is outside the agent directory")
+    return path
 
 def read_file(file_path):
     """Read a file from the agent directory."""
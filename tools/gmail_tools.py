@@ -1,16 +1,24 @@
 import os
-import pickle
 import base64
+import json
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from .google_services import get_service_manager, execute_request, execute_batch, map_concurrently
+from .fields import FieldSet
+from .output import render_output
+from .retries import is_retryable
 from typing import List, Dict, Optional, Any
 from functools import lru_cache
 
+# Gmail accepts at most this many IDs per messages.batchModify call
+BATCH_MODIFY_LIMIT = 1000
+# Cap on messages a bulk tool applies to when selecting by query
+DEFAULT_BULK_MAX_MESSAGES = 500
+# Labels whose ID is also their name, so they need no labels.list lookup
+SYSTEM_LABELS = {'INBOX', 'UNREAD', 'STARRED', 'IMPORTANT', 'SPAM', 'TRASH', 'SENT', 'DRAFT'}
+
 # If modifying these scopes, delete the token.pickle file.
 SCOPES = [
     'https://www.googleapis.com/auth/gmail.readonly',
@@ -18,81 +26,38 @@ SCOPES = [
     'https://www.googleapis.com/auth/gmail.modify',
     'https://www.googleapis.com/auth/gmail.labels'
 ]
+get_service_manager().register_scopes(SCOPES)
+
+# Fields read from each response, requested as partial responses
+LISTED_MESSAGE_FIELDS = FieldSet(('id', 'threadId', 'payload/headers'))
+# parse_message reads the payload; the mirror also stores labels, dates and the snippet
+FULL_MESSAGE_FIELDS = FieldSet((
+    'id', 'threadId', 'historyId', 'internalDate', 'snippet', 'labelIds', 'sizeEstimate',
+    'payload(headers,body,parts)',
+))
+MESSAGE_PARTS_FIELDS = FieldSet(('payload/parts',))
+MESSAGE_REF_FIELDS = FieldSet(('id',))
+ATTACHMENT_FIELDS = FieldSet(('data',))
+LABEL_FIELDS = FieldSet(('id', 'name'))
 
 def get_gmail_service():
-    """Get or create Gmail API service."""
-    creds = None
-    
-    # Check for credentials file with different possible names
-    credentials_file = None
-    possible_names = ['credentials.json', 'Credentials.json', 'client_secret.json']
-    
-    for name in possible_names:
-        if os.path.exists(name):
-            credentials_file = name
-            break
-    
-    if not credentials_file:
-        error_msg = (
-            "❌ Gmail authentication failed: Missing credentials file!\n\n"
-            "To fix this:\n"
-            "1. Download your credentials.json file from Google Cloud Console\n"
-            "2. Place it in the same directory as main.py\n"
-            "3. Make sure it's named 'credentials.json' (lowercase)\n"
-            "4. Delete token.pickle if it exists and run again\n\n"
-            f"Current directory: {os.getcwd()}\n"
-            f"Files in directory: {[f for f in os.listdir('.') if f.endswith('.json')]}"
-        )
-        return error_msg
-    
-    # The file token.pickle stores the user's access and refresh tokens
-    if os.path.exists('token.pickle'):
-        try:
-            with open('token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        except Exception as e:
-            print(f"Warning: Could not load token.pickle: {e}")
-            # Remove corrupted token file
-            if os.path.exists('token.pickle'):
-                os.remove('token.pickle')
-    
-    # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                print(f"Warning: Could not refresh token: {e}")
-                # Remove invalid token file
-                if os.path.exists('token.pickle'):
-                    os.remove('token.pickle')
-                creds = None
-        
-        if not creds:
-            try:
-                print(f"🔐 Starting Gmail authentication using {credentials_file}...")
-                flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
-                creds = flow.run_local_server(port=0)
-                
-                # Save the credentials for the next run
-                with open('token.pickle', 'wb') as token:
-                    pickle.dump(creds, token)
-                print("✅ Gmail authentication successful!")
-                
-            except Exception as e:
-                error_msg = f"❌ Gmail authentication failed: {str(e)}\n\nPlease check your credentials.json file and try again."
-                return error_msg
+    """Get the shared Gmail API service."""
+    return get_service_manager().get_service('gmail', 'v1', SCOPES, 'Gmail')
 
-    try:
-        # Create Gmail API service
-        service = build('gmail', 'v1', credentials=creds)
-        return service
-    except Exception as e:
-        return f"Error creating Gmail service: {str(e)}"
+def get_mailbox_mirror():
+    """Return the local mailbox mirror when MAILBOX_MIRROR is enabled, else None."""
+    # Imported here because the mailbox module builds on the helpers below
+    from .mailbox import mirror_enabled, get_mailbox_store
+    return get_mailbox_store() if mirror_enabled() else None
 
-def get_attachment_data(service, user_id: str, message_id: str, attachment_id: str) -> Dict[str, Any]:
+def get_fresh_mailbox_mirror(service):
+    """Return the mailbox mirror synced to within MAILBOX_MAX_AGE_SECONDS, or None."""
+    from .mailbox import get_fresh_mailbox
+    return get_fresh_mailbox(service)
+
+def save_attachment(service, user_id: str, message_id: str, attachment_id: str) -> Dict[str, Any]:
     """
-    Get the attachment data for a specific attachment.
+    Download an attachment into the content-addressed attachment store.
     
     Args:
         service: Gmail API service instance
@@ -100,24 +65,169 @@ def get_attachment_data(service, user_id: str, message_id: str, attachment_id: s
         message_id: ID of the email message
         attachment_id: ID of the attachment
     Returns:
-        Dict containing attachment data and metadata
+        Dict with the stored file's path, size and sha256, or an error
     """
     try:
-        attachment = service.users().messages().attachments().get(
+        attachment = execute_request(service.users().messages().attachments().get(
             userId=user_id,
             messageId=message_id,
-            id=attachment_id
-        ).execute()
-
-        file_data = base64.urlsafe_b64decode(attachment['data'].encode('UTF-8'))
-        return {
-            'data': file_data,
-            'size': attachment.get('size'),
-            'type': attachment.get('mimeType')
-        }
+            id=attachment_id,
+            fields=ATTACHMENT_FIELDS.mask()
+        ))
+
+        from .attachments import get_attachment_store
+        return get_attachment_store().store_base64(attachment['data'])
     except Exception as e:
         return {'error': f"Error getting attachment: {str(e)}"}
 
+def _find_inline_data(parts: List[Dict[str, Any]], filename: str) -> Optional[str]:
+    """Find the base64 data of a small attachment Gmail sent inline in the message."""
+    for part in parts:
+        if part.get('filename') == filename and 'data' in part.get('body', {}):
+            return part['body']['data']
+        data = _find_inline_data(part.get('parts', []), filename)
+        if data is not None:
+            return data
+    return None
+
+def save_message_attachments(service, message_id: str, attachments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Download a message's attachments in parallel into the attachment store.
+    
+    Attachments over ATTACHMENT_MAX_BYTES are skipped. Data is written to
+    disk, never returned, so results only carry metadata and a file path.
+    
+    Args:
+        service: Gmail API service instance
+        message_id: ID of the email message
+        attachments: Attachment metadata from parse_message
+    Returns:
+        List of attachment metadata with 'path' and 'sha256', or 'error'
+    """
+    from .attachments import get_attachment_store, get_max_attachment_bytes
+    max_bytes = get_max_attachment_bytes()
+    message = None
+    if any(not attachment.get('id') for attachment in attachments):
+        # Small attachments come inline in the message rather than by ID
+        message = execute_request(service.users().messages().get(
+            userId='me', id=message_id, format='full', fields=MESSAGE_PARTS_FIELDS.mask()))
+
+    def download(attachment: Dict[str, Any]) -> Dict[str, Any]:
+        result = {key: attachment[key] for key in ('filename', 'mimeType', 'size') if key in attachment}
+        if attachment.get('size', 0) > max_bytes:
+            result['error'] = f"Not downloaded: larger than {max_bytes} bytes"
+        elif attachment.get('id'):
+            result.update(save_attachment(service, 'me', message_id, attachment['id']))
+        else:
+            data = _find_inline_data(message['payload'].get('parts', []), attachment['filename'])
+            if data is None:
+                result['error'] = "Not downloaded: attachment has no data"
+            else:
+                result.update(get_attachment_store().store_base64(data))
+        return result
+
+    return map_concurrently(download, attachments, get_fetch_settings()['max_workers'])
+
+def _env_int(name: str, default: int) -> int:
+    """Read a positive integer setting from the environment."""
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+def get_fetch_settings() -> Dict[str, Any]:
+    """
+    Get the settings used to fetch many messages at once.
+
+    GMAIL_FETCH_MODE selects 'batch' (Google batch endpoint) or 'concurrent'
+    (parallel single requests). GMAIL_BATCH_SIZE caps the calls per batch
+    (Gmail allows 100 but throttles large batches, so 50 is the default) and
+    GMAIL_FETCH_CONCURRENCY caps the parallel requests or batches in flight.
+    """
+    mode = os.getenv('GMAIL_FETCH_MODE', 'batch').lower()
+    return {
+        'mode': mode if mode in ('batch', 'concurrent') else 'batch',
+        'chunk_size': min(_env_int('GMAIL_BATCH_SIZE', 50), 100),
+        'max_workers': _env_int('GMAIL_FETCH_CONCURRENCY', 4),
+    }
+
+def _batch_chunk(service, message_ids: List[str], build_request) -> List[Dict[str, Any]]:
+    """
+    Run one request per message through a single batch HTTP request.
+
+    Returns:
+        Responses in the same order as message_ids; failures are returned as
+        {'id': ..., 'error': ...}
+    """
+    responses = execute_batch(service, message_ids, build_request)
+    return [
+        {'id': message_id, 'error': response['error']} if 'error' in response else response
+        for message_id, response in zip(message_ids, responses)
+    ]
+
+def _fetch_chunk(service, message_ids: List[str], get_kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Fetch one chunk of messages through a single batch HTTP request."""
+    return _batch_chunk(
+        service, message_ids,
+        lambda message_id: service.users().messages().get(userId='me', id=message_id, **get_kwargs)
+    )
+
+def _fetch_one(service, message_id: str, get_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch a single message, returning an error entry instead of raising."""
+    try:
+        return execute_request(service.users().messages().get(userId='me', id=message_id, **get_kwargs))
+    except Exception as e:
+        return {'id': message_id, 'error': str(e)}
+
+def fetch_messages(service, message_ids: List[str], mode: Optional[str] = None,
+                   chunk_size: Optional[int] = None, max_workers: Optional[int] = None,
+                   **get_kwargs) -> List[Dict[str, Any]]:
+    """
+    Fetch many messages with few round trips, keeping the input order.
+
+    Args:
+        service: Gmail API service instance
+        message_ids: IDs of the messages to fetch
+        mode: 'batch' or 'concurrent' (default: GMAIL_FETCH_MODE)
+        chunk_size: Calls per batch request (default: GMAIL_BATCH_SIZE)
+        max_workers: Requests or batches in flight (default: GMAIL_FETCH_CONCURRENCY)
+        **get_kwargs: Extra arguments for messages().get(), e.g. format
+    Returns:
+        List of message resources in the same order as message_ids. Messages
+        that failed to load are returned as {'id': ..., 'error': ...}.
+    """
+    if not message_ids:
+        return []
+    settings = get_fetch_settings()
+    mode = mode or settings['mode']
+    chunk_size = chunk_size or settings['chunk_size']
+    max_workers = max_workers or settings['max_workers']
+
+    if mode == 'concurrent':
+        return map_concurrently(lambda message_id: _fetch_one(service, message_id, get_kwargs), message_ids, max_workers)
+
+    chunks = [message_ids[i:i + chunk_size] for i in range(0, len(message_ids), chunk_size)]
+    chunk_results = map_concurrently(lambda chunk: _fetch_chunk(service, chunk, get_kwargs), chunks, max_workers)
+    return [message for chunk in chunk_results for message in chunk]
+
+def list_message_ids(service, max_results: int, query: str = "") -> List[Dict[str, str]]:
+    """List up to max_results message references, following pagination."""
+    messages = []
+    page_token = None
+    while len(messages) < max_results:
+        results = execute_request(service.users().messages().list(
+            userId='me',
+            maxResults=min(max_results - len(messages), 500),
+            q=query,
+            pageToken=page_token,
+            fields=MESSAGE_REF_FIELDS.mask('messages', 'nextPageToken')
+        ))
+        messages.extend(results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return messages[:max_results]
+
 def list_emails(max_results: int = 10, query: str = "") -> str:
     """
     List emails from Gmail inbox.
@@ -130,23 +240,33 @@ def list_emails(max_results: int = 10, query: str = "") -> str:
     """
     try:
         service = get_gmail_service()
-        results = service.users().messages().list(
-            userId='me', 
-            maxResults=max_results,
-            q=query
-        ).execute()
-        
-        messages = results.get('messages', [])
+        if isinstance(service, str):
+            return service  # Return error message
+        if not max_results:
+            max_results = 10
+
+        # Unfiltered listings can be answered from a fresh local mirror
+        if not query:
+            mirror = get_fresh_mailbox_mirror(service)
+            email_list = mirror.list_recent(max_results) if mirror else None
+            if email_list is not None:
+                return render_output('list_emails', email_list)
+
+        messages = list_message_ids(service, max_results, query)
+        fetched = fetch_messages(
+            service,
+            [message['id'] for message in messages],
+            format='metadata',
+            metadataHeaders=['From', 'Subject', 'Date'],
+            fields=LISTED_MESSAGE_FIELDS.mask()
+        )
         email_list = []
         
-        for message in messages:
-            msg = service.users().messages().get(
-                userId='me', 
-                id=message['id'],
-                format='metadata',
-                metadataHeaders=['From', 'Subject', 'Date']
-            ).execute()
-            
+        for msg in fetched:
+            if 'error' in msg:
+                email_list.append(msg)
+                continue
+
             headers = msg['payload']['headers']
             email_data = {
                 'id': msg['id'],
@@ -160,13 +280,79 @@ def list_emails(max_results: int = 10, query: str = "") -> str:
             
             email_list.append(email_data)
             
-        return str(email_list)
+        return render_output('list_emails', email_list)
     except Exception as e:
         return f"Error listing emails: {str(e)}"
 
+def search_emails(query: str, max_results: int = 10) -> str:
+    """
+    Search mail in the local mirror's full-text index.
+
+    Falls back to a live Gmail search when the mirror is disabled, when the
+    query uses an operator the index cannot answer (such as cc:, larger: or
+    a user label), or when it reaches back past the oldest mirrored message.
+    Offline, the last kind returns what the mirror has, marked partial.
+
+    Args:
+        query: Gmail-style query (from:, to:, subject:, after:, before:,
+            has:attachment, is:unread, label:, plus free text)
+        max_results: Maximum number of emails to return
+    Returns:
+        str: JSON string of matching emails or error message
+    """
+    try:
+        if not max_results:
+            max_results = 10
+        mirror = get_mailbox_mirror()
+        if mirror is None:
+            return list_emails(max_results=max_results, query=query)
+
+        from .mail_search import SearchQueryError, earliest_date, parse_query
+        # Work offline from the last sync if Gmail cannot be reached
+        service = get_gmail_service()
+        online = not isinstance(service, str)
+        try:
+            conditions, params, match = parse_query(query)
+            since = earliest_date(query)
+        except SearchQueryError:
+            if online:
+                return list_emails(max_results=max_results, query=query)
+            raise
+        if online:
+            mirror = get_fresh_mailbox_mirror(service) or mirror
+
+        if mirror.covers(since):
+            return render_output('search_emails', mirror.search(conditions, params, match, max_results))
+        if online:
+            # The mirror holds only the newest MAILBOX_SYNC_LIMIT messages; Gmail has the rest
+            return list_emails(max_results=max_results, query=query)
+        return render_output('search_emails', {
+            'emails': mirror.search(conditions, params, match, max_results),
+            'partial': "Gmail is unreachable; only mail in the local mirror was searched",
+        }, items='emails')
+    except Exception as e:
+        return f"Error searching emails: {str(e)}"
+
+def build_raw_message(to: str, subject: str, body: str, content_type: str = "plain",
+                      message_id: Optional[str] = None) -> str:
+    """Build a message as the URL-safe base64 that messages.send takes."""
+    message = MIMEMultipart()
+    message['to'] = to
+    message['subject'] = subject
+    if message_id:
+        message['Message-ID'] = message_id
+
+    msg = MIMEText(body, content_type)
+    message.attach(msg)
+
+    return base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+
 def send_email(to: str, subject: str, body: str, content_type: str = "plain") -> str:
     """
     Send an email using Gmail API.
+
+    With EMAIL_OUTBOX=true the email is queued in the local outbox and sent
+    in the background; the result carries a tracking ID for email_status.
     
     Args:
         to: Recipient email address
@@ -177,97 +363,148 @@ def send_email(to: str, subject: str, body: str, content_type: str = "plain") ->
         str: Success message or error
     """
     try:
+        from .outbox import outbox_enabled
+        if outbox_enabled():
+            return queue_email(to, subject, body, content_type)
         service = get_gmail_service()
-        message = MIMEMultipart()
-        message['to'] = to
-        message['subject'] = subject
-
-        msg = MIMEText(body, content_type)
-        message.attach(msg)
-
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        if isinstance(service, str):
+            return service  # Return error message
+        raw_message = build_raw_message(to, subject, body, content_type)
         
-        send_message = service.users().messages().send(
+        send_message = execute_request(service.users().messages().send(
             userId='me',
-            body={'raw': raw_message}
-        ).execute()
+            body={'raw': raw_message},
+            fields=MESSAGE_REF_FIELDS.mask()
+        ))
 
         return f"Email sent successfully. Message Id: {send_message['id']}"
     except Exception as e:
         return f"Error sending email: {str(e)}"
 
-def read_email(message_id: str) -> str:
+def queue_email(to: str, subject: str, body: str, content_type: str = "plain") -> str:
+    """Queue an email in the outbox and return its tracking ID."""
+    from .outbox import content_key, enqueue_email, new_message_id
+    message_id = new_message_id()
+    raw = build_raw_message(to, subject, body, content_type, message_id)
+    entry = enqueue_email(raw, message_id, to, subject, content_key(to, subject, body, content_type))
+    if entry.get('duplicate'):
+        return (f"This email was already queued ({entry['status']}). Tracking ID: {entry['id']}. "
+                "Use email_status to check delivery.")
+    return f"Email queued for sending. Tracking ID: {entry['id']}. Use email_status to check delivery."
+
+def parse_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse a message resource fetched with format='full'.
+
+    Args:
+        message: Gmail message resource
+    Returns:
+        Dict with id, threadId, headers, decoded plain-text body and
+        attachment metadata (without attachment data)
     """
-    Read a specific email by its ID, including attachments.
+    payload = message['payload']
+    headers = payload['headers']
+
+    email_data = {
+        'id': message['id'],
+        'threadId': message['threadId'],
+        'headers': {},
+        'body': '',
+        'attachments': []
+    }
+
+    # Get header information
+    for header in headers:
+        name = header['name'].lower()
+        if name in ['from', 'to', 'subject', 'date']:
+            email_data['headers'][name] = header['value']
+
+    def process_parts(parts, email_data):
+        """Process message parts recursively."""
+        for part in parts:
+            if part.get('filename'):
+                # This is an attachment
+                email_data['attachments'].append({
+                    'id': part['body'].get('attachmentId'),
+                    'filename': part['filename'],
+                    'mimeType': part['mimeType'],
+                    'size': part['body'].get('size', 0)
+                })
+            elif part.get('mimeType') == 'text/plain':
+                # This is the email body
+                if 'data' in part['body']:
+                    text = base64.urlsafe_b64decode(
+                        part['body']['data']
+                    ).decode('utf-8')
+                    email_data['body'] += text
+            elif part.get('parts'):
+                # Recursive call for nested parts
+                process_parts(part['parts'], email_data)
+
+    # Process the email parts
+    if 'parts' in payload:
+        process_parts(payload['parts'], email_data)
+    elif 'body' in payload and 'data' in payload['body']:
+        email_data['body'] = base64.urlsafe_b64decode(
+            payload['body']['data']
+        ).decode('utf-8')
+
+    return email_data
+
+def read_email(message_id: str, download_attachments: bool = False) -> str:
+    """
+    Read a specific email by its ID.
+    
+    Attachments are listed by name, type and size. With download_attachments
+    they are also saved under agent_directory/attachments and their paths
+    returned; attachment contents are never included in the result.
     
     Args:
         message_id: The ID of the email to read
+        download_attachments: Save the attachments to disk
     Returns:
-        str: Email content including attachments or error message
+        str: Email content with attachment details or error message
     """
     try:
         service = get_gmail_service()
-        message = service.users().messages().get(
-            userId='me',
-            id=message_id,
-            format='full'
-        ).execute()
+        if isinstance(service, str):
+            return service  # Return error message
 
-        payload = message['payload']
-        headers = payload['headers']
-        
-        email_data = {
-            'id': message['id'],
-            'threadId': message['threadId'],
-            'headers': {},
-            'body': '',
-            'attachments': []
-        }
-        
-        # Get header information
-        for header in headers:
-            name = header['name'].lower()
-            if name in ['from', 'to', 'subject', 'date']:
-                email_data['headers'][name] = header['value']
-        
-        def process_parts(parts, email_data):
-            """Process message parts recursively."""
-            for part in parts:
-                if part.get('filename'):
-                    # This is an attachment
-                    attachment_data = {
-                        'id': part['body'].get('attachmentId'),
-                        'filename': part['filename'],
-                        'mimeType': part['mimeType'],
-                        'size': part['body'].get('size', 0)
-                    }
-                    if attachment_data['id']:
-                        # Get attachment data
-                        attachment = get_attachment_data(
-                            service, 'me', message_id, attachment_data['id']
-                        )
-                        attachment_data.update(attachment)
-                    email_data['attachments'].append(attachment_data)
-                elif part.get('mimeType') == 'text/plain':
-                    # This is the email body
-                    if 'data' in part['body']:
-                        text = base64.urlsafe_b64decode(
-                            part['body']['data']
-                        ).decode('utf-8')
-                        email_data['body'] += text
-                elif part.get('parts'):
-                    # Recursive call for nested parts
-                    process_parts(part['parts'], email_data)
-
-        # Process the email parts
-        if 'parts' in payload:
-            process_parts(payload['parts'], email_data)
-        elif 'body' in payload and 'data' in payload['body']:
-            email_data['body'] = base64.urlsafe_b64decode(
-                payload['body']['data']
-            ).decode('utf-8')
-            
-        return str(email_data)
+        # Message content never changes, so a cached or mirrored copy is always current
+        from .message_cache import get_message_cache
+        cache = get_message_cache()
+        email_data = cache.get(message_id) if cache else None
+        if email_data is None:
+            mirror = get_mailbox_mirror()
+            email_data = mirror.get_email(message_id) if mirror else None
+            if email_data is not None:
+                if cache:
+                    cache.put(message_id, email_data)
+            else:
+                started = time.perf_counter()
+                message = execute_request(service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='full',
+                    fields=FULL_MESSAGE_FIELDS.mask()
+                ))
+                if mirror:
+                    mirror.store_messages([message])
+                email_data = parse_message(message)
+                if cache:
+                    cache.put(message_id, email_data, int(message.get('sizeEstimate', 0)),
+                              time.perf_counter() - started)
+
+        if download_attachments and email_data['attachments']:
+            email_data['attachments'] = save_message_attachments(service, message_id, email_data['attachments'])
+        else:
+            # Attachment IDs are long opaque tokens that are of no use to the model
+            email_data['attachments'] = [
+                {key: value for key, value in attachment.items() if key != 'id'}
+                for attachment in email_data['attachments']
+            ]
+
+        return render_output('read_email', email_data, text='body')
     except Exception as e:
         return f"Error reading email: {str(e)}"
 
@@ -282,11 +519,173 @@ def delete_email(message_id: str) -> str:
     """
     try:
         service = get_gmail_service()
-        service.users().messages().trash(userId='me', id=message_id).execute()
+        if isinstance(service, str):
+            return service  # Return error message
+        execute_request(service.users().messages().trash(userId='me', id=message_id, fields=MESSAGE_REF_FIELDS.mask()))
+        mirror = get_mailbox_mirror()
+        if mirror:
+            mirror.add_label(message_id, 'TRASH')
         return f"Email {message_id} moved to trash successfully"
     except Exception as e:
         return f"Error deleting email: {str(e)}"
 
+def resolve_message_ids(service, message_ids: str, query: str, max_messages: int) -> List[str]:
+    """
+    Collect the messages a bulk tool applies to.
+
+    Args:
+        service: Gmail API service instance
+        message_ids: Comma-separated message IDs
+        query: Gmail search query whose matches are added to message_ids
+        max_messages: Maximum number of query matches
+    Returns:
+        Message IDs without duplicates, in the order given
+    """
+    ids = [message_id.strip() for message_id in message_ids.split(',') if message_id.strip()]
+    if query:
+        ids.extend(message['id'] for message in list_message_ids(service, max_messages, query))
+    return list(dict.fromkeys(ids))
+
+def resolve_label_ids(service, labels: str) -> List[str]:
+    """
+    Map comma-separated label names or IDs to label IDs.
+
+    System labels such as UNREAD are used as-is; user labels are looked up
+    by name with one labels.list call.
+    """
+    names = [label.strip() for label in labels.split(',') if label.strip()]
+    if all(name.upper() in SYSTEM_LABELS for name in names):
+        return [name.upper() for name in names]
+    response = execute_request(service.users().labels().list(userId='me', fields=LABEL_FIELDS.mask('labels')))
+    by_name = {}
+    for label in response.get('labels', []):
+        by_name[label['id'].lower()] = label['id']
+        by_name[label['name'].lower()] = label['id']
+    missing = [name for name in names if name.lower() not in by_name]
+    if missing:
+        raise ValueError(f"Unknown label(s): {', '.join(missing)}")
+    return [by_name[name.lower()] for name in names]
+
+def _batch_modify(service, message_ids: List[str], add_label_ids: List[str],
+                  remove_label_ids: List[str]) -> List[Dict[str, str]]:
+    """
+    Apply one batchModify call, returning the IDs it failed for.
+
+    batchModify succeeds or fails as a whole, so a rejected chunk is split in
+    half until the offending IDs are isolated and the rest are applied.
+    """
+    try:
+        execute_request(service.users().messages().batchModify(userId='me', body={
+            'ids': message_ids,
+            'addLabelIds': add_label_ids,
+            'removeLabelIds': remove_label_ids,
+        }))
+        return []
+    except Exception as e:
+        if len(message_ids) == 1 or not isinstance(e, HttpError) or is_retryable(e):
+            return [{'id': message_id, 'error': str(e)} for message_id in message_ids]
+        middle = len(message_ids) // 2
+        return (_batch_modify(service, message_ids[:middle], add_label_ids, remove_label_ids) +
+                _batch_modify(service, message_ids[middle:], add_label_ids, remove_label_ids))
+
+def modify_emails(message_ids: str = "", query: str = "", add_labels: str = "", remove_labels: str = "",
+                  max_messages: int = DEFAULT_BULK_MAX_MESSAGES) -> str:
+    """
+    Add or remove labels on many emails at once, e.g. mark read or archive.
+
+    Uses messages.batchModify in chunks of up to 1000 IDs, so hundreds of
+    messages take a few requests instead of one tool call each.
+
+    Args:
+        message_ids: Comma-separated message IDs
+        query: Gmail search query selecting messages (combined with message_ids)
+        add_labels: Comma-separated label names or IDs to add (e.g. "STARRED")
+        remove_labels: Comma-separated label names or IDs to remove
+            (e.g. "UNREAD" to mark read, "INBOX" to archive)
+        max_messages: Maximum number of messages selected by query
+    Returns:
+        str: Count of modified messages and per-ID failures, or error message
+    """
+    try:
+        service = get_gmail_service()
+        if isinstance(service, str):
+            return service  # Return error message
+        if not add_labels and not remove_labels:
+            return "Error modifying emails: no labels to add or remove"
+        add_label_ids = resolve_label_ids(service, add_labels)
+        remove_label_ids = resolve_label_ids(service, remove_labels)
+        ids = resolve_message_ids(service, message_ids, query, max_messages or DEFAULT_BULK_MAX_MESSAGES)
+        if not ids:
+            return render_output('modify_emails', {'modified': 0})
+
+        chunks = [ids[i:i + BATCH_MODIFY_LIMIT] for i in range(0, len(ids), BATCH_MODIFY_LIMIT)]
+        failed = [failure for chunk_failures in map_concurrently(
+            lambda chunk: _batch_modify(service, chunk, add_label_ids, remove_label_ids),
+            chunks, get_fetch_settings()['max_workers']
+        ) for failure in chunk_failures]
+
+        failed_ids = {failure['id'] for failure in failed}
+        modified = [message_id for message_id in ids if message_id not in failed_ids]
+        mirror = get_mailbox_mirror()
+        if mirror:
+            mirror.modify_labels(modified, add_label_ids, remove_label_ids)
+        result = {'modified': len(modified)}
+        if failed:
+            result['failed'] = failed
+        return render_output('modify_emails', result)
+    except Exception as e:
+        return f"Error modifying emails: {str(e)}"
+
+def trash_emails(message_ids: str = "", query: str = "", max_messages: int = DEFAULT_BULK_MAX_MESSAGES) -> str:
+    """
+    Move many emails to trash at once.
+
+    Trash requests are grouped into batch HTTP requests of GMAIL_BATCH_SIZE,
+    so each message succeeds or fails on its own.
+
+    Args:
+        message_ids: Comma-separated message IDs
+        query: Gmail search query selecting messages (combined with message_ids)
+        max_messages: Maximum number of messages selected by query
+    Returns:
+        str: Count of trashed messages and per-ID failures, or error message
+    """
+    try:
+        service = get_gmail_service()
+        if isinstance(service, str):
+            return service  # Return error message
+        ids = resolve_message_ids(service, message_ids, query, max_messages or DEFAULT_BULK_MAX_MESSAGES)
+        if not ids:
+            return render_output('trash_emails', {'trashed': 0})
+
+        settings = get_fetch_settings()
+        chunk_size = settings['chunk_size']
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+        def trash_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            try:
+                return _batch_chunk(
+                    service, chunk,
+                    lambda message_id: service.users().messages().trash(
+                        userId='me', id=message_id, fields=MESSAGE_REF_FIELDS.mask())
+                )
+            except Exception as e:
+                return [{'id': message_id, 'error': str(e)} for message_id in chunk]
+
+        responses = [response for chunk in map_concurrently(trash_chunk, chunks, settings['max_workers'])
+                     for response in chunk]
+        failed = [response for response in responses if 'error' in response]
+        trashed = [message_id for message_id, response in zip(ids, responses) if 'error' not in response]
+        mirror = get_mailbox_mirror()
+        if mirror:
+            mirror.modify_labels(trashed, ['TRASH'], [])
+        result = {'trashed': len(trashed)}
+        if failed:
+            result['failed'] = failed
+        return render_output('trash_emails', result)
+    except Exception as e:
+        return f"Error trashing emails: {str(e)}"
+
 # Direct testing
 if __name__ == "__main__":
     print("\nTesting Gmail API functions:")
@@ -298,7 +697,7 @@ if __name__ == "__main__":
         
         # Test reading an email (requires a valid message_id)
         if isinstance(result, str) and "id" in result:
-            message_id = eval(result)[0]['id']
+            message_id = json.loads(result)[0]['id']
             print("\nTesting read_email:")
             print(f"Read email result: {read_email(message_id)}")
             
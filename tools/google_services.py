@@ -0,0 +1,448 @@
+import contextvars
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple, Iterable, Callable, List, TypeVar
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+import google_auth_httplib2
+import httplib2
+from .retries import call_with_retry, current_scope_name, is_retryable
+from .metrics import GOOGLE_HTTP_BYTES, GOOGLE_HTTP_SECONDS
+from .quota import call_within_quota, report_error, request_cost
+from .storage import current_workspace
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+TOKEN_FILE = 'token.pickle'
+CREDENTIAL_FILE_NAMES = ['credentials.json', 'Credentials.json', 'client_secret.json']
+
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN_SECONDS = 300
+# Wait this long before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 30
+# Re-check interval when the token has no known expiry
+REFRESH_IDLE_SECONDS = 3600
+
+
+def _api_name(uri: str) -> str:
+    """API an HTTP request goes to, from its path: /gmail/v1/... is 'gmail', /batch... is 'batch'."""
+    segments = [segment for segment in urlsplit(uri).path.split('/') if segment]
+    if segments and segments[0] == 'upload':
+        segments.pop(0)
+    return segments[0] if segments else 'unknown'
+
+
+class InstrumentedHttp(httplib2.Http):
+    """
+    httplib2 client that records every round trip's latency and size.
+
+    Each request, including every attempt of a retried one and every batch,
+    is observed in the Google HTTP metrics, labelled with the API, the tool
+    making it and the response status.
+    """
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        labels = {'api': _api_name(uri), 'tool': current_scope_name() or 'none', 'status': 'error'}
+        start = time.perf_counter()
+        try:
+            response, content = super().request(uri, method, body, headers, *args, **kwargs)
+            labels['status'] = str(response.status)
+        finally:
+            GOOGLE_HTTP_SECONDS.observe(time.perf_counter() - start, **labels)
+        GOOGLE_HTTP_BYTES.inc(len(body or b''), api=labels['api'], direction='sent')
+        GOOGLE_HTTP_BYTES.inc(len(content or b''), api=labels['api'], direction='received')
+        return response, content
+
+
+class ServiceManager:
+    """
+    Process-wide cache of Google credentials and API service objects.
+
+    Credentials are loaded from the token file once, each API service is built
+    once and reused, and a daemon thread refreshes the access token shortly
+    before it expires so tool calls never pay for a refresh inline.
+
+    Service objects are shared between threads; every request they create gets
+    a thread-local authorized HTTP client because httplib2 is not thread-safe.
+
+    Args:
+        token_file: Where the user's access and refresh tokens are stored
+        interactive: Run the browser login flow when there is no valid token;
+            when False a missing token is reported as an error instead
+    """
+
+    def __init__(self, token_file: str = TOKEN_FILE, interactive: bool = True):
+        self.token_file = token_file
+        self.interactive = interactive
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._creds = None
+        self._scopes = set()
+        self._services: Dict[Tuple[str, str], Any] = {}
+        self._local = threading.local()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stats = {
+            'service_hits': 0,
+            'service_misses': 0,
+            'credential_loads': 0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'total_refresh_ms': 0.0,
+            'last_refresh_ms': 0.0,
+            'max_refresh_ms': 0.0,
+        }
+
+    def get_service(self, api: str, version: str, scopes: Iterable[str], display_name: str):
+        """
+        Get a cached API service, building it on first use.
+
+        Args:
+            api: API name, e.g. 'gmail'
+            version: API version, e.g. 'v1'
+            scopes: OAuth scopes the API needs
+            display_name: Human readable API name used in messages
+        Returns:
+            The service object, or an error message string
+        """
+        key = (api, version)
+        service = self._services.get(key)
+        if service is not None:
+            self._count('service_hits')
+            return service
+
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                self._count('service_hits')
+                return service
+            self._count('service_misses')
+
+            self._scopes.update(scopes)
+            creds = self._get_credentials(display_name)
+            if isinstance(creds, str):
+                return creds  # Return error message
+
+            try:
+                service = build(
+                    api, version,
+                    credentials=creds,
+                    requestBuilder=self._build_request,
+                    cache_discovery=False
+                )
+            except Exception as e:
+                return f"Error creating {display_name} service: {str(e)}"
+
+            self._services[key] = service
+            self._start_refresh_thread()
+            return service
+
+    def install_service(self, api: str, version: str, service) -> None:
+        """Use a pre-built service for an API, e.g. one pointed at a local server."""
+        with self._lock:
+            self._services[(api, version)] = service
+
+    def register_scopes(self, scopes: Iterable[str]) -> None:
+        """Register scopes to request the next time the OAuth flow runs."""
+        with self._lock:
+            self._scopes.update(scopes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss and token refresh counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_services'] = len(self._services)
+            stats['token_expiry'] = self._creds.expiry.isoformat() if self._creds and self._creds.expiry else None
+        refreshes = stats['refreshes']
+        stats['avg_refresh_ms'] = stats['total_refresh_ms'] / refreshes if refreshes else 0.0
+        return stats
+
+    def invalidate(self) -> None:
+        """Drop cached credentials and services so the next call starts fresh."""
+        with self._lock:
+            self._creds = None
+            self._services.clear()
+
+    def shutdown(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop_event.set()
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _find_credentials_file(self) -> Optional[str]:
+        for name in CREDENTIAL_FILE_NAMES:
+            if os.path.exists(name):
+                return name
+        return None
+
+    def _get_credentials(self, display_name: str):
+        """Load, refresh or create credentials. Must be called with the lock held."""
+        if self._creds is not None:
+            return self._creds
+
+        credentials_file = self._find_credentials_file()
+        if not credentials_file:
+            error_msg = (
+                f"❌ {display_name} authentication failed: Missing credentials file!\n\n"
+                "To fix this:\n"
+                "1. Download your credentials.json file from Google Cloud Console\n"
+                "2. Place it in the same directory as main.py\n"
+                "3. Make sure it's named 'credentials.json' (lowercase)\n"
+                f"4. Delete {self.token_file} if it exists and run again\n\n"
+                f"Current directory: {os.getcwd()}\n"
+                f"Files in directory: {[f for f in os.listdir('.') if f.endswith('.json')]}"
+            )
+            return error_msg
+
+        creds = None
+        # The token file stores the user's access and refresh tokens
+        if os.path.exists(self.token_file):
+            try:
+                with open(self.token_file, 'rb') as token:
+                    creds = pickle.load(token)
+            except Exception as e:
+                print(f"Warning: Could not load {self.token_file}: {e}")
+                # Remove corrupted token file
+                self._remove_token_file()
+
+        # If there are no (valid) credentials available, let the user log in.
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                if not self._refresh(creds):
+                    # Remove invalid token file
+                    self._remove_token_file()
+                    creds = None
+                else:
+                    self._save_credentials(creds)
+
+            if not creds and not self.interactive:
+                return (
+                    f"❌ {display_name} authentication failed: no valid token in {self.token_file}.\n"
+                    "This user has to sign in once with: python server.py authorize <user>"
+                )
+
+            if not creds:
+                try:
+                    print(f"🔐 Starting {display_name} authentication using {credentials_file}...")
+                    # Request every scope registered so far so one token serves all APIs
+                    flow = InstalledAppFlow.from_client_secrets_file(credentials_file, sorted(self._scopes))
+                    creds = flow.run_local_server(port=0)
+
+                    # Save the credentials for the next run
+                    self._save_credentials(creds)
+                    print(f"✅ {display_name} authentication successful!")
+
+                except Exception as e:
+                    error_msg = f"❌ {display_name} authentication failed: {str(e)}\n\nPlease check your credentials.json file and try again."
+                    return error_msg
+
+        self._creds = creds
+        self._count('credential_loads')
+        return creds
+
+    def _save_credentials(self, creds) -> None:
+        """Persist credentials atomically so a crash never leaves a torn token file."""
+        tmp_file = f"{self.token_file}.tmp"
+        with open(tmp_file, 'wb') as token:
+            pickle.dump(creds, token)
+        os.replace(tmp_file, self.token_file)
+
+    def _remove_token_file(self) -> None:
+        if os.path.exists(self.token_file):
+            os.remove(self.token_file)
+
+    def _refresh(self, creds) -> bool:
+        """Refresh credentials in place and record the latency."""
+        with self._refresh_lock:
+            start = time.perf_counter()
+            try:
+                creds.refresh(Request())
+            except Exception as e:
+                print(f"Warning: Could not refresh token: {e}")
+                self._count('refresh_failures')
+                return False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['refreshes'] += 1
+            self._stats['total_refresh_ms'] += elapsed_ms
+            self._stats['last_refresh_ms'] = elapsed_ms
+            self._stats['max_refresh_ms'] = max(self._stats['max_refresh_ms'], elapsed_ms)
+        return True
+
+    def _seconds_until_refresh(self, creds) -> float:
+        if not creds.expiry:
+            return REFRESH_IDLE_SECONDS
+        # google-auth stores expiry as a naive UTC datetime
+        remaining = (creds.expiry - datetime.utcnow()).total_seconds()
+        return max(0.0, remaining - REFRESH_MARGIN_SECONDS)
+
+    def _start_refresh_thread(self) -> None:
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        if not self._creds or not getattr(self._creds, 'refresh_token', None):
+            return
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name='google-token-refresh', daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh_loop(self) -> None:
+        """Keep the shared access token fresh until shutdown."""
+        retry = False
+        while True:
+            creds = self._creds
+            if creds is None:
+                return
+            delay = REFRESH_RETRY_SECONDS if retry else max(1.0, self._seconds_until_refresh(creds))
+            if self._stop_event.wait(delay):
+                return
+            if self._creds is not creds:
+                retry = False
+                continue
+            retry = not self._refresh(creds)
+            if not retry:
+                try:
+                    self._save_credentials(creds)
+                except Exception as e:
+                    print(f"Warning: Could not save refreshed token: {e}")
+
+    def _thread_http(self):
+        """Return this thread's authorized HTTP client for the current credentials."""
+        cached = getattr(self._local, 'http', None)
+        if cached is not None and cached[0] is self._creds:
+            return cached[1]
+        http = google_auth_httplib2.AuthorizedHttp(self._creds, http=InstrumentedHttp())
+        self._local.http = (self._creds, http)
+        return http
+
+    def _build_request(self, http, postproc, uri, **kwargs) -> HttpRequest:
+        """Request builder that swaps in the calling thread's HTTP client."""
+        return HttpRequest(self._thread_http(), postproc, uri, **kwargs)
+
+
+_service_manager = ServiceManager()
+_workspace_managers: Dict[str, ServiceManager] = {}
+_workspace_managers_lock = threading.Lock()
+
+
+def get_service_manager() -> ServiceManager:
+    """
+    Return the service manager for the current workspace.
+
+    Outside server mode this is the process-wide manager using token.pickle.
+    Each workspace gets its own manager and token file, and never starts the
+    browser login flow from a request.
+    """
+    root = current_workspace()
+    if root is None:
+        return _service_manager
+    with _workspace_managers_lock:
+        manager = _workspace_managers.get(root)
+        if manager is None:
+            manager = ServiceManager(os.path.join(root, TOKEN_FILE), interactive=False)
+            manager.register_scopes(_service_manager._scopes)
+            _workspace_managers[root] = manager
+        return manager
+
+
+def get_service_stats() -> Dict[str, Any]:
+    """Return cache and token refresh counters for the shared service manager."""
+    return _service_manager.get_stats()
+
+
+def execute_request(request):
+    """
+    Execute a Google API request or batch request.
+
+    Every tool-side API call goes through here so the calling tool's retry
+    policy applies to the individual request rather than the whole tool, and
+    every attempt waits for its quota.
+    """
+    # A batch request carries its calls in _requests
+    calls = getattr(request, '_requests', None)
+    method_ids = [call.methodId for call in calls.values()] if calls is not None else [request.methodId]
+    return call_with_retry(lambda: call_within_quota(method_ids, request.execute))
+
+
+def map_concurrently(func: Callable[[T], R], items: Iterable[T], max_workers: int) -> List[R]:
+    """
+    Apply func to items on up to max_workers threads, keeping input order.
+
+    Each call runs in a copy of the caller's context, so the calling tool's
+    retry scope still applies to requests made on the worker threads.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def execute_batch(service, items: List[T], build_request: Callable[[T], HttpRequest]) -> List[Dict[str, Any]]:
+    """
+    Run one API request per item through a single batch HTTP request.
+
+    Items that fail with an error the current retry policy allows are re-sent
+    in a smaller batch; items that already succeeded are never repeated.
+
+    Args:
+        service: API service instance
+        items: Items to build requests for
+        build_request: Returns the API request for one item
+    Returns:
+        Responses in the same order as items; failures are returned as
+        {'error': ..., 'status': HTTP status or None, 'reason': short message}
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    apis: Dict[int, str] = {}
+    pending = list(range(len(items)))
+
+    def attempt():
+        retryable = []
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is None:
+                results[index] = response if response is not None else {}
+                return
+            report_error(apis[index], exception)
+            resp = getattr(exception, 'resp', None)
+            results[index] = {
+                'error': str(exception),
+                'status': resp.status if resp is not None else None,
+                'reason': getattr(exception, 'reason', None) or str(exception),
+            }
+            if is_retryable(exception):
+                retryable.append((index, exception))
+
+        batch = service.new_batch_http_request(callback=callback)
+        method_ids = []
+        for index in pending:
+            request = build_request(items[index])
+            batch.add(request, request_id=str(index))
+            method_ids.append(request.methodId)
+            apis[index] = request_cost(request.methodId)[0]
+        # Google charges each call in a batch separately
+        call_within_quota(method_ids, batch.execute)
+        pending[:] = [index for index, _ in retryable]
+        if retryable:
+            raise retryable[0][1]
+
+    try:
+        call_with_retry(attempt)
+    except Exception:
+        if len(results) < len(items):
+            raise
+    return [results[index] for index in range(len(items))]
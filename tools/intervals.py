@@ -0,0 +1,136 @@
+"""
+Interval index over busy time used for free-slot search and conflict checks.
+
+Intervals are kept sorted by start together with a running maximum of their
+ends, so overlap queries use a binary search and only walk back over the
+intervals that can still overlap. Times are epoch seconds.
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, date, time, timedelta, tzinfo
+from typing import List, Iterable, Tuple, Optional
+
+
+@dataclass(order=True)
+class Interval:
+    """A busy period; label and source identify the event and calendar."""
+    start: float
+    end: float
+    label: str = field(default='', compare=False)
+    source: str = field(default='', compare=False)
+
+
+class IntervalIndex:
+    """Index of busy intervals, sorted and rebuilt lazily after additions."""
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self._intervals: List[Interval] = [i for i in intervals if i.end > i.start]
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def add(self, start: float, end: float, label: str = '', source: str = '') -> None:
+        if end > start:
+            self._intervals.append(Interval(start, end, label, source))
+            self._dirty = True
+
+    def _build(self) -> None:
+        if not self._dirty:
+            return
+        self._intervals.sort()
+        self._starts = [interval.start for interval in self._intervals]
+        self._max_ends, running = [], float('-inf')
+        for interval in self._intervals:
+            running = max(running, interval.end)
+            self._max_ends.append(running)
+        self._dirty = False
+
+    def overlapping(self, start: float, end: float) -> List[Interval]:
+        """Intervals that overlap [start, end), in start order."""
+        self._build()
+        result = []
+        index = bisect_left(self._starts, end) - 1
+        # Nothing at or before this position ends after start once the running max does not
+        while index >= 0 and self._max_ends[index] > start:
+            interval = self._intervals[index]
+            if interval.end > start:
+                result.append(interval)
+            index -= 1
+        result.reverse()
+        return result
+
+    def merged(self, start: float = float('-inf'), end: float = float('inf')) -> List[Tuple[float, float]]:
+        """Disjoint busy periods within [start, end), clipped to the range."""
+        self._build()
+        merged: List[Tuple[float, float]] = []
+        first = max(0, bisect_right(self._max_ends, start))
+        for interval in self._intervals[first:]:
+            if interval.start >= end:
+                break
+            lo, hi = max(interval.start, start), min(interval.end, end)
+            if hi <= lo:
+                continue
+            if merged and lo <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+            else:
+                merged.append((lo, hi))
+        return merged
+
+    def free(self, start: float, end: float, min_length: float = 0) -> List[Tuple[float, float]]:
+        """Gaps of at least min_length seconds between busy periods in [start, end)."""
+        gaps, cursor = [], start
+        for busy_start, busy_end in self.merged(start, end):
+            if busy_start - cursor >= min_length and busy_start > cursor:
+                gaps.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if end - cursor >= min_length and end > cursor:
+            gaps.append((cursor, end))
+        return gaps
+
+    def conflicts(self, start: float = float('-inf'), end: float = float('inf')) -> List[Tuple[Interval, Interval]]:
+        """Pairs of intervals that overlap each other within [start, end)."""
+        self._build()
+        pairs = []
+        active: List[Interval] = []
+        first = max(0, bisect_right(self._max_ends, start))
+        for interval in self._intervals[first:]:
+            if interval.start >= end:
+                break
+            active = [other for other in active if other.end > interval.start]
+            pairs.extend((other, interval) for other in active)
+            active.append(interval)
+        return pairs
+
+
+def working_windows(start: datetime, end: datetime, zone: tzinfo, day_start: time, day_end: time,
+                    include_weekends: bool = False) -> List[Tuple[float, float]]:
+    """
+    Working-hour windows between two instants, as epoch-second pairs.
+
+    Each day is evaluated in zone, so windows follow daylight saving changes.
+    """
+    windows = []
+    day: date = start.astimezone(zone).date()
+    last: date = end.astimezone(zone).date()
+    while day <= last:
+        if include_weekends or day.weekday() < 5:
+            lo = datetime.combine(day, day_start, tzinfo=zone).timestamp()
+            hi = datetime.combine(day, day_end, tzinfo=zone).timestamp()
+            lo, hi = max(lo, start.timestamp()), min(hi, end.timestamp())
+            if hi > lo:
+                windows.append((lo, hi))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_slots(index: IntervalIndex, windows: List[Tuple[float, float]], duration: float,
+               max_results: Optional[int] = None) -> List[Tuple[float, float]]:
+    """Free periods of at least duration seconds inside the given windows."""
+    slots: List[Tuple[float, float]] = []
+    for window_start, window_end in windows:
+        slots.extend(index.free(window_start, window_end, duration))
+        if max_results and len(slots) >= max_results:
+            return slots[:max_results]
+    return slots
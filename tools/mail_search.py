@@ -0,0 +1,150 @@
+"""
+Translate Gmail-style search queries into SQL over the local mailbox mirror.
+
+Supported operators:
+    from:, to:, subject:      words or "quoted phrases" in that field
+    after:, before:           dates as YYYY/MM/DD, YYYY-MM-DD or epoch seconds
+    newer_than:, older_than:  relative ages such as 3d, 2m, 1y
+    has:attachment
+    is:unread, is:read, is:starred, is:important
+    in:inbox, in:sent, ..., label:<system label>
+    -term                     exclude a word or operator match
+Any other words are matched against subject, sender, recipients and body.
+Other operators, including user labels (stored by ID, not name), raise
+SearchQueryError so the caller can ask Gmail instead.
+"""
+
+import re
+import time
+from datetime import datetime
+from typing import List, Any, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r'(-?)(?:(\w+):)?("[^"]*"|\S+)')
+FIELD_COLUMNS = {'from': 'sender', 'to': 'recipients', 'subject': 'subject'}
+IS_LABELS = {'unread': 'UNREAD', 'starred': 'STARRED', 'important': 'IMPORTANT'}
+AGE_UNITS = {'d': 86400, 'm': 30 * 86400, 'y': 365 * 86400}
+# in:/label: names of system labels, whose IDs are what the mirror stores
+SYSTEM_LABELS = {
+    'inbox': 'INBOX', 'sent': 'SENT', 'draft': 'DRAFT', 'drafts': 'DRAFT', 'spam': 'SPAM', 'trash': 'TRASH',
+    'unread': 'UNREAD', 'starred': 'STARRED', 'important': 'IMPORTANT', 'chat': 'CHAT', 'chats': 'CHAT',
+}
+
+
+class SearchQueryError(ValueError):
+    """Raised when a query uses an operator the local index cannot answer."""
+
+
+def _fts_phrase(text: str) -> str:
+    """Quote text as an FTS5 phrase so punctuation like @ and . is safe."""
+    return '"' + text.strip('"').replace('"', '""') + '"'
+
+
+def _parse_date(value: str) -> int:
+    """Return milliseconds since the epoch for a Gmail date operand."""
+    value = value.strip('"')
+    if value.isdigit():
+        return int(value) * 1000
+    for fmt in ('%Y/%m/%d', '%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise SearchQueryError(f"Unrecognized date: {value}")
+
+
+def _parse_age(value: str) -> int:
+    """Return the cutoff in milliseconds for newer_than/older_than operands."""
+    match = re.fullmatch(r'(\d+)([dmy])', value.strip('"').lower())
+    if not match:
+        raise SearchQueryError(f"Unrecognized age: {value}")
+    seconds = int(match.group(1)) * AGE_UNITS[match.group(2)]
+    return int((time.time() - seconds) * 1000)
+
+
+def parse_query(query: str) -> Tuple[List[str], List[Any], str]:
+    """
+    Parse a Gmail-style query.
+
+    Args:
+        query: Search query, e.g. 'from:alice has:attachment after:2024/01/01 invoice'
+    Returns:
+        Tuple of (SQL conditions on messages aliased m, their parameters, FTS5
+        match expression or '' when the query has no text terms)
+    Raises:
+        SearchQueryError: If the query uses an unsupported operator
+    """
+    conditions: List[str] = []
+    params: List[Any] = []
+    terms: List[str] = []
+    include_spam_trash = False
+
+    for negated, operator, value in TOKEN_PATTERN.findall(query or ''):
+        operator = operator.lower()
+        condition, args, term = None, [], None
+
+        if not operator:
+            term = _fts_phrase(value)
+        elif operator in FIELD_COLUMNS:
+            term = f"{FIELD_COLUMNS[operator]} : {_fts_phrase(value)}"
+        elif operator == 'after':
+            condition, args = "m.internal_date >= ?", [_parse_date(value)]
+        elif operator == 'before':
+            condition, args = "m.internal_date < ?", [_parse_date(value)]
+        elif operator == 'newer_than':
+            condition, args = "m.internal_date >= ?", [_parse_age(value)]
+        elif operator == 'older_than':
+            condition, args = "m.internal_date < ?", [_parse_age(value)]
+        elif operator == 'has' and value.lower() == 'attachment':
+            condition = "m.attachments != '[]'"
+        elif operator == 'is' and value.lower() == 'read':
+            condition, args = "m.labels NOT LIKE ?", ['% UNREAD %']
+        elif operator == 'is' and value.lower() in IS_LABELS:
+            condition, args = "m.labels LIKE ?", [f"% {IS_LABELS[value.lower()]} %"]
+        elif operator in ('in', 'label') and value.strip('"').lower() in SYSTEM_LABELS:
+            label = SYSTEM_LABELS[value.strip('"').lower()]
+            include_spam_trash = include_spam_trash or label in ('SPAM', 'TRASH')
+            condition, args = "m.labels LIKE ?", [f"% {label} %"]
+        else:
+            raise SearchQueryError(f"Unsupported search operator: {operator}:{value}")
+
+        if term is not None:
+            terms.append(f"NOT {term}" if negated else term)
+        else:
+            conditions.append(f"NOT ({condition})" if negated else condition)
+            params.extend(args)
+
+    # FTS5 cannot start an expression with NOT, so lead with a positive term
+    positive = [t for t in terms if not t.startswith('NOT ')]
+    negative = [t for t in terms if t.startswith('NOT ')]
+    if negative and not positive:
+        conditions.extend("m.rowid NOT IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)" for _ in negative)
+        params.extend(term[len('NOT '):] for term in negative)
+        negative = []
+    match = ' AND '.join(positive)
+    if negative:
+        match += ' ' + ' '.join(negative)
+
+    # Like Gmail, hide spam and trash unless the query asks for them
+    if not include_spam_trash:
+        conditions.extend(["m.labels NOT LIKE ?", "m.labels NOT LIKE ?"])
+        params.extend(['% SPAM %', '% TRASH %'])
+
+    return conditions, params, match
+
+
+def earliest_date(query: str) -> Optional[int]:
+    """
+    Return the lower date bound a query sets with after: or newer_than:, in milliseconds.
+
+    Returns None when the query can match mail of any age.
+    """
+    bounds = []
+    for negated, operator, value in TOKEN_PATTERN.findall(query or ''):
+        operator = operator.lower()
+        if negated:
+            continue
+        if operator == 'after':
+            bounds.append(_parse_date(value))
+        elif operator == 'newer_than':
+            bounds.append(_parse_age(value))
+    return max(bounds) if bounds else None
@@ -0,0 +1,434 @@
+"""
+Local SQLite mirror of the Gmail mailbox.
+
+A bounded full sync loads the most recent messages; after that the mirror is
+kept current through Gmail's history.list using the stored historyId, which
+usually costs a single request. Tools read from the mirror when it is fresh.
+The first sync runs on a background thread; until it finishes, tools query
+Gmail directly.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextvars import copy_context
+from typing import List, Dict, Any, Optional, Iterable
+from googleapiclient.errors import HttpError
+from .google_services import execute_request
+from .quota import background_priority
+from .fields import FieldSet
+from .gmail_tools import FULL_MESSAGE_FIELDS, fetch_messages, list_message_ids, parse_message
+from .storage import SQLiteStore, get_data_directory, env_flag, env_number
+
+MAILBOX_DB_FILE = "mailbox.db"
+# Labels hidden from listings, matching messages.list without includeSpamTrash
+HIDDEN_LABELS = ('SPAM', 'TRASH')
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+PROFILE_FIELDS = FieldSet(('historyId',))
+HISTORY_FIELDS = FieldSet(('messagesAdded/message/id', 'messagesDeleted/message/id',
+                           'labelsAdded/message(id,labelIds)', 'labelsRemoved/message(id,labelIds)'))
+
+
+def mirror_enabled() -> bool:
+    """The mirror is opt-in through MAILBOX_MIRROR=true."""
+    return env_flag('MAILBOX_MIRROR')
+
+
+class MailboxStore(SQLiteStore):
+    """SQLite store of message headers, labels, snippets and bodies."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS messages (
+        id TEXT PRIMARY KEY,
+        thread_id TEXT NOT NULL,
+        history_id INTEGER,
+        internal_date INTEGER NOT NULL,
+        sender TEXT NOT NULL DEFAULT '',
+        recipients TEXT NOT NULL DEFAULT '',
+        subject TEXT NOT NULL DEFAULT '',
+        date TEXT NOT NULL DEFAULT '',
+        snippet TEXT NOT NULL DEFAULT '',
+        labels TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL DEFAULT '',
+        attachments TEXT NOT NULL DEFAULT '[]',
+        size_estimate INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS messages_by_date ON messages (internal_date DESC);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        subject, sender, recipients, body,
+        content='messages', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, subject, sender, recipients, body)
+        VALUES (new.rowid, new.subject, new.sender, new.recipients, new.body);
+    END;
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, subject, sender, recipients, body)
+        VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients, old.body);
+    END;
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF subject, sender, recipients, body ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, subject, sender, recipients, body)
+        VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients, old.body);
+        INSERT INTO messages_fts (rowid, subject, sender, recipients, body)
+        VALUES (new.rowid, new.subject, new.sender, new.recipients, new.body);
+    END;
+    """
+
+    def __init__(self, path: str):
+        index_exists = os.path.exists(path) and self._has_table(path, 'messages_fts')
+        super().__init__(path)
+        self.sync_lock = threading.Lock()
+        self.initial_sync: Optional[threading.Thread] = None
+        if not index_exists:
+            # Index mail that was mirrored before the search index existed
+            with self.write_lock, self.connection:
+                self.connection.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+    @staticmethod
+    def _has_table(path: str, name: str) -> bool:
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+            ).fetchone() is not None
+        finally:
+            connection.close()
+
+    # An upsert (not INSERT OR REPLACE) so the search index triggers fire
+    UPSERT_MESSAGE = (
+        "INSERT INTO messages (id, thread_id, history_id, internal_date, sender, recipients, "
+        "subject, date, snippet, labels, body, attachments, size_estimate) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET thread_id = excluded.thread_id, history_id = excluded.history_id, "
+        "internal_date = excluded.internal_date, sender = excluded.sender, recipients = excluded.recipients, "
+        "subject = excluded.subject, date = excluded.date, snippet = excluded.snippet, "
+        "labels = excluded.labels, body = excluded.body, attachments = excluded.attachments, "
+        "size_estimate = excluded.size_estimate"
+    )
+
+    def store_messages(self, messages: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace full message resources. Returns the number stored."""
+        rows = self._message_rows(messages)
+        with self.write_lock, self.connection:
+            self.connection.executemany(self.UPSERT_MESSAGE, rows)
+        return len(rows)
+
+    def replace_all(self, messages: Iterable[Dict[str, Any]], meta: Dict[str, Any]) -> int:
+        """
+        Swap the mirror's messages and metadata for new ones in one transaction.
+
+        Readers see either the old mirror or the new one, never an empty or
+        partly written one. Returns the number of messages stored.
+        """
+        rows = self._message_rows(messages)
+        with self.write_lock, self.connection:
+            self.connection.execute("DELETE FROM messages")
+            self.connection.execute("DELETE FROM meta")
+            self.connection.executemany(self.UPSERT_MESSAGE, rows)
+            self.connection.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)", [(key, str(value)) for key, value in meta.items()]
+            )
+        return len(rows)
+
+    def _message_rows(self, messages: Iterable[Dict[str, Any]]) -> List[tuple]:
+        rows = []
+        for message in messages:
+            if 'error' in message or 'payload' not in message:
+                continue
+            email = parse_message(message)
+            headers = email['headers']
+            rows.append((
+                email['id'],
+                email['threadId'],
+                int(message.get('historyId', 0)),
+                int(message.get('internalDate', 0)),
+                headers.get('from', ''),
+                headers.get('to', ''),
+                headers.get('subject', ''),
+                headers.get('date', ''),
+                message.get('snippet', ''),
+                self._encode_labels(message.get('labelIds', [])),
+                email['body'],
+                json.dumps(email['attachments']),
+                int(message.get('sizeEstimate', 0)),
+            ))
+        return rows
+
+    def delete_messages(self, message_ids: Iterable[str]) -> None:
+        with self.write_lock, self.connection:
+            self.connection.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in message_ids])
+
+    def update_labels(self, message_id: str, label_ids: List[str]) -> None:
+        with self.write_lock, self.connection:
+            self.connection.execute(
+                "UPDATE messages SET labels = ? WHERE id = ?", (self._encode_labels(label_ids), message_id)
+            )
+
+    def add_label(self, message_id: str, label_id: str) -> None:
+        with self.write_lock, self.connection:
+            self.connection.execute(
+                "UPDATE messages SET labels = ? || labels WHERE id = ? AND labels NOT LIKE ?",
+                (f" {label_id} ", message_id, f"% {label_id} %")
+            )
+
+    def modify_labels(self, message_ids: List[str], add: List[str], remove: List[str]) -> None:
+        """Apply a label change made through the API to mirrored messages."""
+        with self.write_lock, self.connection:
+            for label_id in remove:
+                self.connection.executemany(
+                    "UPDATE messages SET labels = REPLACE(labels, ?, ' ') WHERE id = ?",
+                    [(f" {label_id} ", message_id) for message_id in message_ids]
+                )
+            for label_id in add:
+                self.connection.executemany(
+                    "UPDATE messages SET labels = ? || LTRIM(labels) WHERE id = ? AND labels NOT LIKE ?",
+                    [(f" {label_id} ", message_id, f"% {label_id} %") for message_id in message_ids]
+                )
+
+    def get_email(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Return a message in read_email's format, or None if it is not mirrored."""
+        row = self.connection.execute("SELECT * FROM messages WHERE id = ?", (message_id,)).fetchone()
+        if row is None:
+            return None
+        headers = {}
+        for name, column in (('from', 'sender'), ('to', 'recipients'), ('subject', 'subject'), ('date', 'date')):
+            if row[column]:
+                headers[name] = row[column]
+        return {
+            'id': row['id'],
+            'threadId': row['thread_id'],
+            'headers': headers,
+            'body': row['body'],
+            'attachments': json.loads(row['attachments']),
+        }
+
+    def list_recent(self, max_results: int) -> Optional[List[Dict[str, str]]]:
+        """
+        Return the newest messages in list_emails' format.
+
+        Returns None when the mirror holds fewer messages than requested and
+        the initial sync did not cover the whole mailbox.
+        """
+        hidden = " AND ".join("labels NOT LIKE ?" for _ in HIDDEN_LABELS)
+        # Older messages stored by read_email must not fill gaps the sync skipped
+        floor = int(self.get_meta('sync_floor', 0))
+        rows = self.connection.execute(
+            f"SELECT id, thread_id, sender, subject, date FROM messages WHERE {hidden} "
+            "AND internal_date >= ? ORDER BY internal_date DESC LIMIT ?",
+            [f"% {label} %" for label in HIDDEN_LABELS] + [floor, max_results]
+        ).fetchall()
+        if len(rows) < max_results and self.get_meta('complete') != '1':
+            return None
+        email_list = []
+        for row in rows:
+            email_data = {'id': row['id'], 'threadId': row['thread_id']}
+            for name, column in (('from', 'sender'), ('subject', 'subject'), ('date', 'date')):
+                if row[column]:
+                    email_data[name] = row[column]
+            email_list.append(email_data)
+        return email_list
+
+    def search(self, conditions: List[str], params: List[Any], match: str, max_results: int) -> List[Dict[str, str]]:
+        """
+        Run a parsed search against the mirror, newest first.
+
+        Args:
+            conditions: SQL conditions on the messages table (aliased m)
+            params: Parameters for the conditions
+            match: FTS5 match expression, or '' for none
+            max_results: Maximum number of messages to return
+        """
+        sql = "SELECT m.id, m.thread_id, m.sender, m.subject, m.date, m.snippet FROM messages m"
+        where = list(conditions)
+        args = list(params)
+        if match:
+            sql += " JOIN messages_fts f ON f.rowid = m.rowid"
+            where.insert(0, "messages_fts MATCH ?")
+            args.insert(0, match)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.internal_date DESC LIMIT ?"
+        rows = self.connection.execute(sql, args + [max_results]).fetchall()
+        return [{
+            'id': row['id'],
+            'threadId': row['thread_id'],
+            'from': row['sender'],
+            'subject': row['subject'],
+            'date': row['date'],
+            'snippet': row['snippet'],
+        } for row in rows]
+
+    def covers(self, since: Optional[int]) -> bool:
+        """
+        Whether the mirror holds all mail newer than since (milliseconds; None for all mail).
+
+        Only the newest MAILBOX_SYNC_LIMIT messages are mirrored, so older mail
+        is covered only when the initial sync reached the end of the mailbox.
+        """
+        if self.get_meta('complete') == '1':
+            return True
+        floor = self.get_meta('sync_floor')
+        return since is not None and floor is not None and since >= int(floor)
+
+    def seconds_since_sync(self) -> float:
+        last_sync = self.get_meta('last_sync')
+        return time.time() - float(last_sync) if last_sync else float('inf')
+
+    @staticmethod
+    def _encode_labels(label_ids: List[str]) -> str:
+        # Padded with spaces so a label can be matched with LIKE '% LABEL %'
+        return f" {' '.join(label_ids)} " if label_ids else ''
+
+
+def full_sync(service, store: MailboxStore) -> Dict[str, Any]:
+    """
+    Replace the mirror with the newest MAILBOX_SYNC_LIMIT messages.
+
+    The history ID is read before listing so changes made during the sync are
+    picked up by the next incremental sync. The old mirror is kept until the
+    new messages have been fetched, so a failed sync leaves it as it was.
+    """
+    limit = int(env_number('MAILBOX_SYNC_LIMIT', 1000))
+    profile = execute_request(service.users().getProfile(userId='me', fields=PROFILE_FIELDS.mask()))
+    references = list_message_ids(service, limit + 1)
+    complete = len(references) <= limit
+    message_ids = [reference['id'] for reference in references[:limit]]
+
+    messages = fetch_messages(service, message_ids, format='full', fields=FULL_MESSAGE_FIELDS.mask())
+    dates = [int(m['internalDate']) for m in messages if 'internalDate' in m]
+    stored = store.replace_all(messages, {
+        'history_id': profile['historyId'],
+        'complete': '1' if complete else '0',
+        'sync_floor': 0 if complete or not dates else min(dates),
+        'last_sync': time.time(),
+    })
+    return {'mode': 'full', 'stored': stored}
+
+
+def incremental_sync(service, store: MailboxStore) -> Dict[str, Any]:
+    """
+    Apply changes since the stored history ID.
+
+    Falls back to a full sync when Gmail no longer has history that old.
+    """
+    start_history_id = store.get_meta('history_id')
+    if not start_history_id:
+        return full_sync(service, store)
+
+    added, deleted, relabeled = [], set(), {}
+    latest_history_id = start_history_id
+    page_token = None
+    try:
+        while True:
+            response = execute_request(service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token,
+                fields=HISTORY_FIELDS.mask('history', 'historyId', 'nextPageToken')
+            ))
+            for record in response.get('history', []):
+                for change in record.get('messagesAdded', []):
+                    added.append(change['message']['id'])
+                for change in record.get('messagesDeleted', []):
+                    deleted.add(change['message']['id'])
+                for change in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    relabeled[change['message']['id']] = change['message'].get('labelIds', [])
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+    except HttpError as e:
+        if e.resp.status == 404:
+            return full_sync(service, store)
+        raise
+
+    new_ids = [message_id for message_id in dict.fromkeys(added) if message_id not in deleted]
+    stored = store.store_messages(fetch_messages(service, new_ids, format='full', fields=FULL_MESSAGE_FIELDS.mask())) if new_ids else 0
+    for message_id, label_ids in relabeled.items():
+        if message_id not in deleted:
+            store.update_labels(message_id, label_ids)
+    if deleted:
+        store.delete_messages(deleted)
+
+    store.set_meta('history_id', latest_history_id)
+    store.set_meta('last_sync', time.time())
+    return {'mode': 'incremental', 'stored': stored, 'deleted': len(deleted), 'relabeled': len(relabeled)}
+
+
+def sync_mailbox(service, store: MailboxStore) -> Dict[str, Any]:
+    """Bring the mirror up to date, doing a full sync the first time."""
+    with store.sync_lock, background_priority():
+        return incremental_sync(service, store)
+
+
+_stores: Dict[str, MailboxStore] = {}
+_stores_lock = threading.Lock()
+_initial_sync_lock = threading.Lock()
+
+
+def get_mailbox_store() -> MailboxStore:
+    """Return the mailbox store for the current data directory."""
+    path = os.path.join(get_data_directory(), MAILBOX_DB_FILE)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MailboxStore(path)
+        return _stores[path]
+
+
+def start_initial_sync(service, store: MailboxStore) -> threading.Thread:
+    """
+    Run the mirror's first full sync on a background thread, unless one is running.
+
+    Returns the thread, so callers that need the mirror filled can join it.
+    """
+    def run() -> None:
+        try:
+            sync_mailbox(service, store)
+        except Exception as e:
+            print(f"Warning: Mailbox sync failed: {e}")
+
+    with _initial_sync_lock:
+        if store.initial_sync is None or not store.initial_sync.is_alive():
+            store.initial_sync = threading.Thread(target=copy_context().run, args=(run,),
+                                                  name="mailbox-initial-sync", daemon=True)
+            store.initial_sync.start()
+        return store.initial_sync
+
+
+def get_fresh_mailbox(service) -> Optional[MailboxStore]:
+    """
+    Return the mirror if it is enabled and no older than MAILBOX_MAX_AGE_SECONDS.
+
+    A stale mirror is synced first. Returns None when the mirror is disabled,
+    has not finished its first sync or the sync fails, in which case callers
+    should query Gmail directly.
+    """
+    if not mirror_enabled():
+        return None
+    store = get_mailbox_store()
+    max_age = env_number('MAILBOX_MAX_AGE_SECONDS', 60)
+    if store.seconds_since_sync() <= max_age:
+        return store
+    if store.get_meta('history_id') is None:
+        # The first sync fetches up to MAILBOX_SYNC_LIMIT full messages, far longer than a tool
+        # call may take, so it runs behind tool calls while they are answered by Gmail
+        start_initial_sync(service, store)
+        return None
+    with store.sync_lock:
+        # Another tool call may have synced while we waited for the lock
+        if store.seconds_since_sync() <= max_age:
+            return store
+        try:
+            with background_priority():
+                incremental_sync(service, store)
+        except Exception as e:
+            print(f"Warning: Mailbox sync failed: {e}")
+            return None
+    return store
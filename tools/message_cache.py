@@ -0,0 +1,183 @@
+"""
+Two-tier cache of parsed Gmail messages keyed by message ID.
+
+A message's headers, body and attachment list never change for a given ID,
+so entries never expire. The first tier is an in-memory LRU bounded by a
+byte budget; the second is a zlib-compressed SQLite table in the data
+directory that survives restarts. Mutable state such as labels is not cached
+here; it comes from the mailbox mirror or the API.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from .storage import SQLiteStore, get_data_directory, env_flag, env_number
+
+MESSAGE_CACHE_DB_FILE = "messages.db"
+DEFAULT_MEMORY_BYTES = 16 * 1024 * 1024
+
+
+def cache_enabled() -> bool:
+    """The cache is on unless MESSAGE_CACHE=false."""
+    return env_flag('MESSAGE_CACHE', True)
+
+
+class MessageBodyStore(SQLiteStore):
+    """Compressed parsed messages on disk."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS message_bodies (
+        id TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        wire_bytes INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def get(self, message_id: str) -> Optional[tuple]:
+        row = self.connection.execute(
+            "SELECT data, wire_bytes FROM message_bodies WHERE id = ?", (message_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row['data']).decode('utf-8'), row['wire_bytes']
+
+    def put(self, message_id: str, encoded: str, wire_bytes: int) -> None:
+        raw = encoded.encode('utf-8')
+        with self.write_lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO message_bodies (id, data, size, wire_bytes) VALUES (?, ?, ?, ?)",
+                (message_id, zlib.compress(raw, 6), len(raw), wire_bytes)
+            )
+
+
+class MessageCache:
+    """
+    In-memory LRU in front of a compressed on-disk store.
+
+    Entries are kept as JSON text, so every get returns a fresh copy that
+    callers may modify.
+
+    Args:
+        disk: Second-tier store, or None for memory only
+        memory_bytes: Byte budget for the in-memory tier
+    """
+
+    def __init__(self, disk: Optional[MessageBodyStore], memory_bytes: int = DEFAULT_MEMORY_BYTES):
+        self.disk = disk
+        self.memory_bytes = memory_bytes
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0,
+            'bytes_saved': 0, 'hit_seconds': 0.0, 'fetches': 0, 'fetch_seconds': 0.0,
+        }
+
+    def _remember(self, message_id: str, encoded: str, wire_bytes: int) -> None:
+        """Add an entry to the memory tier, evicting the least recently used."""
+        size = len(encoded)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            if message_id in self._memory:
+                self._memory.move_to_end(message_id)
+                return
+            self._memory[message_id] = (encoded, wire_bytes)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes:
+                _, (evicted, _) = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Return the parsed message, or None if it is not cached."""
+        started = time.perf_counter()
+        with self._lock:
+            entry = self._memory.get(message_id)
+            if entry is not None:
+                self._memory.move_to_end(message_id)
+        tier = 'memory_hits'
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(message_id)
+            if entry is not None:
+                tier = 'disk_hits'
+                self._remember(message_id, *entry)
+        if entry is None:
+            return None
+        encoded, wire_bytes = entry
+        message = json.loads(encoded)
+        with self._lock:
+            self._stats[tier] += 1
+            self._stats['bytes_saved'] += wire_bytes
+            self._stats['hit_seconds'] += time.perf_counter() - started
+        return message
+
+    def put(self, message_id: str, message: Dict[str, Any], wire_bytes: int = 0,
+            fetch_seconds: Optional[float] = None) -> None:
+        """
+        Cache a parsed message after a miss.
+
+        Args:
+            message_id: Gmail message ID
+            message: Parsed message as returned by parse_message
+            wire_bytes: Size of the message as downloaded (Gmail's sizeEstimate)
+            fetch_seconds: How long the Gmail fetch took, or None if the message
+                came from another local source; used to estimate time saved
+        """
+        encoded = json.dumps(message)
+        with self._lock:
+            self._stats['misses'] += 1
+            if fetch_seconds is not None:
+                self._stats['fetches'] += 1
+                self._stats['fetch_seconds'] += fetch_seconds
+        self._remember(message_id, encoded, wire_bytes)
+        if self.disk is not None:
+            self.disk.put(message_id, encoded, wire_bytes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio, bytes not downloaded and estimated fetch time saved."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_used
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        average_fetch = stats['fetch_seconds'] / stats['fetches'] if stats['fetches'] else 0.0
+        average_hit = stats['hit_seconds'] / hits if hits else 0.0
+        stats['hit_ratio'] = hits / lookups if lookups else 0.0
+        stats['latency_saved_seconds'] = max(0.0, hits * (average_fetch - average_hit))
+        return stats
+
+
+_caches: Dict[str, MessageCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_message_cache() -> Optional[MessageCache]:
+    """Return the message cache for the current data directory, or None when disabled."""
+    if not cache_enabled():
+        return None
+    path = os.path.join(get_data_directory(), MESSAGE_CACHE_DB_FILE)
+    with _caches_lock:
+        if path not in _caches:
+            disk = MessageBodyStore(path) if env_flag('MESSAGE_CACHE_DISK', True) else None
+            memory_bytes = int(env_number('MESSAGE_CACHE_MEMORY_BYTES', DEFAULT_MEMORY_BYTES))
+            _caches[path] = MessageCache(disk, memory_bytes)
+        return _caches[path]
+
+
+def get_message_cache_stats() -> Dict[str, Any]:
+    """Stats for the current message cache, or {} if it has not been used."""
+    path = os.path.join(get_data_directory(), MESSAGE_CACHE_DB_FILE)
+    with _caches_lock:
+        cache = _caches.get(path)
+    return cache.get_stats() if cache is not None else {}
@@ -0,0 +1,290 @@
+"""
+Latency histograms and counters for turns, tools and API calls.
+
+Spans time a block of code into a histogram labelled by what ran (the tool,
+the OpenAI operation, the Google API). The registry is process-wide, so in
+server mode it covers every user. Metrics can be exported in the Prometheus
+text format or as JSON, and written to METRICS_FILE.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .storage import env_flag
+
+# Upper bounds in seconds; the last bucket (+Inf) is implied
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "assistant_"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def metrics_enabled() -> bool:
+    """Metrics are recorded unless METRICS=false."""
+    return env_flag('METRICS', True)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float('inf') else repr(bound)
+
+
+class Counter:
+    """
+    A monotonically increasing count per label set.
+
+    Args:
+        name: Metric name without the prefix; should end in _total
+        description: One line shown as the metric's HELP text
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = METRIC_PREFIX + name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not metrics_enabled():
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def to_prometheus(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value:g}" for key, value in sorted(self.snapshot().items())]
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(key), "value": value} for key, value in sorted(self.snapshot().items())]
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count of observations per label set.
+
+    Args:
+        name: Metric name without the prefix; should end in _seconds
+        description: One line shown as the metric's HELP text
+        buckets: Upper bounds of the buckets in increasing order
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = METRIC_PREFIX + name
+        self.description = description
+        self.buckets = tuple(buckets) + (float('inf'),)
+        # Per label set: [count per bucket (not cumulative), sum]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not metrics_enabled():
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[Dict[str, Any]]:
+        """
+        Observe the duration of the block.
+
+        Yields the labels, so the block can add to them (an outcome or a
+        status code) before the observation is recorded.
+        """
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> Dict[LabelKey, Tuple[List[int], float]]:
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+
+    def to_prometheus(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_bound(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        series = []
+        for key, (counts, total) in sorted(self.snapshot().items()):
+            count = sum(counts)
+            series.append({
+                "labels": dict(key),
+                "count": count,
+                "sum_seconds": round(total, 6),
+                "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+                "p50_ms": round(estimate_quantile(self.buckets, counts, 0.5) * 1000, 3),
+                "p95_ms": round(estimate_quantile(self.buckets, counts, 0.95) * 1000, 3),
+                "buckets": {_format_bound(bound): count for bound, count in zip(self.buckets, counts)},
+            })
+        return series
+
+
+def estimate_quantile(buckets: Tuple[float, ...], counts: List[int], q: float) -> float:
+    """
+    Estimate a quantile from bucket counts the way Prometheus does.
+
+    Observations are assumed to be spread evenly inside their bucket; a
+    quantile in the +Inf bucket is reported as the largest finite bound.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            upper = buckets[index]
+            lower = buckets[index - 1] if index else 0.0
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return buckets[-2]
+
+
+TURN_SECONDS = Histogram('turn_seconds', 'Assistant turn latency from run start to reply')
+OPENAI_REQUEST_SECONDS = Histogram('openai_request_seconds', 'OpenAI API request latency by operation')
+RUN_WAIT_SECONDS = Histogram('run_wait_seconds', 'Time waiting for a run to finish or require action, by mode')
+TOOL_ROUND_SECONDS = Histogram('tool_round_seconds', 'Time to execute all tool calls of one run step')
+TOOL_SECONDS = Histogram('tool_seconds', 'Tool execution time by tool and outcome')
+GOOGLE_HTTP_SECONDS = Histogram('google_http_seconds', 'Google API HTTP round trips by API, tool and status')
+GOOGLE_HTTP_BYTES = Counter('google_http_bytes_total', 'Bytes sent to and received from Google APIs')
+OPENAI_TOKENS = Counter('openai_tokens_total', 'Tokens used by completed runs, by kind')
+TOOL_OUTPUT_BYTES = Counter('tool_output_bytes_total',
+                            'Tool output size as complete JSON (full) and as sent to the model (sent)')
+GOOGLE_QUOTA_WAIT_SECONDS = Histogram('google_quota_wait_seconds',
+                                      'Time Google API requests waited for quota, by API and priority')
+GOOGLE_THROTTLED = Counter('google_throttled_total', 'Google API requests rejected for rate or quota, by API')
+
+METRICS = (TURN_SECONDS, OPENAI_REQUEST_SECONDS, RUN_WAIT_SECONDS, TOOL_ROUND_SECONDS, TOOL_SECONDS,
+           GOOGLE_HTTP_SECONDS, GOOGLE_HTTP_BYTES, OPENAI_TOKENS, TOOL_OUTPUT_BYTES, GOOGLE_QUOTA_WAIT_SECONDS,
+           GOOGLE_THROTTLED)
+
+
+def record_run_usage(run: Any) -> None:
+    """Count the tokens a finished run reports in run.usage, if any."""
+    usage = getattr(run, 'usage', None)
+    if usage is None:
+        return
+    for kind in ('prompt', 'completion'):
+        tokens = getattr(usage, f'{kind}_tokens', None)
+        if tokens:
+            OPENAI_TOKENS.inc(tokens, kind=kind)
+
+
+def export_prometheus() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.to_prometheus())
+    return "\n".join(lines) + "\n"
+
+
+def export_json() -> Dict[str, Any]:
+    """Every metric as JSON, with estimated p50/p95 for histograms."""
+    return {metric.name: {"type": metric.kind, "help": metric.description, "series": metric.to_json()}
+            for metric in METRICS}
+
+
+def write_metrics_file(path: Optional[str] = None) -> Optional[str]:
+    """
+    Write the metrics to path, or to METRICS_FILE when no path is given.
+
+    Files ending in .prom get the Prometheus text format (for the node
+    exporter's textfile collector), anything else gets JSON. The file is
+    replaced atomically so a scraper never reads half of it.
+
+    Returns:
+        Optional[str]: The path written, or None when no file is configured
+    """
+    path = path or os.getenv('METRICS_FILE')
+    if not path:
+        return None
+    content = export_prometheus() if path.endswith('.prom') else json.dumps(export_json(), indent=2)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_metrics_summary() -> List[Dict[str, Any]]:
+    """
+    One row per histogram series with its count, average and estimated p95.
+
+    Rows are sorted by total time so the biggest contributors come first.
+    """
+    rows = []
+    for metric in METRICS:
+        if not isinstance(metric, Histogram):
+            continue
+        for series in metric.to_json():
+            rows.append({"metric": metric.name[len(METRIC_PREFIX):], "labels": series["labels"],
+                         "count": series["count"], "total_ms": series["sum_seconds"] * 1000,
+                         "avg_ms": series["avg_ms"], "p95_ms": series["p95_ms"]})
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows
+
+
+def get_counter_totals() -> Dict[str, Dict[str, float]]:
+    """Counter values keyed by metric name and then by their labels joined as text."""
+    totals = {}
+    for metric in METRICS:
+        if isinstance(metric, Counter):
+            totals[metric.name[len(METRIC_PREFIX):]] = {
+                ",".join(value for _, value in key): amount for key, amount in metric.snapshot().items()
+            }
+    return totals
+
+
+def reset_metrics() -> None:
+    """Clear every metric, e.g. between benchmark runs."""
+    for metric in METRICS:
+        metric.reset()
@@ -0,0 +1,407 @@
+"""
+Durable outbox for send_email.
+
+With EMAIL_OUTBOX=true, send_email stores the finished message in a local
+SQLite queue and returns a tracking ID right away, instead of holding the
+assistant's run until Gmail has accepted the message. A background worker per
+workspace sends queued messages at a steady pace, behind tool calls on the
+Gmail quota, and retries transient failures with backoff. Messages still
+queued when the assistant exits are sent the next time it starts.
+
+Each message gets its Message-ID header when it is queued, so every attempt
+sends the same bytes. Gmail's messages.send has no idempotency key, so before
+any repeat attempt the worker looks the Message-ID up in the mailbox
+(rfc822msgid:) and records the message as sent if an earlier attempt did
+reach Gmail. A send_email call repeated with the same content while the first
+one is queued or was just sent returns the first tracking ID.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextvars import copy_context
+from email.utils import make_msgid
+from typing import Any, Dict, List, Optional
+from .quota import TokenBucket, background_priority
+from .retries import IDEMPOTENT_RETRY, retry_after_seconds
+from .storage import SQLiteStore, get_data_directory, env_flag, env_number
+
+OUTBOX_DB_FILE = "outbox.db"
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+DEFAULT_MAX_ATTEMPTS = 5
+# Backoff before the second attempt, doubled for each later one up to MAX_BACKOFF_SECONDS
+INITIAL_BACKOFF_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 300.0
+# Sends per minute and how many may go out at once; well under Gmail's daily sending limits
+DEFAULT_SENDS_PER_MINUTE = 20.0
+DEFAULT_SEND_BURST = 5.0
+# A send_email call with the same content as one made this recently returns the earlier tracking ID
+DEFAULT_DEDUPE_SECONDS = 120.0
+# Seconds the assistant waits for queued messages when it exits
+DEFAULT_FLUSH_SECONDS = 10.0
+# Entries the status tool lists when no tracking ID is given
+RECENT_ENTRIES = 10
+# An entry 'sending' for longer than this was left by a process that exited mid-send
+SENDING_LEASE_SECONDS = 300.0
+
+
+def outbox_enabled() -> bool:
+    """The outbox is opt-in through EMAIL_OUTBOX=true."""
+    return env_flag('EMAIL_OUTBOX')
+
+
+def content_key(to: str, subject: str, body: str, content_type: str) -> str:
+    """Hash identifying a message's content, used to recognize a repeated send_email call."""
+    digest = hashlib.sha256()
+    for part in (to, subject, body, content_type):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class OutboxStore(SQLiteStore):
+    """SQLite queue of outgoing messages and their delivery state."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id TEXT PRIMARY KEY,
+        message_id TEXT NOT NULL UNIQUE,
+        content_key TEXT NOT NULL,
+        raw TEXT NOT NULL,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        gmail_id TEXT,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+    CREATE INDEX IF NOT EXISTS outbox_by_content ON outbox (content_key, created);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def enqueue(self, raw: str, message_id: str, key: str, recipient: str, subject: str,
+                dedupe_seconds: float = 0.0) -> Dict[str, Any]:
+        """
+        Queue a message, or return the entry of an identical one queued within dedupe_seconds.
+
+        Returns:
+            Dict of the entry, with 'duplicate' set when an earlier entry was returned
+        """
+        now = time.time()
+        with self.write_lock, self.connection:
+            if dedupe_seconds > 0:
+                row = self.connection.execute(
+                    "SELECT * FROM outbox WHERE content_key = ? AND status != ? AND created >= ? "
+                    "ORDER BY created DESC LIMIT 1",
+                    (key, FAILED, now - dedupe_seconds)
+                ).fetchone()
+                if row is not None:
+                    return dict(row, duplicate=True)
+            tracking_id = f"out_{uuid.uuid4().hex[:16]}"
+            self.connection.execute(
+                "INSERT INTO outbox (id, message_id, content_key, raw, recipient, subject, status, "
+                "next_attempt, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (tracking_id, message_id, key, raw, recipient, subject, QUEUED, now, now, now)
+            )
+        return self.get(tracking_id)
+
+    def get(self, tracking_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute("SELECT * FROM outbox WHERE id = ?", (tracking_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit: int = RECENT_ENTRIES) -> List[Dict[str, Any]]:
+        rows = self.connection.execute("SELECT * FROM outbox ORDER BY created DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    def next_due(self) -> Optional[Dict[str, Any]]:
+        """The queued entry whose next attempt comes first, due or not."""
+        row = self.connection.execute(
+            "SELECT * FROM outbox WHERE status = ? ORDER BY next_attempt, created LIMIT 1", (QUEUED,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def pending_count(self) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (QUEUED, SENDING)
+        ).fetchone()[0]
+
+    def _update(self, tracking_id: str, **values: Any) -> None:
+        values['updated'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self.write_lock, self.connection:
+            self.connection.execute(f"UPDATE outbox SET {assignments} WHERE id = ?",
+                                    (*values.values(), tracking_id))
+
+    def claim(self, tracking_id: str) -> bool:
+        """
+        Mark a queued entry as being sent and count the attempt.
+
+        Returns False if another process sharing the outbox claimed it first.
+        """
+        with self.write_lock, self.connection:
+            return self.connection.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ? AND status = ?",
+                (SENDING, time.time(), tracking_id, QUEUED)
+            ).rowcount == 1
+
+    def mark_sent(self, tracking_id: str, gmail_id: str) -> None:
+        self._update(tracking_id, status=SENT, gmail_id=gmail_id, error=None)
+
+    def mark_failed(self, tracking_id: str, error: str) -> None:
+        self._update(tracking_id, status=FAILED, error=error)
+
+    def reschedule(self, tracking_id: str, delay: float, error: str) -> None:
+        self._update(tracking_id, status=QUEUED, next_attempt=time.time() + delay, error=error)
+
+    def lease_expiry(self) -> Optional[float]:
+        """When the oldest entry left 'sending' may be taken back, or None if there is none."""
+        updated = self.connection.execute(
+            "SELECT MIN(updated) FROM outbox WHERE status = ?", (SENDING,)
+        ).fetchone()[0]
+        return updated + SENDING_LEASE_SECONDS if updated is not None else None
+
+    def requeue_interrupted(self) -> int:
+        """Put entries left 'sending' by a process that exited mid-send back in the queue."""
+        now = time.time()
+        with self.write_lock, self.connection:
+            return self.connection.execute(
+                "UPDATE outbox SET status = ?, updated = ? WHERE status = ? AND updated < ?",
+                (QUEUED, now, SENDING, now - SENDING_LEASE_SECONDS)
+            ).rowcount
+
+
+def find_sent_message(service, message_id: str) -> Optional[str]:
+    """Gmail ID of the message carrying this Message-ID header, if Gmail has it."""
+    from .gmail_tools import list_message_ids
+    messages = list_message_ids(service, 1, f"rfc822msgid:{message_id.strip('<>')}")
+    return messages[0]['id'] if messages else None
+
+
+class OutboxWorker:
+    """
+    Background sender for one workspace's outbox.
+
+    The thread starts when a message is queued and exits once the queue is
+    empty. It runs in a copy of the context that started it, so it sends with
+    that workspace's credentials.
+
+    Args:
+        store: The workspace's outbox
+    """
+
+    def __init__(self, store: OutboxStore):
+        self.store = store
+        self.bucket = TokenBucket(env_number('OUTBOX_SENDS_PER_MINUTE', DEFAULT_SENDS_PER_MINUTE) / 60,
+                                  env_number('OUTBOX_SEND_BURST', DEFAULT_SEND_BURST))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def notify(self) -> None:
+        """Start the thread, or wake it to look at the queue again."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=copy_context().run, args=(self._run,),
+                                                name="email-outbox", daemon=True)
+                self._thread.start()
+            else:
+                self._wake.set()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Wait until the queue is drained or timeout passes. Returns True if it was drained."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._thread is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        with background_priority():
+            while True:
+                with self._lock:
+                    self.store.requeue_interrupted()
+                    entry = self.store.next_due()
+                    # An entry another run left 'sending' is taken back when its lease expires
+                    wake_at = entry['next_attempt'] if entry else self.store.lease_expiry()
+                    if wake_at is None:
+                        # Checked under the lock, so notify() either sees the thread or starts a new one
+                        self._thread = None
+                        self._idle.notify_all()
+                        return
+                    self._wake.clear()
+                delay = wake_at - time.time()
+                if delay > 0:
+                    self._wake.wait(delay)
+                    continue
+                if entry is None:
+                    continue
+                self.bucket.acquire(1)
+                try:
+                    self.deliver(entry)
+                except Exception as e:
+                    # Never let one entry stop the worker with others still queued
+                    self.store.reschedule(entry['id'], MAX_BACKOFF_SECONDS, str(e))
+
+    def deliver(self, entry: Dict[str, Any]) -> None:
+        """Make one delivery attempt for a queued entry."""
+        from .google_services import execute_request
+        from .gmail_tools import MESSAGE_REF_FIELDS, get_gmail_service
+        from .tool_cache import get_tool_cache
+        if not self.store.claim(entry['id']):
+            return
+        attempts = entry['attempts'] + 1
+        max_attempts = int(env_number('OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+        try:
+            service = get_gmail_service()
+            if isinstance(service, str):
+                raise RuntimeError(service)
+            # An earlier attempt may have reached Gmail even though it reported an error
+            gmail_id = find_sent_message(service, entry['message_id']) if entry['attempts'] else None
+            if gmail_id is None:
+                sent = execute_request(service.users().messages().send(
+                    userId='me', body={'raw': entry['raw']}, fields=MESSAGE_REF_FIELDS.mask()
+                ))
+                gmail_id = sent['id']
+        except Exception as e:
+            if attempts >= max_attempts or not IDEMPOTENT_RETRY.is_retryable(e):
+                self.store.mark_failed(entry['id'], str(e))
+            else:
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = min(MAX_BACKOFF_SECONDS, INITIAL_BACKOFF_SECONDS * 2 ** (attempts - 1))
+                self.store.reschedule(entry['id'], delay, str(e))
+            return
+        self.store.mark_sent(entry['id'], gmail_id)
+        cache = get_tool_cache()
+        if cache is not None:
+            cache.invalidate({"mailbox"})
+
+
+_outboxes: Dict[str, OutboxWorker] = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox() -> OutboxWorker:
+    """Return the outbox worker for the current data directory."""
+    path = os.path.join(get_data_directory(), OUTBOX_DB_FILE)
+    with _outboxes_lock:
+        if path not in _outboxes:
+            _outboxes[path] = OutboxWorker(OutboxStore(path))
+        return _outboxes[path]
+
+
+def enqueue_email(raw: str, message_id: str, to: str, subject: str, key: str) -> Dict[str, Any]:
+    """
+    Queue a built message for the background worker.
+
+    Args:
+        raw: The message as URL-safe base64, as messages.send takes it
+        message_id: The message's Message-ID header
+        to: Recipient, kept for the status tool
+        subject: Subject, kept for the status tool
+        key: content_key() of the message
+    Returns:
+        Dict of the outbox entry; 'duplicate' is set when an identical message was already queued
+    """
+    outbox = get_outbox()
+    entry = outbox.store.enqueue(raw, message_id, key, to, subject,
+                                 env_number('OUTBOX_DEDUPE_SECONDS', DEFAULT_DEDUPE_SECONDS))
+    outbox.notify()
+    return entry
+
+
+def new_message_id() -> str:
+    """A Message-ID header value for a message about to be queued."""
+    return make_msgid(domain='assistant.local')
+
+
+def describe_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of an outbox entry the status tool reports."""
+    described = {
+        'tracking_id': entry['id'],
+        'status': entry['status'],
+        'to': entry['recipient'],
+        'subject': entry['subject'],
+        'attempts': entry['attempts'],
+        'queued_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(entry['created'])),
+    }
+    if entry['status'] == SENT:
+        described['message_id'] = entry['gmail_id']
+    elif entry['status'] == QUEUED and entry['attempts']:
+        described['next_attempt_in_seconds'] = max(0, round(entry['next_attempt'] - time.time()))
+    if entry['error'] and entry['status'] != SENT:
+        described['error'] = entry['error']
+    return described
+
+
+def email_status(tracking_id: str = "") -> str:
+    """
+    Report the delivery state of emails queued by send_email.
+
+    Args:
+        tracking_id: Tracking ID returned by send_email; empty for the most recent emails
+    Returns:
+        str: JSON with the status (queued, sending, sent or failed) of each email, or an error
+    """
+    from .output import render_output
+    try:
+        store = get_outbox().store
+        tracking_id = (tracking_id or '').strip()
+        if tracking_id:
+            entry = store.get(tracking_id)
+            if entry is None:
+                return f"Error: no queued email has tracking ID {tracking_id!r}"
+            return render_output('email_status', describe_entry(entry))
+        return render_output('email_status', {'emails': [describe_entry(entry) for entry in store.recent()],
+                                              'pending': store.pending_count()}, items='emails')
+    except Exception as e:
+        return f"Error getting email status: {str(e)}"
+
+
+def resume_outbox() -> int:
+    """
+    Start sending what an earlier run left queued, if the outbox is enabled.
+
+    Returns:
+        int: Number of emails waiting to be sent
+    """
+    if not outbox_enabled():
+        return 0
+    outbox = get_outbox()
+    pending = outbox.store.pending_count()
+    if pending:
+        outbox.notify()
+    return pending
+
+
+def flush_outbox(timeout: Optional[float] = None) -> int:
+    """
+    Wait up to timeout seconds (OUTBOX_FLUSH_SECONDS) for queued emails to be sent.
+
+    Returns:
+        int: Number of emails still waiting, which the next start sends
+    """
+    if not outbox_enabled():
+        return 0
+    outbox = get_outbox()
+    if timeout is None:
+        timeout = env_number('OUTBOX_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+    outbox.wait_idle(timeout)
+    return outbox.store.pending_count()
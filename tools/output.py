@@ -0,0 +1,235 @@
+"""
+Serialization of tool results for the model.
+
+Results are sent as compact JSON and kept within a per-tool token budget,
+since every byte is paid for in latency and tokens at each tool round trip.
+When a result is over budget, long text fields in list items (email bodies,
+event descriptions) are shortened first. If it is still too large, the list
+is split into pages, or a single long body is split into chunks. The first
+page carries a next_cursor, and the model passes it to the next_page tool to
+get the rest. The remaining pages are kept in memory for each workspace, so
+paging makes no new API calls.
+"""
+
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from .metrics import TOOL_OUTPUT_BYTES
+from .storage import current_workspace, env_flag, env_number
+from .tool_definitions import get_tool_policy
+
+# Rough size of a token in characters of JSON, used to turn token budgets into lengths
+CHARS_PER_TOKEN = 4
+DEFAULT_OUTPUT_TOKENS = 2500
+# Long text fields of list items are cut to this many characters before paging
+DEFAULT_TEXT_FIELD_CHARS = 1500
+SHORTENED_FIELDS = ('body', 'description', 'snippet')
+# Room left for next_cursor and the page counts
+ENVELOPE_CHARS = 120
+CURSOR_TTL_SECONDS = 900
+MAX_CURSORS = 256
+
+
+def to_json(value: Any) -> str:
+    """Compact JSON; values JSON cannot represent (datetimes) are written as strings."""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def output_budget(tool_name: str) -> int:
+    """
+    Characters a tool's output may use.
+
+    The tool's policy may set output_tokens; otherwise TOOL_OUTPUT_MAX_TOKENS
+    applies to every tool.
+    """
+    tokens = get_tool_policy(tool_name).output_tokens
+    if tokens is None:
+        tokens = env_number('TOOL_OUTPUT_MAX_TOKENS', DEFAULT_OUTPUT_TOKENS)
+    return max(1, int(tokens)) * CHARS_PER_TOKEN
+
+
+def _shorten_text(text: str, limit: int) -> str:
+    """Cut text to about limit characters, at a word boundary when one is close."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = max(cut.rfind(' '), cut.rfind('\n'))
+    if space > limit * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + '…'
+
+
+def _shorten_fields(entry: Any, limit: int) -> Any:
+    if not isinstance(entry, dict):
+        return entry
+    shortened = dict(entry)
+    for name in SHORTENED_FIELDS:
+        text = shortened.get(name)
+        if isinstance(text, str) and len(text) > limit:
+            shortened[name] = _shorten_text(text, limit)
+            shortened[f'{name}_truncated'] = True
+    return shortened
+
+
+class _CursorStore:
+    """The unsent rest of over-budget outputs, by cursor, with a TTL and LRU bound."""
+
+    def __init__(self):
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, state: Dict[str, Any]) -> str:
+        cursor = f"c_{secrets.token_urlsafe(9)}"
+        with self._lock:
+            self._entries[cursor] = (time.monotonic() + CURSOR_TTL_SECONDS, state)
+            while len(self._entries) > MAX_CURSORS:
+                self._entries.popitem(last=False)
+        return cursor
+
+    def get(self, cursor: str) -> Optional[Dict[str, Any]]:
+        # Cursors are not consumed, so a repeated next_page call (or a cached
+        # output being served again) gets the same page
+        with self._lock:
+            entry = self._entries.get(cursor)
+            if entry is None:
+                return None
+            expires, state = entry
+            if expires <= time.monotonic():
+                del self._entries[cursor]
+                return None
+            self._entries.move_to_end(cursor)
+            return state
+
+
+_stores: Dict[Optional[str], _CursorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _cursor_store() -> _CursorStore:
+    workspace = current_workspace()
+    with _stores_lock:
+        if workspace not in _stores:
+            _stores[workspace] = _CursorStore()
+        return _stores[workspace]
+
+
+def _page_items(state: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Fill one page from state['entries'] and save a cursor for what does not fit."""
+    entries = state['entries']
+    result = dict(state['envelope'])
+    room = budget - len(to_json(result)) - ENVELOPE_CHARS
+    page, used = [], 0
+    for entry in entries:
+        size = len(to_json(entry)) + 1
+        if page and used + size > room:
+            break
+        page.append(entry)
+        used += size
+    result[state['key']] = page
+    rest = entries[len(page):]
+    if rest:
+        result['remaining'] = len(rest)
+        # Later pages leave out the envelope (counts, errors) already sent with the first
+        result['next_cursor'] = _cursor_store().save(dict(state, entries=rest, envelope={}))
+    return result
+
+
+def _page_text(state: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Send as much of state['text'] as fits and save a cursor for the rest."""
+    result = dict(state['envelope'])
+    room = max(budget - len(to_json(result)) - ENVELOPE_CHARS, budget // 4)
+    text = state['text']
+    chunk = text[:room]
+    if len(text) > room:
+        # Prefer to break between words; escaping makes JSON longer than the text, so keep a margin
+        chunk = _shorten_text(text, int(room * 0.9))[:-1]
+    result[state['field']] = chunk
+    rest = text[len(chunk):]
+    if rest:
+        result[f"{state['field']}_remaining_chars"] = len(rest)
+        # Later chunks only repeat what identifies the document
+        identity = {key: value for key, value in state['envelope'].items() if key in ('id', 'threadId')}
+        result['next_cursor'] = _cursor_store().save(dict(state, text=rest, envelope=identity))
+    return result
+
+
+def _count(tool_name: str, stage: str, output: str) -> None:
+    TOOL_OUTPUT_BYTES.inc(len(output.encode('utf-8')), tool=tool_name, stage=stage)
+
+
+def _first_page(tool_name: str, value: Any, items: Optional[str], text: Optional[str], budget: int) -> Any:
+    """The part of an over-budget value to send, or None when it has nothing to split."""
+    if text is not None and isinstance(value, dict) and isinstance(value.get(text), str):
+        envelope = {key: field for key, field in value.items() if key != text}
+        return _page_text({'tool': tool_name, 'field': text, 'text': value[text], 'envelope': envelope}, budget)
+    if isinstance(value, list):
+        entries, envelope = value, {}
+    elif isinstance(value, dict) and isinstance(value.get(items), list):
+        entries, envelope = value[items], {key: field for key, field in value.items() if key != items}
+    else:
+        return None
+    # Leave room for at least two entries per page
+    limit = min(int(env_number('TOOL_OUTPUT_TEXT_CHARS', DEFAULT_TEXT_FIELD_CHARS)), budget // 2)
+    page = _page_items({'tool': tool_name, 'key': items or 'items', 'envelope': envelope,
+                        'entries': [_shorten_fields(entry, limit) for entry in entries]}, budget)
+    if isinstance(value, list) and 'next_cursor' not in page:
+        # Shortening alone was enough, so keep the original list shape
+        return page['items']
+    return page
+
+
+def render_output(tool_name: str, value: Any, items: Optional[str] = None, text: Optional[str] = None) -> str:
+    """
+    Serialize a tool result within the tool's budget.
+
+    Args:
+        tool_name: Tool whose budget applies and that next_page reports
+        value: The complete result
+        items: Key of the list to page through when value is a dict; a list
+            value is paged as "items"
+        text: Key of a long text field to split into chunks instead (read_email's body)
+    Returns:
+        str: Compact JSON of the result or of its first page
+    """
+    output = to_json(value)
+    _count(tool_name, 'full', output)
+    budget = output_budget(tool_name)
+    if len(output) > budget and env_flag('TOOL_OUTPUT_PAGING', True):
+        page = _first_page(tool_name, value, items, text, budget)
+        if page is not None:
+            output = to_json(page)
+    _count(tool_name, 'sent', output)
+    return output
+
+
+def next_page(cursor: str) -> str:
+    """
+    Return the next part of a tool output that was cut off to fit its budget.
+
+    Args:
+        cursor: The next_cursor value from the previous part
+    Returns:
+        str: JSON of the next part, with its own next_cursor if more remains,
+        or an error message if the cursor is unknown or expired
+    """
+    state = _cursor_store().get((cursor or '').strip())
+    if state is None:
+        return (f"Error: cursor {cursor!r} is unknown or has expired; "
+                "call the original tool again to get fresh results")
+    budget = output_budget(state['tool'])
+    page = _page_text(state, budget) if 'text' in state else _page_items(state, budget)
+    output = to_json(page)
+    _count('next_page', 'sent', output)
+    return output
+
+
+def get_output_stats() -> Dict[str, Dict[str, float]]:
+    """Full and sent output bytes per tool."""
+    stats: Dict[str, Dict[str, float]] = {}
+    for key, amount in TOOL_OUTPUT_BYTES.snapshot().items():
+        labels = dict(key)
+        stats.setdefault(labels['tool'], {'full': 0, 'sent': 0})[labels['stage']] = amount
+    return stats
@@ -0,0 +1,270 @@
+"""
+Quota-aware pacing of Google API requests.
+
+Gmail charges each method a number of quota units per user (messages.get
+costs 5, messages.send 100) and rejects a user who goes over about 250 units
+a second. Calendar limits the number of requests per user per minute. Every
+request the tools make waits here for its cost in a token bucket for its API,
+before it is sent. There is one bucket per API and per workspace, since both
+quotas are per user.
+
+Requests made by tool calls have priority over background work such as
+mirror and cache syncs. Background requests wait while a tool call is
+waiting, and they leave part of the bucket for tool calls. When Google
+answers 429 (or Gmail's 403 rate-limit errors) anyway, the bucket pauses
+for the Retry-After time and halves its rate and burst, which then climb
+back linearly.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+from .metrics import GOOGLE_QUOTA_WAIT_SECONDS, GOOGLE_THROTTLED
+from .retries import is_rate_limited, retry_after_seconds
+from .storage import current_workspace, env_flag, env_number
+
+T = TypeVar('T')
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Quota units per Gmail method, from the Gmail API usage limits
+GMAIL_METHOD_COSTS = {
+    'gmail.users.getProfile': 1,
+    'gmail.users.history.list': 2,
+    'gmail.users.labels.get': 1,
+    'gmail.users.labels.list': 1,
+    'gmail.users.labels.create': 5,
+    'gmail.users.labels.patch': 5,
+    'gmail.users.labels.update': 5,
+    'gmail.users.labels.delete': 5,
+    'gmail.users.messages.get': 5,
+    'gmail.users.messages.list': 5,
+    'gmail.users.messages.modify': 5,
+    'gmail.users.messages.trash': 5,
+    'gmail.users.messages.untrash': 5,
+    'gmail.users.messages.attachments.get': 5,
+    'gmail.users.messages.delete': 10,
+    'gmail.users.messages.import': 25,
+    'gmail.users.messages.insert': 25,
+    'gmail.users.messages.batchDelete': 50,
+    'gmail.users.messages.batchModify': 50,
+    'gmail.users.messages.send': 100,
+    'gmail.users.drafts.send': 100,
+    'gmail.users.threads.get': 10,
+    'gmail.users.threads.list': 10,
+    'gmail.users.threads.modify': 10,
+    'gmail.users.threads.trash': 10,
+}
+DEFAULT_GMAIL_COST = 5
+# Other APIs count requests, so every method costs 1
+
+# Units (Gmail) or requests (Calendar) per second, and the burst a full bucket allows:
+# Gmail's limit is per second, Calendar's per minute
+DEFAULT_LIMITS = {'gmail': (250.0, 250.0), 'calendar': (10.0, 600.0)}
+DEFAULT_LIMIT = (10.0, 100.0)
+# Share of a bucket background requests leave for tool calls
+INTERACTIVE_RESERVE = 0.25
+# After a 429 the rate and the burst are cut by this factor, to no less than MIN_RATE_SHARE of
+# their configured size
+THROTTLE_FACTOR = 0.5
+MIN_RATE_SHARE = 0.05
+# Seconds to climb back from a cut to the configured rate
+RECOVERY_SECONDS = 60.0
+# Pause after a 429 without a Retry-After, and how long later 429s from the same burst are ignored
+DEFAULT_THROTTLE_PAUSE = 1.0
+
+_priority: ContextVar[str] = ContextVar('request_priority', default=INTERACTIVE)
+
+
+def rate_limit_enabled() -> bool:
+    """Requests are paced unless GOOGLE_RATE_LIMIT=false."""
+    return env_flag('GOOGLE_RATE_LIMIT', True)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Send the block's Google requests as background work, behind tool calls."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def request_cost(method_id: Optional[str]) -> Tuple[str, int]:
+    """The API a method belongs to and what one call costs, e.g. ('gmail', 5) for messages.get."""
+    api = (method_id or 'unknown').split('.', 1)[0]
+    if api == 'gmail':
+        return api, GMAIL_METHOD_COSTS.get(method_id, DEFAULT_GMAIL_COST)
+    return api, 1
+
+
+class TokenBucket:
+    """
+    Weighted token bucket with two priorities and a rate that adapts to 429s.
+
+    The burst shrinks and recovers with the rate, so a bucket that was
+    throttled does not send a full-size burst again when it refills.
+
+    Args:
+        rate: Tokens added per second when Google is not pushing back
+        capacity: Most tokens the bucket holds, i.e. the largest burst
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = max(rate, 1e-3)
+        self.rate = self.max_rate
+        self.max_capacity = max(capacity, 1.0)
+        self.capacity = self.max_capacity
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_throttle = float('-inf')
+        self._interactive_waiting = 0
+        self._condition = threading.Condition()
+        self._stats = {'requests': 0, 'units': 0, 'waits': 0, 'wait_seconds': 0.0, 'throttled': 0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * elapsed / RECOVERY_SECONDS)
+            self.capacity = max(1.0, self.max_capacity * self.rate / self.max_rate)
+        if now >= self._paused_until:
+            self.tokens = min(self.capacity, self.tokens + self.rate * elapsed)
+
+    def acquire(self, cost: float, priority: str = INTERACTIVE) -> float:
+        """
+        Wait until the bucket can pay for cost and take it.
+
+        A request costing more than the bucket holds waits for a full bucket
+        and leaves it in debt, which later requests wait out.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        interactive = priority != BACKGROUND
+        start = time.monotonic()
+        with self._condition:
+            if interactive:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    floor = 0.0 if interactive else self.capacity * INTERACTIVE_RESERVE
+                    needed = min(cost, self.capacity - floor)
+                    if now < self._paused_until:
+                        delay = self._paused_until - now
+                    elif not interactive and self._interactive_waiting:
+                        delay = None  # Woken when the tool call's request has gone
+                    elif self.tokens - floor >= needed:
+                        break
+                    else:
+                        delay = (needed + floor - self.tokens) / self.rate
+                    self._condition.wait(delay)
+                self.tokens -= cost
+            finally:
+                if interactive:
+                    self._interactive_waiting -= 1
+                    self._condition.notify_all()
+            waited = time.monotonic() - start
+            self._stats['requests'] += 1
+            self._stats['units'] += cost
+            if waited > 0.001:
+                self._stats['waits'] += 1
+                self._stats['wait_seconds'] += waited
+        return waited
+
+    def throttled(self, retry_after: Optional[float]) -> None:
+        """Google rejected a request: pause, drop the burst and slow down."""
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            self._stats['throttled'] += 1
+            pause = retry_after if retry_after is not None else DEFAULT_THROTTLE_PAUSE
+            self._paused_until = max(self._paused_until, now + pause)
+            self.tokens = min(self.tokens, 0.0)
+            # Requests already in flight from the same burst fail together; cut the rate once for them
+            if now - self._last_throttle >= DEFAULT_THROTTLE_PAUSE:
+                self.rate = max(self.max_rate * MIN_RATE_SHARE, self.rate * THROTTLE_FACTOR)
+                self.capacity = max(1.0, self.max_capacity * self.rate / self.max_rate)
+                self._last_throttle = now
+            self._condition.notify_all()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._condition:
+            self._refill(time.monotonic())
+            return dict(self._stats, rate=round(self.rate, 3), max_rate=self.max_rate,
+                        tokens=round(self.tokens, 1), capacity=round(self.capacity, 1))
+
+
+_buckets: Dict[Tuple[Optional[str], str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _limits(api: str) -> Tuple[float, float]:
+    rate, burst = DEFAULT_LIMITS.get(api, DEFAULT_LIMIT)
+    prefix = api.upper()
+    return env_number(f'{prefix}_QUOTA_PER_SECOND', rate), env_number(f'{prefix}_QUOTA_BURST', burst)
+
+
+def get_bucket(api: str) -> TokenBucket:
+    """The current workspace's bucket for an API; its limits are read from the environment when it is created."""
+    key = (current_workspace(), api)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(*_limits(api))
+        return bucket
+
+
+def reset_buckets() -> None:
+    """Drop every bucket, so the next request creates them with the current settings."""
+    with _buckets_lock:
+        _buckets.clear()
+
+
+def report_error(api: str, error: BaseException) -> None:
+    """Feed a failed request back to its bucket; only rate-limit errors change the pacing."""
+    if rate_limit_enabled() and is_rate_limited(error):
+        GOOGLE_THROTTLED.inc(api=api)
+        get_bucket(api).throttled(retry_after_seconds(error))
+
+
+def call_within_quota(method_ids: Iterable[Optional[str]], send: Callable[[], T]) -> T:
+    """
+    Wait until the quota for the given API methods is available, then send the requests.
+
+    Args:
+        method_ids: Discovery method IDs of the calls the HTTP request carries
+            (several for a batch), e.g. "gmail.users.messages.get"
+        send: Sends the request and returns its response
+    """
+    if not rate_limit_enabled():
+        return send()
+    costs: Dict[str, int] = defaultdict(int)
+    for method_id in method_ids:
+        api, cost = request_cost(method_id)
+        costs[api] += cost
+    priority = _priority.get()
+    for api, cost in costs.items():
+        GOOGLE_QUOTA_WAIT_SECONDS.observe(get_bucket(api).acquire(cost, priority), api=api, priority=priority)
+    try:
+        return send()
+    except Exception as e:
+        for api in costs:
+            report_error(api, e)
+        raise
+
+
+def get_quota_stats() -> Dict[str, Dict[str, Any]]:
+    """Requests, units, waits and the current rate of the current workspace's buckets, by API."""
+    workspace = current_workspace()
+    with _buckets_lock:
+        buckets = {api: bucket for (root, api), bucket in _buckets.items() if root == workspace}
+    return {api: bucket.get_stats() for api, bucket in buckets.items()}
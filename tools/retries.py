@@ -0,0 +1,174 @@
+import contextvars
+import socket
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Optional, TypeVar
+from googleapiclient.errors import HttpError
+from tenacity import Retrying, RetryCallState, retry_if_exception, wait_exponential
+
+T = TypeVar('T')
+
+# Gmail reports per-user rate limits as 403 with one of these reasons
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How to retry a Google API request made on behalf of a tool.
+
+    Attributes:
+        max_attempts: Total attempts including the first one
+        initial_backoff: Seconds to wait before the first retry
+        max_backoff: Upper bound for a single wait
+        budget: Total seconds a tool invocation may spend backing off
+        retry_statuses: HTTP statuses that are retried
+        retry_transport_errors: Retry connection resets and socket timeouts
+    """
+    max_attempts: int = 3
+    initial_backoff: float = 0.5
+    max_backoff: float = 8.0
+    budget: float = 20.0
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+    retry_transport_errors: bool = True
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """Return True if the error is worth another attempt under this policy."""
+        if isinstance(error, HttpError):
+            status = error.resp.status
+            if status == 403 and 429 in self.retry_statuses:
+                return _error_reason(error) in RATE_LIMIT_REASONS
+            return status in self.retry_statuses
+        if self.retry_transport_errors:
+            return isinstance(error, (ConnectionError, socket.timeout, TimeoutError))
+        return False
+
+
+# Reads can be repeated freely
+IDEMPOTENT_RETRY = RetryPolicy()
+# 429s are rejected before the request is applied, so even sends may retry them
+REJECTED_ONLY_RETRY = RetryPolicy(retry_statuses=frozenset({429}), retry_transport_errors=False)
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+@dataclass
+class _RetryScope:
+    name: str
+    policy: RetryPolicy
+    backoff_spent: float = 0.0
+
+
+_current_scope: contextvars.ContextVar[Optional[_RetryScope]] = contextvars.ContextVar('retry_scope', default=None)
+_stats_lock = threading.Lock()
+_retry_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _error_reason(error: HttpError) -> str:
+    try:
+        return error.error_details[0].get('reason', '') if error.error_details else ''
+    except (AttributeError, IndexError, TypeError):
+        return ''
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, if it sent a numeric Retry-After."""
+    resp = getattr(error, 'resp', None)
+    value = resp.get('retry-after') if resp is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether Google rejected the request for exceeding a rate limit or quota."""
+    if not isinstance(error, HttpError):
+        return False
+    return error.resp.status == 429 or (error.resp.status == 403 and _error_reason(error) in RATE_LIMIT_REASONS)
+
+
+def _record(name: str, key: str, amount: float = 1) -> None:
+    with _stats_lock:
+        stats = _retry_stats.setdefault(name, {'requests': 0, 'retries': 0, 'backoff_seconds': 0.0, 'give_ups': 0})
+        stats[key] += amount
+
+
+@contextmanager
+def retry_scope(name: str, policy: RetryPolicy):
+    """
+    Apply a retry policy to every Google API request made inside the block.
+
+    The scope covers one tool invocation, so the backoff budget is shared by all
+    of its requests and only the request that failed is ever repeated.
+    """
+    token = _current_scope.set(_RetryScope(name, policy))
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def call_with_retry(func: Callable[[], T]) -> T:
+    """
+    Call func under the current retry scope's policy.
+
+    Outside a retry scope the call is made exactly once.
+    """
+    scope = _current_scope.get()
+    if scope is None or scope.policy.max_attempts <= 1:
+        if scope is not None:
+            _record(scope.name, 'requests')
+        return func()
+
+    policy = scope.policy
+    exponential = wait_exponential(multiplier=policy.initial_backoff, max=policy.max_backoff)
+
+    def wait(retry_state: RetryCallState) -> float:
+        delay = retry_after_seconds(retry_state.outcome.exception())
+        if delay is None:
+            delay = exponential(retry_state)
+        # Never wait past the invocation's remaining budget
+        return max(0.0, min(delay, policy.budget - scope.backoff_spent))
+
+    def stop(retry_state: RetryCallState) -> bool:
+        return retry_state.attempt_number >= policy.max_attempts or scope.backoff_spent >= policy.budget
+
+    def before_sleep(retry_state: RetryCallState) -> None:
+        sleep = retry_state.next_action.sleep
+        scope.backoff_spent += sleep
+        _record(scope.name, 'retries')
+        _record(scope.name, 'backoff_seconds', sleep)
+
+    _record(scope.name, 'requests')
+    retrying = Retrying(
+        stop=stop,
+        wait=wait,
+        retry=retry_if_exception(policy.is_retryable),
+        before_sleep=before_sleep,
+        reraise=True,
+    )
+    try:
+        return retrying(func)
+    except BaseException as e:
+        if policy.is_retryable(e):
+            _record(scope.name, 'give_ups')
+        raise
+
+
+def current_scope_name() -> Optional[str]:
+    """Name of the tool whose retry scope is active, or None outside one."""
+    scope = _current_scope.get()
+    return scope.name if scope is not None else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return True if the current retry scope would retry this error."""
+    scope = _current_scope.get()
+    return scope is not None and scope.policy.max_attempts > 1 and scope.policy.is_retryable(error)
+
+
+def get_retry_stats() -> Dict[str, Dict[str, float]]:
+    """Requests, retries, seconds spent backing off and give-ups per tool."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _retry_stats.items()}
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+DATA_DIRECTORY = "assistant_data"
+
+# Root directory of the user whose request is being handled; None means the
+# single-user layout in the current directory
+_workspace: ContextVar[Optional[str]] = ContextVar('workspace', default=None)
+
+
+def current_workspace() -> Optional[str]:
+    """Return the active workspace root, or None outside server mode."""
+    return _workspace.get()
+
+
+@contextmanager
+def use_workspace(root: Optional[str]) -> Iterator[None]:
+    """
+    Run tool calls against a user's workspace.
+
+    Local data, agent files and Google credentials are all looked up under
+    root while the block runs. The setting follows contextvars, so it reaches
+    tool threads started with a copied context.
+    """
+    token = _workspace.set(root)
+    try:
+        yield
+    finally:
+        _workspace.reset(token)
+
+
+def workspace_path(name: str) -> str:
+    """Resolve a file or directory name inside the active workspace."""
+    root = _workspace.get()
+    return os.path.join(root, name) if root else name
+
+
+def get_data_directory() -> str:
+    """Get or create the directory that holds local caches and mirrors."""
+    path = workspace_path(DATA_DIRECTORY)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a true/false setting from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_number(name: str, default: float) -> float:
+    """Read a numeric setting from the environment."""
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class SQLiteStore:
+    """
+    Base class for local SQLite stores.
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    readers never block the writer, and writes are serialized with a lock.
+    Subclasses set SCHEMA to the statements that create their tables.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.write_lock = threading.RLock()
+        with self.write_lock:
+            self.connection.executescript(self.SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get_meta(self, key: str, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key: str, value) -> None:
+        with self.write_lock, self.connection:
+            self._write_meta({key: value})
+
+    def _write_meta(self, values: Dict[str, Any]) -> None:
+        # Runs inside the caller's transaction
+        self.connection.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(key, str(value)) for key, value in values.items()]
+        )
@@ -0,0 +1,153 @@
+"""
+Read-through cache of tool outputs for read-only tools.
+
+Entries are keyed on the tool name and its normalized arguments, expire after
+the TTL in the tool's policy and carry tags naming the data they were built
+from (for example "calendar:primary"). Write tools declare the tags they
+affect, and running one drops exactly the entries carrying those tags.
+Memory is bounded by a byte budget with least-recently-used eviction. Each
+workspace has its own cache, so users in server mode never see each other's
+results.
+"""
+
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+from .storage import current_workspace, env_flag, env_number
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def cache_enabled() -> bool:
+    """The cache is on unless TOOL_CACHE=false."""
+    return env_flag('TOOL_CACHE', True)
+
+
+def normalize_arguments(function: Callable, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in defaults so equivalent calls produce the same key.
+
+    Empty strings and None mean "use the default" to the tools, so they are
+    replaced by the parameter's default as well.
+    """
+    signature = inspect.signature(function)
+    normalized = {}
+    for name, parameter in signature.parameters.items():
+        value = arguments.get(name, parameter.default)
+        if value in ('', None) and parameter.default is not inspect.Parameter.empty:
+            value = parameter.default
+        if isinstance(value, str):
+            value = value.strip()
+        normalized[name] = value
+    return normalized
+
+
+class ToolResultCache:
+    """
+    LRU map of (tool, arguments) to tool output with TTLs and tag invalidation.
+
+    Args:
+        max_bytes: Budget for the cached outputs
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so reads that overlapped a write are not stored
+        self.generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidated': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+        return tool_name + json.dumps(arguments, sort_keys=True, default=str)
+
+    def _drop(self, key: str) -> None:
+        output, _, _ = self._entries.pop(key)
+        self._bytes -= len(output)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            output, expires, _ = entry
+            if expires <= time.monotonic():
+                self._drop(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return output
+
+    def put(self, key: str, output: str, ttl: float, tags: Iterable[str], generation: int) -> None:
+        """
+        Store an output computed after reading generation.
+
+        The output is discarded if an invalidation happened while it was being
+        computed, since it may reflect data from before the write.
+        """
+        if len(output) > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (output, time.monotonic() + ttl, frozenset(tags))
+            self._bytes += len(output)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying one of the tags. Returns the number dropped."""
+        tags = frozenset(tags)
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                self._drop(key)
+            self._stats['invalidated'] += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_caches: Dict[Optional[str], ToolResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_tool_cache() -> Optional[ToolResultCache]:
+    """Return the tool cache for the current workspace, or None when TOOL_CACHE is off."""
+    if not cache_enabled():
+        return None
+    workspace = current_workspace()
+    with _caches_lock:
+        if workspace not in _caches:
+            _caches[workspace] = ToolResultCache(int(env_number('TOOL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+        return _caches[workspace]
+
+
+def get_tool_cache_stats() -> Dict[str, Any]:
+    """Hits, misses, invalidations and size of the current workspace's tool cache."""
+    with _caches_lock:
+        cache = _caches.get(current_workspace())
+    return cache.get_stats() if cache is not None else {}
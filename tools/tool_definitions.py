@@ -1,3 +1,7 @@
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, Optional
+from .retries import RetryPolicy, IDEMPOTENT_RETRY, REJECTED_ONLY_RETRY
+
 def get_tool_definitions():
     """Return the list of tool definitions for the assistant."""
     return [
@@ -66,6 +70,29 @@ def get_tool_definitions():
                 "strict": True
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_emails",
+                "description": "Search emails by sender, recipient, subject, date, labels, attachments or free text using Gmail search syntax (e.g. 'from:alice has:attachment after:2024/01/01 invoice'). Use this when the user asks to find emails matching criteria. Do NOT use this for calendar events.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Gmail-style search query: from:, to:, subject:, after:, before:, newer_than:, older_than:, has:attachment, is:unread, is:read, is:starred, in:, label:, -term, and free text"
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": "Maximum number of emails to return (default: 10)"
+                        }
+                    },
+                    "required": ["query", "max_results"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -98,20 +125,43 @@ def get_tool_definitions():
                 "strict": True
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "email_status",
+                "description": "Check whether emails queued by send_email have been delivered. Use it when send_email returned a tracking ID and the user asks whether the email went out.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "tracking_id": {
+                            "type": "string",
+                            "description": "Tracking ID returned by send_email, or an empty string for the most recent emails"
+                        }
+                    },
+                    "required": ["tracking_id"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
         {
             "type": "function",
             "function": {
                 "name": "read_email",
-                "description": "Read a specific email by its ID, including any attachments. Returns email content, headers, and attachment details (filename, size, type, and data).",
+                "description": "Read a specific email by its ID. Returns email content, headers, and attachment details (filename, size, type). Set download_attachments to save the attachments to files and get their paths.",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "message_id": {
                             "type": "string",
                             "description": "The ID of the email to read"
+                        },
+                        "download_attachments": {
+                            "type": "boolean",
+                            "description": "Save the email's attachments under attachments/ in the working directory (false unless the user needs the files)"
                         }
                     },
-                    "required": ["message_id"],
+                    "required": ["message_id", "download_attachments"],
                     "additionalProperties": False
                 },
                 "strict": True
@@ -136,6 +186,68 @@ def get_tool_definitions():
                 "strict": True
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "modify_emails",
+                "description": "Add or remove labels on many emails in one call, selected by IDs and/or a Gmail search query. Use this to mark emails read or unread, archive, star or label several emails at once instead of one call per email.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "message_ids": {
+                            "type": "string",
+                            "description": "Comma-separated email IDs (empty to select by query only)"
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "Gmail search query selecting emails, e.g. 'from:news@example.org is:unread' (empty to use message_ids only)"
+                        },
+                        "add_labels": {
+                            "type": "string",
+                            "description": "Comma-separated label names or IDs to add, e.g. 'STARRED' (empty for none)"
+                        },
+                        "remove_labels": {
+                            "type": "string",
+                            "description": "Comma-separated label names or IDs to remove: 'UNREAD' marks read, 'INBOX' archives (empty for none)"
+                        },
+                        "max_messages": {
+                            "type": "integer",
+                            "description": "Maximum number of emails selected by query (default: 500)"
+                        }
+                    },
+                    "required": ["message_ids", "query", "add_labels", "remove_labels", "max_messages"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "trash_emails",
+                "description": "Delete (move to trash) many emails in one call, selected by IDs and/or a Gmail search query. Use this instead of calling delete_email once per email.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "message_ids": {
+                            "type": "string",
+                            "description": "Comma-separated email IDs (empty to select by query only)"
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "Gmail search query selecting emails, e.g. 'from:news@example.org older_than:30d' (empty to use message_ids only)"
+                        },
+                        "max_messages": {
+                            "type": "integer",
+                            "description": "Maximum number of emails selected by query (default: 500)"
+                        }
+                    },
+                    "required": ["message_ids", "query", "max_messages"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -185,6 +297,41 @@ def get_tool_definitions():
                 "strict": True
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "list_all_events",
+                "description": "List events from all of the user's calendars (or selected ones) in one call, merged into a single list ordered by start time with duplicates removed. Use this instead of calling list_events once per calendar when the user asks about their whole schedule.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "calendar_ids": {
+                            "type": "string",
+                            "description": "Comma-separated calendar IDs (empty for every calendar)"
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": "Maximum number of events to return in total (uses 25 if not specified)"
+                        },
+                        "time_min": {
+                            "type": "string",
+                            "description": "Start time in ISO format (uses current time if not specified)"
+                        },
+                        "time_max": {
+                            "type": "string",
+                            "description": "End time in ISO format (uses 7 days from now if not specified)"
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "Search query for events (optional)"
+                        }
+                    },
+                    "required": ["calendar_ids", "max_results", "time_min", "time_max", "query"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -271,6 +418,68 @@ def get_tool_definitions():
                 "strict": True
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "batch_events",
+                "description": "Create and/or update many events on one calendar in a single call, e.g. a whole semester of classes or moving a series of meetings. Use this instead of calling create_event or update_event once per event. Returns a status or error for each event.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "calendar_id": {
+                            "type": "string",
+                            "description": "Calendar ID (use 'primary' for the main calendar)"
+                        },
+                        "events": {
+                            "type": "array",
+                            "description": "Events to create (empty event_id) or update (event_id set; only non-empty fields change)",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "event_id": {
+                                        "type": "string",
+                                        "description": "ID of the event to update, or empty to create a new event"
+                                    },
+                                    "etag": {
+                                        "type": "string",
+                                        "description": "ETag from get_event to update only if the event has not changed since, or empty"
+                                    },
+                                    "summary": {
+                                        "type": "string",
+                                        "description": "Event title (required to create; empty leaves it unchanged)"
+                                    },
+                                    "start_time": {
+                                        "type": "string",
+                                        "description": "Start time in ISO format (required to create; empty leaves it unchanged)"
+                                    },
+                                    "end_time": {
+                                        "type": "string",
+                                        "description": "End time in ISO format (required to create; empty leaves it unchanged)"
+                                    },
+                                    "description": {
+                                        "type": "string",
+                                        "description": "Event description, or empty"
+                                    },
+                                    "location": {
+                                        "type": "string",
+                                        "description": "Event location, or empty"
+                                    },
+                                    "attendees": {
+                                        "type": "string",
+                                        "description": "Comma-separated attendee emails, or empty"
+                                    }
+                                },
+                                "required": ["event_id", "etag", "summary", "start_time", "end_time", "description", "location", "attendees"],
+                                "additionalProperties": False
+                            }
+                        }
+                    },
+                    "required": ["calendar_id", "events"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -294,6 +503,57 @@ def get_tool_definitions():
                 "strict": True
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "find_free_slots",
+                "description": "Find free time slots of a given length across the user's calendars and, through FreeBusy, other attendees' calendars, and report overlapping events. Use this when the user asks when they (or a group) are free or available, or whether their schedule has conflicts.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "time_min": {
+                            "type": "string",
+                            "description": "Start of the search range in ISO format"
+                        },
+                        "time_max": {
+                            "type": "string",
+                            "description": "End of the search range in ISO format"
+                        },
+                        "duration_minutes": {
+                            "type": "integer",
+                            "description": "Minimum length of a free slot in minutes (default: 30)"
+                        },
+                        "calendar_ids": {
+                            "type": "string",
+                            "description": "Comma-separated calendar IDs to check (use 'primary' if not specified)"
+                        },
+                        "attendees": {
+                            "type": "string",
+                            "description": "Comma-separated email addresses of other people who must also be free (empty for none)"
+                        },
+                        "working_hours": {
+                            "type": "string",
+                            "description": "Daily window to search as HH:MM-HH:MM (default: 09:00-17:00)"
+                        },
+                        "time_zone": {
+                            "type": "string",
+                            "description": "IANA time zone for working hours and results (default: America/Los_Angeles)"
+                        },
+                        "include_weekends": {
+                            "type": "boolean",
+                            "description": "Whether to search Saturdays and Sundays"
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": "Maximum number of free slots to return (default: 10)"
+                        }
+                    },
+                    "required": ["time_min", "time_max", "duration_minutes", "calendar_ids", "attendees", "working_hours", "time_zone", "include_weekends", "max_results"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -362,5 +622,152 @@ def get_tool_definitions():
                 },
                 "strict": True
             }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "next_page",
+                "description": "Get the next part of a tool result that was cut off because it was too large. Only call it when more of the result is needed.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "cursor": {
+                            "type": "string",
+                            "description": "The next_cursor value from the previous part of the result"
+                        }
+                    },
+                    "required": ["cursor"],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
         }
-    ]
\ No newline at end of file
+    ]
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    """
+    Execution properties of a tool, kept next to its definition.
+
+    Attributes:
+        serialized: Run one at a time, in call order, even when the model
+            requests several tools in one step (use for tools with side effects)
+        timeout: Seconds to wait for the tool before reporting a timeout
+            (None uses TOOL_TIMEOUT_SECONDS)
+        idempotent: Repeating the tool's API requests has no extra effect.
+            This decides the retry policy: idempotent tools retry transient
+            errors, others only errors the server rejected before applying
+            the request.
+        cache_ttl: Seconds a successful output may be served from the tool
+            cache (None means the tool is never cached)
+        cache_tags: Maps the normalized arguments to the data the output was
+            built from; required when cache_ttl is set
+        invalidates: Maps the normalized arguments to the cache tags a call
+            makes stale
+        output_tokens: Token budget of the output sent to the model; larger
+            outputs are shortened and paged (None uses TOOL_OUTPUT_MAX_TOKENS)
+    """
+    serialized: bool = False
+    timeout: Optional[float] = None
+    idempotent: bool = True
+    cache_ttl: Optional[float] = None
+    cache_tags: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None
+    invalidates: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None
+    output_tokens: Optional[int] = None
+
+    @property
+    def retry(self) -> RetryPolicy:
+        """Which failed API requests are retried, and the backoff budget."""
+        return IDEMPOTENT_RETRY if self.idempotent else REJECTED_ONLY_RETRY
+
+
+READ_ONLY = ToolPolicy()
+# Deletes and in-place updates can be repeated safely
+IDEMPOTENT_WRITE = ToolPolicy(serialized=True)
+# Creates and sends would duplicate their effect if repeated
+WRITE = ToolPolicy(serialized=True, idempotent=False)
+
+
+def calendar_tags(calendar_id: str) -> set:
+    """
+    Cache tags for data read from or written to one calendar.
+
+    "calendar:*" marks outputs covering every calendar. The primary calendar
+    is also addressable by the account's email address, so both spellings
+    share the "calendar:personal" tag; secondary calendars have ids under
+    calendar.google.com and are tracked on their own.
+    """
+    tags = {f"calendar:{calendar_id}"}
+    if calendar_id == "primary" or ("@" in calendar_id and not calendar_id.endswith("calendar.google.com")):
+        tags.add("calendar:personal")
+    return tags
+
+
+def _calendars_read(calendar_ids: str) -> set:
+    ids = [c.strip() for c in calendar_ids.split(",") if c.strip()]
+    if not ids:
+        return {"calendar:*"}
+    return set().union(*(calendar_tags(c) for c in ids))
+
+
+def _event_read(args: Dict[str, Any]) -> set:
+    return {f"event:{args['event_id']}", "event:*"}
+
+
+def _calendar_written(args: Dict[str, Any]) -> set:
+    return calendar_tags(args["calendar_id"]) | {"calendar:*"}
+
+
+def _event_written(args: Dict[str, Any]) -> set:
+    return _calendar_written(args) | {f"event:{args['event_id']}"}
+
+
+def _events_written(args: Dict[str, Any]) -> set:
+    return _calendar_written(args) | {f"event:{event['event_id']}" for event in args["events"] if event.get("event_id")}
+
+
+def _calendar_deleted(args: Dict[str, Any]) -> set:
+    return _calendar_written(args) | {"calendars", "event:*"}
+
+
+def _email_sent(args: Dict[str, Any]) -> set:
+    # A queued email has not reached the mailbox yet; the outbox invalidates it on delivery
+    from .outbox import outbox_enabled
+    return set() if outbox_enabled() else {"mailbox"}
+
+
+TOOL_POLICIES: Dict[str, ToolPolicy] = {
+    "read_file": READ_ONLY,
+    "write_file": IDEMPOTENT_WRITE,
+    "list_files": READ_ONLY,
+    "list_emails": replace(READ_ONLY, cache_ttl=30, cache_tags=lambda a: {"mailbox"}),
+    "search_emails": replace(READ_ONLY, cache_ttl=30, cache_tags=lambda a: {"mailbox"}),
+    "send_email": replace(WRITE, invalidates=_email_sent),
+    # Delivery state changes in the background, so it is always read fresh
+    "email_status": READ_ONLY,
+    # A message's content never changes, only whether it still exists
+    "read_email": replace(READ_ONLY, cache_ttl=600, cache_tags=lambda a: {f"message:{a['message_id']}"}),
+    "delete_email": replace(IDEMPOTENT_WRITE, invalidates=lambda a: {"mailbox", f"message:{a['message_id']}"}),
+    "modify_emails": replace(IDEMPOTENT_WRITE, invalidates=lambda a: {"mailbox"}),
+    "trash_emails": replace(IDEMPOTENT_WRITE, invalidates=lambda a: {"mailbox"}),
+    "list_calendars": replace(READ_ONLY, cache_ttl=300, cache_tags=lambda a: {"calendars"}),
+    "list_events": replace(READ_ONLY, cache_ttl=60, cache_tags=lambda a: calendar_tags(a["calendar_id"])),
+    "list_all_events": replace(READ_ONLY, cache_ttl=60, cache_tags=lambda a: _calendars_read(a["calendar_ids"])),
+    "create_event": replace(WRITE, invalidates=_calendar_written),
+    "update_event": replace(IDEMPOTENT_WRITE, invalidates=_event_written),
+    "batch_events": replace(WRITE, invalidates=_events_written),
+    "delete_event": replace(IDEMPOTENT_WRITE, invalidates=_event_written),
+    "get_event": replace(READ_ONLY, cache_ttl=60, cache_tags=_event_read),
+    # Attendees' calendars change without going through our tools; the TTL bounds that
+    "find_free_slots": replace(READ_ONLY, cache_ttl=60, cache_tags=lambda a: _calendars_read(a["calendar_ids"])),
+    "create_calendar": replace(WRITE, invalidates=lambda a: {"calendars"}),
+    "delete_calendar": replace(IDEMPOTENT_WRITE, invalidates=_calendar_deleted),
+    # Pages come from memory and each cursor is used once per listing, so there is nothing to cache
+    "next_page": READ_ONLY,
+}
+
+
+def get_tool_policy(name: str) -> ToolPolicy:
+    """Return the execution policy for a tool; unknown tools are treated as writes."""
+    return TOOL_POLICIES.get(name, WRITE)
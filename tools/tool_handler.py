@@ -1,68 +1,360 @@
+import asyncio
+import contextvars
 import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from functools import lru_cache
-from .file_tools import read_file, write_file, list_files
-from .gmail_tools import list_emails, send_email, read_email, delete_email
-from .calendar_tools import (
-    list_calendars, list_events, create_event, update_event, 
-    delete_event, get_event, create_calendar, delete_calendar
-)
-from tenacity import retry, stop_after_attempt, wait_exponential
-from typing import List, Dict, Any, Optional
-from openai.types.beta.threads import Run
-
-# Cache the function mapping
+from .tool_definitions import get_tool_policy
+from .retries import retry_scope
+from .metrics import TOOL_ROUND_SECONDS, TOOL_SECONDS
+from .tool_cache import get_tool_cache, normalize_arguments
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai.types.beta.threads import Run
+
+# Maximum number of tool calls from one step that run at the same time
+DEFAULT_MAX_TOOL_WORKERS = 8
+# Seconds to wait for a tool that does not declare its own timeout
+DEFAULT_TOOL_TIMEOUT = 60.0
+# Threads shared by every conversation for blocking tool calls in async mode
+DEFAULT_TOOL_EXECUTOR_WORKERS = 32
+
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+# Cache the function mapping; the tool modules (and the Google client) load on first use
 @lru_cache(maxsize=1)
 def get_function_map():
+    from .file_tools import read_file, write_file, list_files
+    from .gmail_tools import (
+        list_emails, search_emails, send_email, read_email, delete_email, modify_emails, trash_emails
+    )
+    from .calendar_tools import (
+        list_calendars, list_events, list_all_events, create_event, update_event, batch_events,
+        delete_event, get_event, find_free_slots, create_calendar, delete_calendar
+    )
+    from .outbox import email_status
+    from .output import next_page
     return {
         "read_file": read_file,
         "write_file": write_file,
         "list_files": list_files,
         "list_emails": list_emails,
+        "search_emails": search_emails,
         "send_email": send_email,
+        "email_status": email_status,
         "read_email": read_email,
         "delete_email": delete_email,
+        "modify_emails": modify_emails,
+        "trash_emails": trash_emails,
         "list_calendars": list_calendars,
         "list_events": list_events,
+        "list_all_events": list_all_events,
         "create_event": create_event,
         "update_event": update_event,
+        "batch_events": batch_events,
         "delete_event": delete_event,
         "get_event": get_event,
+        "find_free_slots": find_free_slots,
         "create_calendar": create_calendar,
         "delete_calendar": delete_calendar,
+        "next_page": next_page,
     }
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def handle_tool_calls(run: Run) -> List[Dict[str, Any]]:
+def get_max_tool_workers() -> int:
+    """Concurrency limit for one step's tool calls (TOOL_MAX_WORKERS)."""
+    try:
+        return max(1, int(os.getenv("TOOL_MAX_WORKERS", DEFAULT_MAX_TOOL_WORKERS)))
+    except ValueError:
+        return DEFAULT_MAX_TOOL_WORKERS
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide pool that async dispatch runs blocking tools on.
+
+    Its size (TOOL_EXECUTOR_WORKERS) bounds the threads used by all
+    conversations together, however many are active.
+    """
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            try:
+                workers = max(1, int(os.getenv("TOOL_EXECUTOR_WORKERS", DEFAULT_TOOL_EXECUTOR_WORKERS)))
+            except ValueError:
+                workers = DEFAULT_TOOL_EXECUTOR_WORKERS
+            _tool_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool-async")
+        return _tool_executor
+
+def get_tool_timeout(function_name: str) -> float:
+    """Timeout for a tool: its policy's value, else TOOL_TIMEOUT_SECONDS."""
+    policy_timeout = get_tool_policy(function_name).timeout
+    if policy_timeout is not None:
+        return policy_timeout
+    try:
+        return float(os.getenv("TOOL_TIMEOUT_SECONDS", DEFAULT_TOOL_TIMEOUT))
+    except ValueError:
+        return DEFAULT_TOOL_TIMEOUT
+
+def is_error_output(output: Any) -> bool:
+    """Whether a tool's output reports a failure: tool errors start "Error", auth failures "❌"."""
+    return isinstance(output, str) and output.startswith(("Error", "❌"))
+
+class _ToolInvocation:
+    """A single tool call scheduled on an executor."""
+
+    def __init__(self, tool_call):
+        self.tool_call = tool_call
+        self.function_name = tool_call.function.name
+        self.timeout = get_tool_timeout(self.function_name)
+        self.started = threading.Event()
+        self.started_at = 0.0
+        self.future = None
+
+    def run(self, function):
+        self.started_at = time.monotonic()
+        self.started.set()
+        with TOOL_SECONDS.time(tool=self.function_name, outcome="exception") as labels:
+            output = self._run(function, labels)
+            if labels["outcome"] == "exception":
+                labels["outcome"] = "error" if is_error_output(output) else "ok"
+            return output
+
+    def _run(self, function, labels):
+        function_args = json.loads(self.tool_call.function.arguments)
+        policy = get_tool_policy(self.function_name)
+        cache = get_tool_cache() if policy.cache_ttl or policy.invalidates else None
+        if cache is None:
+            return self._call(function, function_args, policy)
+
+        normalized = normalize_arguments(function, function_args)
+        if policy.invalidates:
+            try:
+                return self._call(function, function_args, policy)
+            finally:
+                # Even a failed write may have been applied, so always invalidate
+                tags = policy.invalidates(normalized)
+                if tags:
+                    cache.invalidate(tags)
+
+        key = cache.make_key(self.function_name, normalized)
+        output = cache.get(key)
+        if output is not None:
+            labels["outcome"] = "cached"
+            return output
+        generation = cache.generation
+        output = self._call(function, function_args, policy)
+        if isinstance(output, str) and not is_error_output(output):
+            cache.put(key, output, policy.cache_ttl, policy.cache_tags(normalized), generation)
+        return output
+
+    def _call(self, function, function_args, policy):
+        # Retries happen per API request inside the tool, never for the whole batch
+        with retry_scope(self.function_name, policy.retry):
+            return function(**function_args)
+
+    def not_started(self) -> str:
+        return (f"Error executing {self.function_name}: timed out after {self.timeout:g}s waiting to start; "
+                "it was not run")
+
+    def still_running(self) -> str:
+        if get_tool_policy(self.function_name).idempotent:
+            return f"Error executing {self.function_name}: timed out after {self.timeout:g}s"
+        # Not reported as a failure: the write may still be applied, and repeating it could duplicate it
+        return (f"{self.function_name} did not finish within {self.timeout:g}s and is still running; "
+                "its outcome is unknown, so do not call it again")
+
+    def result(self) -> str:
+        """Wait for the call, counting the timeout from when it started running."""
+        if not self.started.wait(self.timeout):
+            if self.future.cancel():
+                return self.not_started()
+            # It started just as the wait ran out
+            self.started.wait()
+        remaining = self.timeout - (time.monotonic() - self.started_at)
+        try:
+            return self.future.result(timeout=max(0.0, remaining))
+        except FutureTimeoutError:
+            return self.still_running()
+        except Exception as e:
+            return f"Error executing {self.function_name}: {str(e)}"
+
+def execute_tool_calls(tool_calls: List[Any], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Execute the tool calls of one step concurrently.
+
+    Read-only tools run in a thread pool of up to max_workers threads. Tools
+    whose policy is serialized run one at a time in call order on a separate
+    lane, so writes never race each other. Outputs keep the order of tool_calls.
+
+    Args:
+        tool_calls: Tool calls from a run's required_action
+        max_workers: Concurrency limit (default: TOOL_MAX_WORKERS)
+
+    Returns:
+        List[Dict[str, Any]]: Tool outputs in the same order as tool_calls
+    """
+    function_map = get_function_map()
+    invocations = [_ToolInvocation(tool_call) for tool_call in tool_calls]
+    runnable = [inv for inv in invocations if inv.function_name in function_map]
+    parallel = [inv for inv in runnable if not get_tool_policy(inv.function_name).serialized]
+    serial = [inv for inv in runnable if get_tool_policy(inv.function_name).serialized]
+
+    pools = []
+    if len(runnable) > 1:
+        if parallel:
+            workers = min(max_workers or get_max_tool_workers(), len(parallel))
+            pools.append((ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool"), parallel))
+        if serial:
+            pools.append((ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-serial"), serial))
+    elif runnable:
+        # A single call needs no extra thread, but still gets a timeout
+        pools.append((ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool"), runnable))
+
+    try:
+        for pool, group in pools:
+            for inv in group:
+                # Copy the caller's context so context variables reach the worker
+                ctx = contextvars.copy_context()
+                inv.future = pool.submit(ctx.run, inv.run, function_map[inv.function_name])
+
+        tool_outputs = []
+        for inv in invocations:
+            if inv.future is None:
+                output = f"Error executing {inv.function_name}: unknown tool"
+            else:
+                output = inv.result()
+            tool_outputs.append({
+                "tool_call_id": inv.tool_call.id,
+                "output": output
+            })
+        return tool_outputs
+    finally:
+        # Do not block on tools that timed out; their threads finish on their own, and calls
+        # still queued behind them are dropped rather than run after being reported
+        for pool, _ in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+async def _run_async(inv: _ToolInvocation, function, executor: ThreadPoolExecutor,
+                     after: Optional[Future] = None) -> str:
+    """
+    Run one tool call on the executor, with the same timeouts as the threaded path.
+
+    Args:
+        after: Thread of the previous call in the serialized lane; this call
+            starts only once it has finished, even if it outlived its timeout
+    """
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    # Copy the caller's context so context variables reach the worker
+    ctx = contextvars.copy_context()
+
+    def target():
+        # Record the start before waking the loop, which measures the timeout from it
+        inv.started_at = time.monotonic()
+        loop.call_soon_threadsafe(started.set)
+        return ctx.run(inv.run, function)
+
+    deadline = loop.time() + inv.timeout
+    if after is not None and not after.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(after)), inv.timeout)
+        except asyncio.TimeoutError:
+            return inv.not_started()
+        except Exception:
+            pass  # Its error was reported with its own output
+    # Submitted directly so cancel() reliably tells a queued call from one whose thread has begun
+    inv.future = executor.submit(target)
+    future = asyncio.wrap_future(inv.future)
+    try:
+        await asyncio.wait_for(started.wait(), max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        if inv.future.cancel():
+            # Still queued behind other conversations' tools, so it can be dropped safely
+            return inv.not_started()
+        # It started just as the wait ran out
+        await started.wait()
+    remaining = inv.timeout - (time.monotonic() - inv.started_at)
+    try:
+        # Shielded so a timeout does not cancel the asyncio side of a running thread
+        return await asyncio.wait_for(asyncio.shield(future), max(0.0, remaining))
+    except asyncio.TimeoutError:
+        return inv.still_running()
+    except Exception as e:
+        return f"Error executing {inv.function_name}: {str(e)}"
+
+async def execute_tool_calls_async(tool_calls: List[Any], max_workers: Optional[int] = None,
+                                   executor: Optional[ThreadPoolExecutor] = None) -> List[Dict[str, Any]]:
+    """
+    Execute the tool calls of one step from asyncio code.
+
+    Same ordering rules as execute_tool_calls: read-only tools run concurrently
+    (at most max_workers from this step at a time), serialized tools run one
+    at a time in call order. The blocking Google client calls run on a
+    shared bounded executor, so the event loop is never blocked and many
+    conversations share one set of threads.
+
+    Args:
+        tool_calls: Tool calls from a run's required_action
+        max_workers: Concurrency limit for this step (default: TOOL_MAX_WORKERS)
+        executor: Thread pool for the blocking calls (default: get_tool_executor())
+
+    Returns:
+        List[Dict[str, Any]]: Tool outputs in the same order as tool_calls
+    """
+    function_map = get_function_map()
+    executor = executor or get_tool_executor()
+    invocations = [_ToolInvocation(tool_call) for tool_call in tool_calls]
+    outputs: Dict[int, str] = {}
+    limit = asyncio.Semaphore(max_workers or get_max_tool_workers())
+
+    async def run_parallel(position: int, inv: _ToolInvocation) -> None:
+        async with limit:
+            outputs[position] = await _run_async(inv, function_map[inv.function_name], executor)
+
+    async def run_serial(group) -> None:
+        # The lane stays held by a call that outlived its timeout, as the single-thread lane of
+        # execute_tool_calls is, so two writes never run at once
+        previous = None
+        for position, inv in group:
+            outputs[position] = await _run_async(inv, function_map[inv.function_name], executor, after=previous)
+            # A call that was never submitted leaves the lane with the thread it waited for
+            previous = inv.future or previous
+
+    parallel, serial = [], []
+    for position, inv in enumerate(invocations):
+        if inv.function_name not in function_map:
+            outputs[position] = f"Error executing {inv.function_name}: unknown tool"
+        elif get_tool_policy(inv.function_name).serialized:
+            serial.append((position, inv))
+        else:
+            parallel.append(run_parallel(position, inv))
+    await asyncio.gather(run_serial(serial), *parallel)
+
+    return [
+        {"tool_call_id": inv.tool_call.id, "output": outputs[position]}
+        for position, inv in enumerate(invocations)
+    ]
+
+async def handle_tool_calls_async(run: 'Run') -> List[Dict[str, Any]]:
+    """Async counterpart of handle_tool_calls."""
+    with TOOL_ROUND_SECONDS.time():
+        return await execute_tool_calls_async(run.required_action.submit_tool_outputs.tool_calls)
+
+def handle_tool_calls(run: 'Run') -> List[Dict[str, Any]]:
     """
     Handle tool calls from the assistant.
-    
+
+    Each tool's Google API requests are retried according to its ToolPolicy;
+    a failure in one tool never re-runs the others.
+
     Args:
         run (Run): The current run object from OpenAI
-        
+
     Returns:
         List[Dict[str, Any]]: List of tool outputs
-        
-    Raises:
-        ValueError: If tool execution fails
     """
-    tool_outputs = []
-    function_map = get_function_map()
-    
-    for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-        function_name = tool_call.function.name
-        function_args = json.loads(tool_call.function.arguments)
-        
-        if function_name in function_map:
-            try:
-                output = function_map[function_name](**function_args)
-                tool_outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": output
-                })
-            except Exception as e:
-                tool_outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": f"Error executing {function_name}: {str(e)}"
-                })
-    
-    return tool_outputs
\ No newline at end of file
+    with TOOL_ROUND_SECONDS.time():
+        return execute_tool_calls(run.required_action.submit_tool_outputs.tool_calls)